@@ -14,7 +14,8 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Dev-only code (tests/fake_gmail.py and the test suite) stays out of the build.
+    excludes=["tests"],
     noarchive=False,
     optimize=0,
 )
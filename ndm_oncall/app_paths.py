@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import re
 import sys
 from pathlib import Path
+from typing import List, Tuple
 
 from shared.app_paths import get_app_data_dir, get_db_path
 
@@ -31,5 +33,16 @@ def get_token_path() -> Path:
     return get_app_data_dir() / "token.json"
 
 
+def get_extra_token_paths() -> List[Tuple[str, Path]]:
+    # Additional mailboxes: token_<N>.json next to token.json, N being the
+    # account index Gmail uses in its /mail/u/<N>/ links.
+    found = []
+    for path in get_app_data_dir().glob("token_*.json"):
+        match = re.fullmatch(r"token_(\d+)\.json", path.name)
+        if match:
+            found.append((match.group(1), path))
+    return sorted(found, key=lambda item: int(item[0]))
+
+
 def get_log_path() -> Path:
     return get_app_data_dir() / "ndm_backend.log"
@@ -1,139 +1,54 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import sqlite3
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, ContextManager, Dict, List, Optional, TypeVar
 
 from ndm_oncall.app_paths import get_db_path
+from shared import profile_store
+from shared.db_executor import DBExecutor
+from shared.migrations import migrate
+from shared.sqlite_utils import get_pool, plain_text
+from shared.write_queue import get_write_queue
 
 DB_PATH = str(get_db_path())
 
+T = TypeVar("T")
 
-def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+_EXECUTOR = DBExecutor()
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return get_pool(DB_PATH).connection()
+
+
+def _write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Writes go through the shared single-writer queue, which group-commits
+    # them with whatever else (research included) is pending.
+    return get_write_queue(DB_PATH).execute(fn, *args, **kwargs)
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {**get_pool(DB_PATH).stats(), "writer": get_write_queue(DB_PATH).stats()}
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Awaitable entry point for async handlers: runs any function in this
+    # module (or profile_store) on the dedicated DB threads.
+    return await _EXECUTOR.run(fn, *args, **kwargs)
+
+
+def shutdown() -> None:
+    _EXECUTOR.shutdown()
+    get_write_queue(DB_PATH).close()
 
 
 def init_db() -> None:
     with _connect() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS calls (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts_start TEXT NOT NULL,
-                ts_end TEXT,
-                phone_digits TEXT NOT NULL,
-                last10 TEXT,
-                display_name TEXT,
-                status TEXT,
-                call_subject TEXT,
-                audio_path TEXT,
-                notes_preview TEXT
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS call_notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                call_id INTEGER NOT NULL,
-                ts TEXT NOT NULL,
-                note_text TEXT NOT NULL,
-                note_preview TEXT,
-                FOREIGN KEY(call_id) REFERENCES calls(id)
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS contacts (
-                phone_digits TEXT PRIMARY KEY,
-                display_name TEXT,
-                company TEXT,
-                tags TEXT
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS opportunities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                phone_digits TEXT NOT NULL,
-                jd_title TEXT,
-                jd_text TEXT,
-                resume_match_text TEXT,
-                talk_track_text TEXT,
-                status TEXT,
-                updated_at TEXT
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS email_links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                opportunity_id INTEGER,
-                phone_digits TEXT,
-                gmail_message_id TEXT,
-                rfc_message_id TEXT,
-                mailbox_email TEXT,
-                account_index TEXT,
-                subject TEXT,
-                from_addr TEXT,
-                date TEXT,
-                snippet TEXT,
-                gmail_link TEXT,
-                is_pinned_jd INTEGER DEFAULT 0,
-                FOREIGN KEY(opportunity_id) REFERENCES opportunities(id)
-            )
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS research_recordings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                call_id INTEGER,
-                phone_digits TEXT NOT NULL,
-                audio_path TEXT,
-                file_path TEXT,
-                created_at TEXT,
-                duration_sec INTEGER DEFAULT 0
-            )
-            """
-        )
-        conn.commit()
-
-        columns = [row[1] for row in conn.execute("PRAGMA table_info(calls)")]
-        if "last10" not in columns:
-            conn.execute("ALTER TABLE calls ADD COLUMN last10 TEXT")
-            conn.commit()
-
-        email_columns = [row[1] for row in conn.execute("PRAGMA table_info(email_links)")]
-        if "rfc_message_id" not in email_columns:
-            conn.execute("ALTER TABLE email_links ADD COLUMN rfc_message_id TEXT")
-            conn.commit()
-        if "mailbox_email" not in email_columns:
-            conn.execute("ALTER TABLE email_links ADD COLUMN mailbox_email TEXT")
-            conn.commit()
-        if "account_index" not in email_columns:
-            conn.execute("ALTER TABLE email_links ADD COLUMN account_index TEXT")
-            conn.commit()
-
-        recording_columns = [row[1] for row in conn.execute("PRAGMA table_info(research_recordings)")]
-        if "call_id" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN call_id INTEGER")
-            conn.commit()
-        if "audio_path" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN audio_path TEXT")
-            conn.commit()
-        if "file_path" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN file_path TEXT")
-            conn.commit()
-        if "duration_sec" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN duration_sec INTEGER DEFAULT 0")
-            conn.commit()
+        migrate(conn)
 
 
 def _now_iso() -> str:
@@ -146,37 +61,41 @@ def _last10_digits(digits: str) -> str:
     return digits[-10:] if len(digits) >= 10 else digits
 
 
+def _insert_call(conn: sqlite3.Connection, phone_digits: str, status: str) -> int:
+    cur = conn.execute(
+        """
+        INSERT INTO calls (ts_start, phone_digits, last10, status)
+        VALUES (?, ?, ?, ?)
+        """,
+        (_now_iso(), phone_digits, _last10_digits(phone_digits), status),
+    )
+    return int(cur.lastrowid)
+
+
 def create_call(phone_digits: str, status: str = "incoming") -> int:
-    last10 = _last10_digits(phone_digits)
-    with _connect() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO calls (ts_start, phone_digits, last10, status)
-            VALUES (?, ?, ?, ?)
-            """,
-            (_now_iso(), phone_digits, last10, status),
-        )
-        conn.commit()
-        return int(cur.lastrowid)
+    return _write(_insert_call, phone_digits, status)
+
+
+def _update_call_end(conn: sqlite3.Connection, call_id: int) -> None:
+    conn.execute(
+        "UPDATE calls SET ts_end = ?, status = ? WHERE id = ?",
+        (_now_iso(), "ended", call_id),
+    )
 
 
 def update_call_end(call_id: int) -> None:
-    with _connect() as conn:
-        conn.execute(
-            "UPDATE calls SET ts_end = ?, status = ? WHERE id = ?",
-            (_now_iso(), "ended", call_id),
-        )
-        conn.commit()
+    _write(_update_call_end, call_id)
+
+
+def _update_call_audio(conn: sqlite3.Connection, call_id: int, audio_path: str) -> None:
+    conn.execute(
+        "UPDATE calls SET audio_path = ? WHERE id = ?",
+        (audio_path, call_id),
+    )
 
 
 def update_call_audio(call_id: int, audio_path: str) -> None:
-    with _connect() as conn:
-        conn.execute(
-            "UPDATE calls SET audio_path = ? WHERE id = ?",
-            (audio_path, call_id),
-        )
-        conn.commit()
+    _write(_update_call_audio, call_id, audio_path)
 
 
 def get_call_by_id(call_id: int) -> Optional[Dict[str, Any]]:
@@ -190,6 +109,41 @@ def get_call_by_id(call_id: int) -> Optional[Dict[str, Any]]:
         return data
 
 
+def _add_research_recording(
+    conn: sqlite3.Connection,
+    call_id: int,
+    last10: str,
+    audio_path: str,
+    duration_sec: int,
+) -> None:
+    existing = conn.execute(
+        """
+        SELECT id FROM research_recordings
+        WHERE call_id = ? AND (audio_path = ? OR file_path = ?)
+        LIMIT 1
+        """,
+        (call_id, audio_path, audio_path),
+    ).fetchone()
+    if existing:
+        return
+    now = _now_iso()
+    conn.execute(
+        """
+        INSERT INTO research_recordings
+        (call_id, phone_digits, audio_path, file_path, created_at, duration_sec)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            call_id,
+            last10,
+            audio_path,
+            audio_path,
+            now,
+            int(duration_sec or 0),
+        ),
+    )
+
+
 def add_research_recording(
     call_id: int,
     phone_digits: str,
@@ -198,35 +152,13 @@ def add_research_recording(
 ) -> None:
     if not audio_path:
         return
-    last10 = _last10_digits(phone_digits)
-    with _connect() as conn:
-        existing = conn.execute(
-            """
-            SELECT id FROM research_recordings
-            WHERE call_id = ? AND (audio_path = ? OR file_path = ?)
-            LIMIT 1
-            """,
-            (call_id, audio_path, audio_path),
-        ).fetchone()
-        if existing:
-            return
-        now = _now_iso()
-        conn.execute(
-            """
-            INSERT INTO research_recordings
-            (call_id, phone_digits, audio_path, file_path, created_at, duration_sec)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                call_id,
-                last10,
-                audio_path,
-                audio_path,
-                now,
-                int(duration_sec or 0),
-            ),
-        )
-        conn.commit()
+    _write(
+        _add_research_recording,
+        call_id,
+        _last10_digits(phone_digits),
+        audio_path,
+        duration_sec,
+    )
 
 
 def get_latest_call(phone_digits: str) -> Optional[Dict[str, Any]]:
@@ -243,18 +175,61 @@ def get_latest_call(phone_digits: str) -> Optional[Dict[str, Any]]:
         return data
 
 
+def _recent_calls(conn: sqlite3.Connection, limit: int) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        "SELECT * FROM calls ORDER BY ts_start DESC LIMIT ?", (limit,)
+    ).fetchall()
+    results = []
+    for row in rows:
+        data = dict(row)
+        if not data.get("last10"):
+            data["last10"] = _last10_digits(data.get("phone_digits", ""))
+        results.append(data)
+    return results
+
+
 def list_recent_calls(limit: int = 20) -> List[Dict[str, Any]]:
     with _connect() as conn:
+        return _recent_calls(conn, limit)
+
+
+def _call_history(
+    conn: sqlite3.Connection,
+    digits: Optional[str],
+    last10: Optional[str],
+    limit: int,
+) -> List[Dict[str, Any]]:
+    if not digits and not last10:
+        return []
+
+    if digits:
         rows = conn.execute(
-            "SELECT * FROM calls ORDER BY ts_start DESC LIMIT ?", (limit,)
+            "SELECT * FROM calls WHERE phone_digits = ? ORDER BY ts_start DESC LIMIT ?",
+            (digits, limit),
         ).fetchall()
-        results = []
-        for row in rows:
-            data = dict(row)
-            if not data.get("last10"):
-                data["last10"] = _last10_digits(data.get("phone_digits", ""))
-            results.append(data)
-        return results
+        if rows:
+            results = []
+            for row in rows:
+                data = dict(row)
+                if not data.get("last10"):
+                    data["last10"] = _last10_digits(data.get("phone_digits", ""))
+                results.append(data)
+            return results
+
+    if digits and not last10:
+        last10 = _last10_digits(digits)
+
+    rows = conn.execute(
+        "SELECT * FROM calls WHERE last10 = ? ORDER BY ts_start DESC LIMIT ?",
+        (last10, limit),
+    ).fetchall()
+    results = []
+    for row in rows:
+        data = dict(row)
+        if not data.get("last10"):
+            data["last10"] = _last10_digits(data.get("phone_digits", ""))
+        results.append(data)
+    return results
 
 
 def list_call_history(
@@ -264,46 +239,23 @@ def list_call_history(
 ) -> List[Dict[str, Any]]:
     if not digits and not last10:
         return []
-
     with _connect() as conn:
-        if digits:
-            rows = conn.execute(
-                "SELECT * FROM calls WHERE phone_digits = ? ORDER BY ts_start DESC LIMIT ?",
-                (digits, limit),
-            ).fetchall()
-            if rows:
-                results = []
-                for row in rows:
-                    data = dict(row)
-                    if not data.get("last10"):
-                        data["last10"] = _last10_digits(data.get("phone_digits", ""))
-                    results.append(data)
-                return results
-
-        if digits and not last10:
-            last10 = _last10_digits(digits)
+        return _call_history(conn, digits, last10, limit)
 
-        rows = conn.execute(
-            "SELECT * FROM calls WHERE last10 = ? ORDER BY ts_start DESC LIMIT ?",
-            (last10, limit),
-        ).fetchall()
-        results = []
-        for row in rows:
-            data = dict(row)
-            if not data.get("last10"):
-                data["last10"] = _last10_digits(data.get("phone_digits", ""))
-            results.append(data)
-        return results
+
+def _clear_all(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM call_notes")
+    conn.execute("DELETE FROM calls")
+    conn.execute("DELETE FROM email_links")
+    conn.execute("DELETE FROM email_sync_state")
+    conn.execute("DELETE FROM email_bodies")
+    conn.execute("DELETE FROM email_body_blobs")
+    conn.execute("DELETE FROM opportunities")
+    conn.execute("DELETE FROM contacts")
 
 
 def clear_all() -> None:
-    with _connect() as conn:
-        conn.execute("DELETE FROM call_notes")
-        conn.execute("DELETE FROM calls")
-        conn.execute("DELETE FROM email_links")
-        conn.execute("DELETE FROM opportunities")
-        conn.execute("DELETE FROM contacts")
-        conn.commit()
+    _write(_clear_all)
 
 
 def get_notes(call_id: int) -> List[Dict[str, Any]]:
@@ -315,19 +267,20 @@ def get_notes(call_id: int) -> List[Dict[str, Any]]:
         return [dict(row) for row in rows]
 
 
+def _insert_note(conn: sqlite3.Connection, call_id: int, note_text: str, preview: str) -> int:
+    cur = conn.execute(
+        """
+        INSERT INTO call_notes (call_id, ts, note_text, note_plain, note_preview)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (call_id, _now_iso(), note_text, plain_text(note_text), preview),
+    )
+    return int(cur.lastrowid)
+
+
 def add_note(call_id: int, note_text: str) -> Dict[str, Any]:
     preview = note_text[:140]
-    with _connect() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO call_notes (call_id, ts, note_text, note_preview)
-            VALUES (?, ?, ?, ?)
-            """,
-            (call_id, _now_iso(), note_text, preview),
-        )
-        conn.commit()
-        note_id = int(cur.lastrowid)
+    note_id = _write(_insert_note, call_id, note_text, preview)
     return {
         "id": note_id,
         "call_id": call_id,
@@ -337,101 +290,667 @@ def add_note(call_id: int, note_text: str) -> Dict[str, Any]:
     }
 
 
+def _opportunity(conn: sqlite3.Connection, phone_digits: str) -> Optional[Dict[str, Any]]:
+    row = conn.execute(
+        "SELECT * FROM opportunities WHERE phone_digits = ?",
+        (phone_digits,),
+    ).fetchone()
+    return dict(row) if row else None
+
+
 def get_opportunity(phone_digits: str) -> Optional[Dict[str, Any]]:
     with _connect() as conn:
-        row = conn.execute(
-            "SELECT * FROM opportunities WHERE phone_digits = ?",
-            (phone_digits,),
-        ).fetchone()
-        return dict(row) if row else None
+        return _opportunity(conn, phone_digits)
+
+
+def _upsert_opportunity(conn: sqlite3.Connection, data: Dict[str, Any]) -> int:
+    row = conn.execute(
+        """
+        INSERT INTO opportunities
+        (phone_digits, jd_title, jd_text, resume_match_text, talk_track_text, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(phone_digits) DO UPDATE SET
+            jd_title = excluded.jd_title,
+            jd_text = excluded.jd_text,
+            resume_match_text = excluded.resume_match_text,
+            talk_track_text = excluded.talk_track_text,
+            status = excluded.status,
+            updated_at = excluded.updated_at
+        RETURNING id
+        """,
+        (
+            data.get("phone_digits"),
+            data.get("jd_title"),
+            data.get("jd_text"),
+            data.get("resume_match_text"),
+            data.get("talk_track_text"),
+            data.get("status"),
+            _now_iso(),
+        ),
+    ).fetchone()
+    return int(row[0])
 
 
 def upsert_opportunity(data: Dict[str, Any]) -> int:
     phone_digits = data.get("phone_digits")
     if not phone_digits:
         raise ValueError("phone_digits required")
-
-    existing = get_opportunity(phone_digits)
-    with _connect() as conn:
-        if existing:
-            conn.execute(
-                """
-                UPDATE opportunities
-                SET jd_title = ?, jd_text = ?, resume_match_text = ?,
-                    talk_track_text = ?, status = ?, updated_at = ?
-                WHERE phone_digits = ?
-                """,
-                (
-                    data.get("jd_title"),
-                    data.get("jd_text"),
-                    data.get("resume_match_text"),
-                    data.get("talk_track_text"),
-                    data.get("status"),
-                    _now_iso(),
-                    phone_digits,
-                ),
+    return _write(_upsert_opportunity, data)
+
+
+# Rows are only rewritten when something actually differs, so unchanged
+# links keep their rowid, pin and fulltext entry across repeat calls.
+_EMAIL_LINK_UPSERT = """
+    INSERT INTO email_links
+    (opportunity_id, phone_digits, gmail_message_id, rfc_message_id, mailbox_email, account_index,
+     subject, from_addr, date, snippet, snippet_plain, gmail_link, is_pinned_jd)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+    ON CONFLICT(phone_digits, gmail_message_id) DO UPDATE SET
+        opportunity_id = COALESCE(excluded.opportunity_id, email_links.opportunity_id),
+        rfc_message_id = excluded.rfc_message_id,
+        mailbox_email = excluded.mailbox_email,
+        account_index = excluded.account_index,
+        subject = excluded.subject,
+        from_addr = excluded.from_addr,
+        date = excluded.date,
+        snippet = excluded.snippet,
+        snippet_plain = excluded.snippet_plain,
+        gmail_link = excluded.gmail_link,
+        deleted_at = NULL
+    WHERE email_links.deleted_at IS NOT NULL
+       OR excluded.opportunity_id IS NOT NULL
+          AND email_links.opportunity_id IS NOT excluded.opportunity_id
+       OR email_links.rfc_message_id IS NOT excluded.rfc_message_id
+       OR email_links.mailbox_email IS NOT excluded.mailbox_email
+       OR email_links.account_index IS NOT excluded.account_index
+       OR email_links.subject IS NOT excluded.subject
+       OR email_links.from_addr IS NOT excluded.from_addr
+       OR email_links.date IS NOT excluded.date
+       OR email_links.snippet IS NOT excluded.snippet
+       OR email_links.gmail_link IS NOT excluded.gmail_link
+"""
+
+
+def _save_email_links(
+    conn: sqlite3.Connection,
+    phone_digits: str,
+    emails: List[Dict[str, Any]],
+    opportunity_id: Optional[int],
+    prune: bool = True,
+) -> bool:
+    rows = []
+    for e in emails:
+        message_id = e.get("gmail_message_id") or e.get("gmailMessageId")
+        if not message_id:
+            continue
+        rows.append(
+            (
+                opportunity_id,
+                phone_digits,
+                message_id,
+                e.get("rfc_message_id") or e.get("rfcMessageId"),
+                e.get("mailbox_email") or e.get("mailboxEmail"),
+                e.get("account_index") or e.get("accountIndex"),
+                e.get("subject"),
+                e.get("from"),
+                e.get("date"),
+                e.get("snippet"),
+                plain_text(e.get("snippet")),
+                e.get("link"),
             )
-            conn.commit()
-            return int(existing["id"])
-
-        cur = conn.cursor()
-        cur.execute(
+        )
+    now = _now_iso()
+    before = conn.total_changes
+    conn.executemany(_EMAIL_LINK_UPSERT, rows)
+    # Pinned links stay even when they fall out of the latest search window.
+    if prune:
+        conn.execute(
             """
-            INSERT INTO opportunities
-            (phone_digits, jd_title, jd_text, resume_match_text, talk_track_text, status, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            UPDATE email_links SET deleted_at = ?
+            WHERE phone_digits = ? AND deleted_at IS NULL AND is_pinned_jd = 0
+              AND (gmail_message_id IS NULL
+                   OR gmail_message_id NOT IN (SELECT value FROM json_each(?)))
             """,
-            (
-                phone_digits,
-                data.get("jd_title"),
-                data.get("jd_text"),
-                data.get("resume_match_text"),
-                data.get("talk_track_text"),
-                data.get("status"),
-                _now_iso(),
-            ),
+            (now, phone_digits, json.dumps([row[2] for row in rows])),
+        )
+    changed = conn.total_changes != before
+    if prune:
+        # Only a complete result makes the cache fresh.
+        conn.execute(
+            """
+            INSERT INTO email_sync_state (phone_digits, last_synced_at) VALUES (?, ?)
+            ON CONFLICT(phone_digits) DO UPDATE SET last_synced_at = excluded.last_synced_at
+            """,
+            (phone_digits, now),
         )
-        conn.commit()
-        return int(cur.lastrowid)
+    return changed
 
 
 def save_email_links(
     phone_digits: str,
     emails: List[Dict[str, Any]],
     opportunity_id: Optional[int] = None,
+    prune: bool = True,
+) -> bool:
+    # Merges a fresh search result into the stored links and reports whether
+    # any link was added, changed or tombstoned. prune=False (a partial
+    # result, e.g. one mailbox failed) only adds and updates.
+    return _write(_save_email_links, phone_digits, emails, opportunity_id, prune)
+
+
+def _email_links(conn: sqlite3.Connection, phone_digits: str) -> List[Dict[str, Any]]:
+    rows = conn.execute(
+        """
+        SELECT * FROM email_links
+        WHERE phone_digits = ? AND deleted_at IS NULL
+        ORDER BY id DESC
+        """,
+        (phone_digits,),
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _email_synced_at(conn: sqlite3.Connection, phone_digits: str) -> Optional[str]:
+    row = conn.execute(
+        "SELECT last_synced_at FROM email_sync_state WHERE phone_digits = ?",
+        (phone_digits,),
+    ).fetchone()
+    return str(row[0]) if row else None
+
+
+def list_email_links(phone_digits: str) -> List[Dict[str, Any]]:
+    with _connect() as conn:
+        return _email_links(conn, phone_digits)
+
+
+def _mirrored_emails(
+    conn: sqlite3.Connection,
+    phone_digits: str,
+    limit: int,
+    max_age_s: float,
+    mailboxes: int = 1,
+) -> Optional[List[Dict[str, Any]]]:
+    # None means fewer than `mailboxes` mirrors are complete and recently
+    # synced, i.e. the caller has to fall back to a live Gmail search.
+    fresh_after = (datetime.now() - timedelta(seconds=max_age_s)).isoformat()
+    ready = conn.execute(
+        """
+        SELECT COUNT(*) FROM gmail_sync_state
+        WHERE full_sync_completed_at IS NOT NULL AND last_sync_at >= ?
+        """,
+        (fresh_after,),
+    ).fetchone()[0]
+    if ready < max(1, mailboxes):
+        return None
+    rows = conn.execute(
+        """
+        SELECT m.* FROM gmail_message_phones AS p
+        JOIN gmail_messages AS m
+          ON m.mailbox_email = p.mailbox_email AND m.gmail_message_id = p.gmail_message_id
+        WHERE p.last10 = ?
+          AND p.mailbox_email IN (
+            SELECT mailbox_email FROM gmail_sync_state
+            WHERE full_sync_completed_at IS NOT NULL AND last_sync_at >= ?
+          )
+        ORDER BY p.internal_date DESC
+        LIMIT ?
+        """,
+        (_last10_digits(phone_digits), fresh_after, limit * max(1, mailboxes)),
+    ).fetchall()
+    # The same message delivered to several mailboxes is listed once.
+    seen = set()
+    unique = []
+    for row in rows:
+        key = row["rfc_message_id"] or (row["mailbox_email"], row["gmail_message_id"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return [
+        {
+            "subject": row["subject"] or "",
+            "from": row["from_addr"] or "",
+            "date": row["date"] or "",
+            "snippet": row["snippet"] or "",
+            "gmail_message_id": row["gmail_message_id"],
+            "rfc_message_id": row["rfc_message_id"] or "",
+            "mailbox_email": row["mailbox_email"],
+            "account_index": "",
+            "link": "",
+        }
+        for row in unique[:limit]
+    ]
+
+
+def find_mirrored_emails(
+    phone_digits: str, limit: int = 5, max_age_s: float = 600, mailboxes: int = 1
+) -> Optional[List[Dict[str, Any]]]:
+    with _connect() as conn:
+        return _mirrored_emails(conn, phone_digits, limit, max_age_s, mailboxes)
+
+
+def _incoming_call_bundle(
+    conn: sqlite3.Connection,
+    phone_digits: str,
+    existing_call_id: Optional[int],
+    recent_limit: int,
+    mirror_max_age_s: Optional[float],
+    mirror_mailboxes: int = 1,
+) -> Dict[str, Any]:
+    call_id = existing_call_id
+    if call_id is None:
+        call_id = _insert_call(conn, phone_digits, "incoming")
+    return {
+        "call_id": int(call_id),
+        "recent_calls": _recent_calls(conn, recent_limit),
+        "call_history": _call_history(conn, phone_digits, None, 3),
+        "profile": profile_store.read_profile(conn, phone_digits),
+        "opportunity": _opportunity(conn, phone_digits),
+        "emails": _email_links(conn, phone_digits),
+        "emails_synced_at": _email_synced_at(conn, phone_digits),
+        "mirrored_emails": (
+            _mirrored_emails(conn, phone_digits, 5, mirror_max_age_s, mirror_mailboxes)
+            if mirror_max_age_s is not None
+            else None
+        ),
+    }
+
+
+def workspace_fields(phone_digits: str, recent_limit: int = 20) -> Dict[str, Any]:
+    # The parts of the workspace another process can edit, read together;
+    # used to refresh the open workspace from the change feed.
+    with _connect() as conn:
+        return {
+            "recent_calls": _recent_calls(conn, recent_limit),
+            "call_history": _call_history(conn, phone_digits, None, 3),
+            "profile": profile_store.read_profile(conn, phone_digits),
+            "opportunity": _opportunity(conn, phone_digits),
+        }
+
+
+def begin_incoming_call(
+    phone_digits: str,
+    existing_call_id: Optional[int] = None,
+    recent_limit: int = 20,
+    mirror_max_age_s: Optional[float] = None,
+    mirror_mailboxes: int = 1,
+) -> Dict[str, Any]:
+    # Everything POST /incoming_call needs before its first SSE emit, in one
+    # transaction: insert the call (unless the caller is already on an active
+    # call) and read the workspace back. Only the insert needs the writer.
+    # With mirror_max_age_s, emails are also looked up in the local Gmail
+    # mirror ("mirrored_emails" is None when the mirror can't be trusted, or
+    # covers fewer than mirror_mailboxes mailboxes).
+    if existing_call_id is not None:
+        with _connect() as conn:
+            return _incoming_call_bundle(
+                conn,
+                phone_digits,
+                existing_call_id,
+                recent_limit,
+                mirror_max_age_s,
+                mirror_mailboxes,
+            )
+    return _write(
+        _incoming_call_bundle,
+        phone_digits,
+        None,
+        recent_limit,
+        mirror_max_age_s,
+        mirror_mailboxes,
+    )
+
+
+def email_cache_state(
+    bundle: Dict[str, Any], ttl_s: float, now: Optional[datetime] = None
+) -> str:
+    # Stale-while-revalidate for POST /incoming_call, from a
+    # begin_incoming_call bundle. The cached links are shown either way:
+    #   "mirror"  the local Gmail mirror answered; it catches up in the background
+    #   "fresh"   the last search is younger than ttl_s; no new search
+    #   "stale"   searched before: search again, announce only a change
+    #   "missing" never searched (no email_sync_state row): search now
+    if bundle.get("mirrored_emails") is not None:
+        return "mirror"
+    synced_at = bundle.get("emails_synced_at")
+    if not synced_at:
+        return "missing"
+    try:
+        age_s = ((now or datetime.now()) - datetime.fromisoformat(synced_at)).total_seconds()
+    except ValueError:
+        return "stale"
+    return "fresh" if age_s < ttl_s else "stale"
+
+
+def _save_gmail_messages(
+    conn: sqlite3.Connection, mailbox_email: str, messages: List[Dict[str, Any]]
+) -> None:
+    now = _now_iso()
+    conn.executemany(
+        """
+        INSERT INTO gmail_messages
+        (mailbox_email, gmail_message_id, thread_id, internal_date, rfc_message_id,
+         subject, from_addr, date, snippet, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(mailbox_email, gmail_message_id) DO UPDATE SET
+            thread_id = excluded.thread_id,
+            internal_date = excluded.internal_date,
+            rfc_message_id = excluded.rfc_message_id,
+            subject = excluded.subject,
+            from_addr = excluded.from_addr,
+            date = excluded.date,
+            snippet = excluded.snippet,
+            synced_at = excluded.synced_at
+        """,
+        [
+            (
+                mailbox_email,
+                m["gmail_message_id"],
+                m.get("thread_id"),
+                m.get("internal_date"),
+                m.get("rfc_message_id"),
+                m.get("subject"),
+                m.get("from_addr"),
+                m.get("date"),
+                m.get("snippet"),
+                now,
+            )
+            for m in messages
+        ],
+    )
+    conn.executemany(
+        "DELETE FROM gmail_message_phones WHERE mailbox_email = ? AND gmail_message_id = ?",
+        [(mailbox_email, m["gmail_message_id"]) for m in messages],
+    )
+    conn.executemany(
+        """
+        INSERT OR IGNORE INTO gmail_message_phones
+        (last10, internal_date, mailbox_email, gmail_message_id)
+        VALUES (?, ?, ?, ?)
+        """,
+        [
+            (last10, m.get("internal_date"), mailbox_email, m["gmail_message_id"])
+            for m in messages
+            for last10 in m.get("phones", ())
+        ],
+    )
+
+
+def save_gmail_messages(mailbox_email: str, messages: List[Dict[str, Any]]) -> None:
+    if messages:
+        _write(_save_gmail_messages, mailbox_email, messages)
+
+
+def _delete_gmail_messages(
+    conn: sqlite3.Connection, mailbox_email: str, message_ids: List[str]
 ) -> None:
+    keys = [(mailbox_email, message_id) for message_id in message_ids]
+    conn.executemany(
+        "DELETE FROM gmail_message_phones WHERE mailbox_email = ? AND gmail_message_id = ?",
+        keys,
+    )
+    conn.executemany(
+        "DELETE FROM gmail_messages WHERE mailbox_email = ? AND gmail_message_id = ?",
+        keys,
+    )
+
+
+def delete_gmail_messages(mailbox_email: str, message_ids: List[str]) -> None:
+    if message_ids:
+        _write(_delete_gmail_messages, mailbox_email, message_ids)
+
+
+def _prune_gmail_messages(
+    conn: sqlite3.Connection, mailbox_email: str, synced_before: str
+) -> int:
+    # After a full sync, anything not seen during it has left the inbox.
+    conn.execute(
+        """
+        DELETE FROM gmail_message_phones
+        WHERE (mailbox_email, gmail_message_id) IN (
+            SELECT mailbox_email, gmail_message_id FROM gmail_messages
+            WHERE mailbox_email = ? AND synced_at < ?
+        )
+        """,
+        (mailbox_email, synced_before),
+    )
+    cur = conn.execute(
+        "DELETE FROM gmail_messages WHERE mailbox_email = ? AND synced_at < ?",
+        (mailbox_email, synced_before),
+    )
+    return int(cur.rowcount)
+
+
+def prune_gmail_messages(mailbox_email: str, synced_before: str) -> int:
+    return _write(_prune_gmail_messages, mailbox_email, synced_before)
+
+
+def get_gmail_sync_state(mailbox_email: str) -> Optional[Dict[str, Any]]:
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT * FROM gmail_sync_state WHERE mailbox_email = ?",
+            (mailbox_email,),
+        ).fetchone()
+        return dict(row) if row else None
+
+
+def _save_gmail_sync_state(
+    conn: sqlite3.Connection, mailbox_email: str, state: Dict[str, Any]
+) -> None:
+    conn.execute(
+        """
+        INSERT INTO gmail_sync_state
+        (mailbox_email, history_id, page_token, full_sync_started_at,
+         full_sync_completed_at, last_sync_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(mailbox_email) DO UPDATE SET
+            history_id = excluded.history_id,
+            page_token = excluded.page_token,
+            full_sync_started_at = excluded.full_sync_started_at,
+            full_sync_completed_at = excluded.full_sync_completed_at,
+            last_sync_at = excluded.last_sync_at
+        """,
+        (
+            mailbox_email,
+            state.get("history_id"),
+            state.get("page_token"),
+            state.get("full_sync_started_at"),
+            state.get("full_sync_completed_at"),
+            _now_iso(),
+        ),
+    )
+
+
+def save_gmail_sync_state(mailbox_email: str, state: Dict[str, Any]) -> None:
+    # Replaces the whole row; last_sync_at is stamped here.
+    _write(_save_gmail_sync_state, mailbox_email, state)
+
+
+def backfill_numbers(after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    # Known numbers in last10 order after the cursor: everything in calls
+    # (via number_stats) plus research profiles, each with the digits OnCall
+    # last posted for it (email_links is keyed by those) and when its links
+    # were last searched. Each source is read as a keyset page off its
+    # unique index, so a page costs O(limit) however many numbers exist.
+    after = after or ""
     with _connect() as conn:
-        conn.execute("DELETE FROM email_links WHERE phone_digits = ?", (phone_digits,))
-        for e in emails:
-            conn.execute(
-                """
-                INSERT INTO email_links
-                (opportunity_id, phone_digits, gmail_message_id, rfc_message_id, mailbox_email, account_index,
-                 subject, from_addr, date, snippet, gmail_link, is_pinned_jd)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    opportunity_id,
-                    phone_digits,
-                    e.get("gmail_message_id") or e.get("gmailMessageId"),
-                    e.get("rfc_message_id") or e.get("rfcMessageId"),
-                    e.get("mailbox_email") or e.get("mailboxEmail"),
-                    e.get("account_index") or e.get("accountIndex"),
-                    e.get("subject"),
-                    e.get("from"),
-                    e.get("date"),
-                    e.get("snippet"),
-                    e.get("link"),
-                    0,
-                ),
+        found: Dict[str, str] = {}
+        for row in conn.execute(
+            """
+            SELECT number_stats.last10, calls.phone_digits
+            FROM number_stats
+            LEFT JOIN calls ON calls.id = number_stats.latest_call_id
+            WHERE number_stats.last10 > ? AND length(number_stats.last10) = 10
+            ORDER BY number_stats.last10
+            LIMIT ?
+            """,
+            (after, limit),
+        ):
+            found[row[0]] = row[1] or row[0]
+        for row in conn.execute(
+            """
+            SELECT phone_digits FROM research_profiles
+            WHERE phone_digits > ? AND length(phone_digits) = 10
+            ORDER BY phone_digits
+            LIMIT ?
+            """,
+            (after, limit),
+        ):
+            found.setdefault(row[0], row[0])
+        numbers = []
+        for last10 in sorted(found)[:limit]:
+            numbers.append(
+                {
+                    "last10": last10,
+                    "phone_digits": found[last10],
+                    "synced_at": _email_synced_at(conn, found[last10]),
+                }
             )
-        conn.commit()
+        return numbers
 
 
-def list_email_links(phone_digits: str) -> List[Dict[str, Any]]:
+def get_backfill_state() -> Dict[str, Any]:
     with _connect() as conn:
-        rows = conn.execute(
-            "SELECT * FROM email_links WHERE phone_digits = ? ORDER BY id DESC",
-            (phone_digits,),
-        ).fetchall()
-        return [dict(row) for row in rows]
+        row = conn.execute("SELECT * FROM gmail_backfill_state WHERE id = 1").fetchone()
+        return dict(row) if row else {}
+
+
+def _save_backfill_state(conn: sqlite3.Connection, state: Dict[str, Any]) -> None:
+    conn.execute(
+        """
+        INSERT INTO gmail_backfill_state
+        (id, cursor, pass_started_at, pass_completed_at, numbers_searched, updated_at)
+        VALUES (1, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            cursor = excluded.cursor,
+            pass_started_at = excluded.pass_started_at,
+            pass_completed_at = excluded.pass_completed_at,
+            numbers_searched = excluded.numbers_searched,
+            updated_at = excluded.updated_at
+        """,
+        (
+            state.get("cursor"),
+            state.get("pass_started_at"),
+            state.get("pass_completed_at"),
+            int(state.get("numbers_searched") or 0),
+            _now_iso(),
+        ),
+    )
+
+
+def save_backfill_state(state: Dict[str, Any]) -> None:
+    _write(_save_backfill_state, state)
+
+
+def email_message_mailbox(gmail_message_id: str) -> Optional[str]:
+    # Which mailbox a message id came from, as far as the cache knows.
+    with _connect() as conn:
+        row = conn.execute(
+            """
+            SELECT mailbox_email FROM email_links
+            WHERE gmail_message_id = ? AND mailbox_email IS NOT NULL
+            UNION ALL
+            SELECT mailbox_email FROM gmail_messages WHERE gmail_message_id = ?
+            LIMIT 1
+            """,
+            (gmail_message_id, gmail_message_id),
+        ).fetchone()
+        return str(row[0]) if row else None
+
+
+def _touch_email_body(conn: sqlite3.Connection, sha256: str) -> None:
+    conn.execute(
+        "UPDATE email_body_blobs SET last_access_at = ? WHERE sha256 = ?",
+        (_now_iso(), sha256),
+    )
+
+
+def get_email_body(
+    gmail_message_id: str, mailbox_email: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    with _connect() as conn:
+        row = conn.execute(
+            """
+            SELECT e.mailbox_email, e.sha256, e.fetched_at, b.body
+            FROM email_bodies AS e
+            JOIN email_body_blobs AS b ON b.sha256 = e.sha256
+            WHERE e.gmail_message_id = ? AND (? IS NULL OR e.mailbox_email = ?)
+            LIMIT 1
+            """,
+            (gmail_message_id, mailbox_email, mailbox_email),
+        ).fetchone()
+    if row is None:
+        return None
+    # The LRU bump need not hold up the read.
+    get_write_queue(DB_PATH).submit(_touch_email_body, row["sha256"])
+    return {
+        "mailbox_email": row["mailbox_email"],
+        "sha256": row["sha256"],
+        "fetched_at": row["fetched_at"],
+        "text": zlib.decompress(row["body"]).decode("utf-8"),
+    }
+
+
+def _save_email_body(
+    conn: sqlite3.Connection,
+    mailbox_email: str,
+    gmail_message_id: str,
+    text: str,
+    max_cache_bytes: int,
+) -> int:
+    raw = text.encode("utf-8")
+    sha256 = hashlib.sha256(raw).hexdigest()
+    blob = zlib.compress(raw, 6)
+    now = _now_iso()
+    conn.execute(
+        """
+        INSERT INTO email_body_blobs
+        (sha256, body, size, stored_size, created_at, last_access_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(sha256) DO UPDATE SET last_access_at = excluded.last_access_at
+        """,
+        (sha256, blob, len(raw), len(blob), now, now),
+    )
+    conn.execute(
+        """
+        INSERT INTO email_bodies (mailbox_email, gmail_message_id, sha256, fetched_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(mailbox_email, gmail_message_id) DO UPDATE SET
+            sha256 = excluded.sha256,
+            fetched_at = excluded.fetched_at
+        """,
+        (mailbox_email, gmail_message_id, sha256, now),
+    )
+    # Keep the most recently read blobs that fit in max_cache_bytes.
+    evicted = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT sha256 FROM (
+                SELECT sha256, SUM(stored_size) OVER (
+                    ORDER BY last_access_at DESC, sha256 DESC
+                ) AS running
+                FROM email_body_blobs
+            )
+            WHERE running > ? AND sha256 != ?
+            """,
+            (max_cache_bytes, sha256),
+        )
+    ]
+    if evicted:
+        shas = json.dumps(evicted)
+        conn.execute(
+            "DELETE FROM email_bodies WHERE sha256 IN (SELECT value FROM json_each(?))",
+            (shas,),
+        )
+        conn.execute(
+            "DELETE FROM email_body_blobs WHERE sha256 IN (SELECT value FROM json_each(?))",
+            (shas,),
+        )
+    return len(evicted)
+
+
+def save_email_body(
+    mailbox_email: str, gmail_message_id: str, text: str, max_cache_bytes: int
+) -> int:
+    # Returns how many cached bodies were evicted to make room.
+    return _write(_save_email_body, mailbox_email, gmail_message_id, text, max_cache_bytes)
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from ndm_oncall import db, gmail_sync
+from ndm_oncall.gmail_client import search_all
+from ndm_oncall.gmail_quota import BACKGROUND
+
+logger = logging.getLogger("gmail_backfill")
+
+BACKFILL_ENABLED = os.getenv("NDM_GMAIL_BACKFILL", "1").strip() != "0"
+# At most one number per interval, on top of the background quota priority.
+BACKFILL_INTERVAL_S = float(os.getenv("NDM_GMAIL_BACKFILL_INTERVAL_S", "3"))
+BACKFILL_BATCH = 50
+# Numbers searched (by a call or an earlier pass) this recently are skipped.
+BACKFILL_REFRESH_S = 24 * 3600
+# A finished pass starts over after this long.
+BACKFILL_PASS_INTERVAL_S = 6 * 3600
+# Each incoming call pauses the job for this long.
+BACKFILL_CALL_PAUSE_S = 180
+
+
+def phone_variants(digits: str) -> List[str]:
+    # Same variants chrome_extension/content.js sends with a call.
+    last10 = digits[-10:] if len(digits) >= 10 else digits
+    variants = [digits, last10]
+    if len(last10) == 10:
+        area, mid, last = last10[:3], last10[3:6], last10[6:]
+        variants += [
+            f"{area}-{mid}-{last}",
+            f"({area}) {mid}-{last}",
+            f"+1 {area}-{mid}-{last}",
+            f"+1 ({area}) {mid}-{last}",
+        ]
+    return list(dict.fromkeys(v for v in variants if v))
+
+
+def variants_query(digits: str) -> str:
+    quoted = " OR ".join(f'"{v}"' for v in phone_variants(digits))
+    return f"in:inbox ({quoted})" if quoted else "in:inbox"
+
+
+def _older_than(value: Optional[str], seconds: float) -> bool:
+    if not value:
+        return True
+    try:
+        return datetime.fromisoformat(value) < datetime.now() - timedelta(seconds=seconds)
+    except ValueError:
+        return True
+
+
+class GmailBackfill:
+    # Walks every known number (calls + research_profiles, in last10 order)
+    # and merges its Gmail results into email_links, so workspaces have
+    # emails before the number ever calls again. The cursor lives in
+    # gmail_backfill_state, so a restart resumes where it stopped. Searches
+    # run at BACKGROUND quota priority, one per BACKFILL_INTERVAL_S, and
+    # the job pauses while a call is coming in. When the inbox mirror is
+    # complete the number is answered from it instead of the API.
+
+    def __init__(self, interval_s: float = BACKFILL_INTERVAL_S) -> None:
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._resume = threading.Event()
+        self._resume.set()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"searched": 0, "from_mirror": 0, "skipped": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="gmail-backfill", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._resume.set()
+
+    def pause(self, seconds: float = BACKFILL_CALL_PAUSE_S) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._resume.clear()
+
+    def resume(self) -> None:
+        with self._lock:
+            self._paused_until = 0.0
+            self._resume.set()
+
+    def _wait_if_paused(self) -> None:
+        while not self._stop.is_set():
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+                if remaining <= 0:
+                    self._resume.set()
+                    return
+            self._resume.wait(remaining)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                idle_s = self._step()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("GMAIL_BACKFILL_FAILED %s", exc)
+                idle_s = 60.0
+            if idle_s:
+                self._stop.wait(idle_s)
+
+    def _step(self) -> float:
+        # Processes one batch; returns how long to idle before the next.
+        state = db.get_backfill_state()
+        if not state.get("cursor") and state.get("pass_completed_at"):
+            if not _older_than(state["pass_completed_at"], BACKFILL_PASS_INTERVAL_S):
+                return 600.0
+            state = {}
+        if not state.get("pass_started_at"):
+            state = {"pass_started_at": datetime.now().isoformat(), "numbers_searched": 0}
+            logger.info("GMAIL_BACKFILL_PASS_STARTED")
+
+        numbers = db.backfill_numbers(state.get("cursor"), BACKFILL_BATCH)
+        if not numbers:
+            state.update(cursor=None, pass_completed_at=datetime.now().isoformat())
+            db.save_backfill_state(state)
+            logger.info(
+                "GMAIL_BACKFILL_PASS_DONE searched=%s", state.get("numbers_searched", 0)
+            )
+            return 0.0
+
+        for number in numbers:
+            self._wait_if_paused()
+            if self._stop.is_set():
+                return 0.0
+            if _older_than(number["synced_at"], BACKFILL_REFRESH_S):
+                source = self._backfill_one(number["phone_digits"])
+                if source is None:
+                    # Keep the cursor on this number and retry later.
+                    return 60.0
+                state["numbers_searched"] = int(state.get("numbers_searched") or 0) + 1
+                if source == "api":
+                    self._stop.wait(self.interval_s)
+            else:
+                self._count("skipped")
+            state["cursor"] = number["last10"]
+            db.save_backfill_state(state)
+        return 0.0
+
+    def _backfill_one(self, phone_digits: str) -> Optional[str]:
+        # Returns where the results came from ("mirror" / "api"), or None if
+        # the search failed.
+        mailboxes = gmail_sync.mailbox_count()
+        results = None
+        if gmail_sync.all_running():
+            results = db.find_mirrored_emails(
+                phone_digits, 5, gmail_sync.MIRROR_MAX_AGE_S, mailboxes
+            )
+        complete = True
+        source = "mirror"
+        if results is not None:
+            self._count("from_mirror")
+        else:
+            source = "api"
+            try:
+                results, complete = search_all(variants_query(phone_digits), 5, BACKGROUND)
+            except Exception as exc:  # noqa: BLE001
+                self._count("failed")
+                logger.warning("GMAIL_BACKFILL_SEARCH_FAILED digits=%s %s", phone_digits, exc)
+                return None
+            self._count("searched")
+        changed = db.save_email_links(phone_digits, results, prune=complete)
+        logger.info(
+            "GMAIL_BACKFILL digits=%s source=%s count=%d changed=%s",
+            phone_digits,
+            source,
+            len(results),
+            changed,
+        )
+        return source
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            paused_s = max(0.0, self._paused_until - time.monotonic())
+            return {**self._counters, "running": self.running, "paused_s": round(paused_s, 1)}
+
+
+_BACKFILL: Optional[GmailBackfill] = None
+_BACKFILL_LOCK = threading.Lock()
+
+
+def get_backfill() -> GmailBackfill:
+    global _BACKFILL
+    with _BACKFILL_LOCK:
+        if _BACKFILL is None:
+            _BACKFILL = GmailBackfill()
+        return _BACKFILL
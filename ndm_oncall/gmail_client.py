@@ -1,28 +1,63 @@
 from __future__ import annotations
 
+import base64
+import logging
 import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from html.parser import HTMLParser
+from pathlib import Path
 
-from ndm_oncall.app_paths import get_credentials_path, get_token_path
-from typing import Dict, List, Optional
+from ndm_oncall.app_paths import get_credentials_path, get_extra_token_paths, get_token_path
+from ndm_oncall.gmail_quota import QuotaScheduler, is_rate_limit, request_units
+from typing import Any, Dict, List, Optional, Tuple
 
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+logger = logging.getLogger("gmail_client")
 
 SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 
 DEFAULT_CREDENTIALS_PATH = str(get_credentials_path())
 DEFAULT_TOKEN_PATH = str(get_token_path())
 
-_MAILBOX_EMAIL: Optional[str] = None
-_ACCOUNT_INDEX: str = ""
+HTTP_TIMEOUT_S = 15
+# Refresh this long before expiry, i.e. before google-auth would start
+# refreshing inline on the request path.
+REFRESH_MARGIN_S = 300
+REFRESH_RETRY_S = 30
 
+# Gmail recommends at most 50 calls per batch request.
+BATCH_LIMIT = 50
+# Used when a batch request fails or drops individual calls.
+METADATA_WORKERS = 4
+METADATA_HEADERS = ["Subject", "From", "Date", "Message-Id"]
+# Longer bodies are cut; the cache is for reading a JD, not archiving.
+BODY_MAX_CHARS = 200_000
 
-def get_gmail_service(
-    credentials_path: str = DEFAULT_CREDENTIALS_PATH,
-    token_path: str = DEFAULT_TOKEN_PATH,
-):
+# Points the client at another Gmail-compatible server (e.g. tests/fake_gmail.py)
+# with anonymous credentials instead of the OAuth token. A comma-separated
+# list stands in for several mailboxes.
+API_ENDPOINTS = [
+    e.strip() for e in os.getenv("NDM_GMAIL_API_ENDPOINT", "").split(",") if e.strip()
+]
+API_ENDPOINT = API_ENDPOINTS[0] if API_ENDPOINTS else ""
+# Mailboxes searched at once per incoming call.
+MAILBOX_WORKERS = 4
+
+
+def _load_credentials(credentials_path: str, token_path: str) -> Credentials:
     creds: Optional[Credentials] = None
 
     if os.path.exists(token_path):
@@ -36,12 +71,370 @@ def get_gmail_service(
                 credentials_path, SCOPES
             )
             creds = flow.run_local_server(port=0)
+        _write_token(token_path, creds)
+    return creds
+
+
+def _write_token(token_path: str, creds: Credentials) -> None:
+    tmp_path = f"{token_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as token_file:
+        token_file.write(creds.to_json())
+    os.replace(tmp_path, token_path)
+
+
+class GmailClient:
+    # Long-lived Gmail API client shared by every search. Credentials and the
+    # service object (built from the discovery document bundled with
+    # google-api-python-client, so no network fetch) are created once on
+    # first use; a daemon thread refreshes the token ahead of expiry.
+    # httplib2 connections are not thread-safe, so each thread executes
+    # requests through its own AuthorizedHttp over the shared credentials.
+
+    def __init__(
+        self,
+        credentials_path: str = DEFAULT_CREDENTIALS_PATH,
+        token_path: str = DEFAULT_TOKEN_PATH,
+        api_endpoint: str = API_ENDPOINT,
+        account_index: Optional[str] = None,
+    ) -> None:
+        self.credentials_path = credentials_path
+        self.token_path = token_path
+        self.api_endpoint = api_endpoint
+        # None: the primary mailbox, whose index comes from
+        # NDM_GMAIL_ACCOUNT_INDEX.
+        self._account_index = account_index
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._creds: Optional[Credentials] = None
+        self._service: Any = None
+        self._mailbox_email: Optional[str] = None
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # Every API call, batches included, goes through the quota scheduler.
+        self.scheduler = QuotaScheduler()
+
+    def _ensure_ready(self) -> None:
+        if self._service is not None:
+            return
+        with self._lock:
+            if self._service is not None:
+                return
+            if self.api_endpoint:
+                creds = AnonymousCredentials()
+                self._creds = creds
+                self._service = build(
+                    "gmail",
+                    "v1",
+                    credentials=creds,
+                    static_discovery=True,
+                    client_options={"api_endpoint": self.api_endpoint},
+                )
+                return
+            creds = _load_credentials(self.credentials_path, self.token_path)
+            self._creds = creds
+            self._service = build(
+                "gmail", "v1", credentials=creds, static_discovery=True
+            )
+            if creds.refresh_token and self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name="gmail-token-refresh", daemon=True
+                )
+                self._refresher.start()
+
+    @property
+    def service(self) -> Any:
+        self._ensure_ready()
+        return self._service
+
+    def _http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self._creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_S))
+            self._local.http = http
+        return http
+
+    def execute(self, request: Any, priority: Optional[int] = None) -> Dict[str, Any]:
+        self._ensure_ready()
+        return self.scheduler.call(
+            lambda: request.execute(http=self._http()),
+            request_units(request),
+            priority,
+            label=getattr(request, "methodId", "") or "",
+        )
+
+    def _seconds_until_refresh(self) -> float:
+        creds = self._creds
+        if creds is None or creds.expiry is None:
+            return float(REFRESH_MARGIN_S)
+        # google-auth keeps expiry as naive UTC.
+        remaining = (creds.expiry - datetime.utcnow()).total_seconds()
+        return max(0.0, remaining - REFRESH_MARGIN_S)
+
+    def _refresh_loop(self) -> None:
+        delay = self._seconds_until_refresh()
+        while not self._stop.wait(delay):
+            delay = self._seconds_until_refresh()
+            if delay > 0 or self._creds.expiry is None:
+                continue
+            try:
+                with self._lock:
+                    self._creds.refresh(Request())
+                    _write_token(self.token_path, self._creds)
+                logger.info("GMAIL_TOKEN_REFRESHED expiry=%s", self._creds.expiry)
+                delay = self._seconds_until_refresh()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("GMAIL_TOKEN_REFRESH_FAILED %s", exc)
+                delay = REFRESH_RETRY_S
+
+    def get_profile(self) -> Dict[str, Any]:
+        profile = self.execute(self.service.users().getProfile(userId="me"))
+        self._mailbox_email = profile.get("emailAddress", "") or ""
+        return profile
+
+    @property
+    def account_index(self) -> str:
+        if self._account_index is not None:
+            return self._account_index
+        return os.getenv("NDM_GMAIL_ACCOUNT_INDEX", "").strip()
+
+    def get_mailbox_context(self) -> tuple[str, str]:
+        if self._mailbox_email is None:
+            self.get_profile()
+        return self._mailbox_email, self.account_index
+
+    def cached_mailbox_context(self) -> Optional[tuple[str, str]]:
+        # No I/O: safe to call from the event loop.
+        if self._mailbox_email is None:
+            return None
+        return self._mailbox_email, self.account_index
+
+    def _new_batch(self, callback: Any) -> BatchHttpRequest:
+        # new_batch_http_request() always targets the discovery rootUrl, so
+        # an overridden endpoint needs its batch URI spelled out.
+        if self.api_endpoint:
+            return BatchHttpRequest(
+                callback=callback, batch_uri=f"{self.api_endpoint.rstrip('/')}/batch"
+            )
+        return self.service.new_batch_http_request(callback=callback)
+
+    def _metadata_request(self, msg_id: str) -> Any:
+        return self.service.users().messages().get(
+            userId="me", id=msg_id, format="metadata", metadataHeaders=METADATA_HEADERS
+        )
+
+    def _fetch_one(self, msg_id: str, priority: Optional[int] = None) -> Dict[str, Any]:
+        return self.execute(self._metadata_request(msg_id), priority)
+
+    def _fetch_one_or_none(
+        self, msg_id: str, priority: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            return self._fetch_one(msg_id, priority)
+        except HttpError as exc:
+            if exc.resp.status == 404:
+                return None
+            raise
+
+    def fetch_metadata(
+        self, msg_ids: List[str], skip_missing: bool = False
+    ) -> List[Optional[Dict[str, Any]]]:
+        # One batch round trip per BATCH_LIMIT ids. Anything the batch did not
+        # return (batching unavailable, or a per-call error such as a rate
+        # limit) is fetched individually over a small thread pool. The result
+        # is in msg_ids order; with skip_missing, messages deleted in the
+        # meantime come back as None instead of raising.
+        self._ensure_ready()
+        # Pool threads do not inherit the caller's priority context.
+        priority = self.scheduler.current_priority()
+        fetch_one = partial(
+            self._fetch_one_or_none if skip_missing else self._fetch_one, priority=priority
+        )
+        details: Dict[int, Optional[Dict[str, Any]]] = {}
+        if len(msg_ids) > 1:
+            for start in range(0, len(msg_ids), BATCH_LIMIT):
+                chunk = msg_ids[start : start + BATCH_LIMIT]
+
+                rate_limited: List[bool] = []
+
+                def collect(request_id: str, response: Any, exception: Any) -> None:
+                    if exception is None:
+                        details[int(request_id)] = response
+                    elif is_rate_limit(exception):
+                        rate_limited.append(True)
+
+                batch = self._new_batch(collect)
+                units = 0
+                for offset, msg_id in enumerate(chunk):
+                    request = self._metadata_request(msg_id)
+                    units += request_units(request)
+                    batch.add(request, request_id=str(start + offset))
+                try:
+                    self.scheduler.call(
+                        partial(batch.execute, http=self._http()),
+                        units,
+                        priority,
+                        label="batch",
+                        # Calls the batch misses are retried individually
+                        # below, so do not sit on a failing batch endpoint.
+                        max_retries=1,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("GMAIL_BATCH_FAILED size=%d %s", len(chunk), exc)
+                if rate_limited:
+                    # The fallback below retries those calls one by one, so
+                    # let the quota recover first.
+                    delay = self.scheduler.throttle()
+                    logger.warning(
+                        "GMAIL_BATCH_THROTTLED calls=%d pause=%.2fs", len(rate_limited), delay
+                    )
+
+        missing = [i for i in range(len(msg_ids)) if i not in details]
+        if len(missing) == 1:
+            details[missing[0]] = fetch_one(msg_ids[missing[0]])
+        elif missing:
+            if len(msg_ids) > 1:
+                logger.info("GMAIL_METADATA_FALLBACK count=%d", len(missing))
+            pool = self._metadata_pool()
+            for i, detail in zip(missing, pool.map(fetch_one, [msg_ids[i] for i in missing])):
+                details[i] = detail
+        return [details[i] for i in range(len(msg_ids))]
+
+    def fetch_body(self, msg_id: str, priority: Optional[int] = None) -> str:
+        # Plain text of one message: its text/plain part, or the text/html
+        # part with the markup stripped.
+        detail = self.execute(
+            self.service.users().messages().get(userId="me", id=msg_id, format="full"),
+            priority,
+        )
+        return _message_text(detail.get("payload", {}))[:BODY_MAX_CHARS]
+
+    def _metadata_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=METADATA_WORKERS, thread_name_prefix="gmail-metadata"
+                )
+            return self._pool
+
+    def search_messages(
+        self, query: str, max_results: int = 5, priority: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        return [
+            summary for _, summary in self.search_messages_dated(query, max_results, priority)
+        ]
+
+    def search_messages_dated(
+        self, query: str, max_results: int = 5, priority: Optional[int] = None
+    ) -> List[Tuple[int, Dict[str, str]]]:
+        # (internalDate in ms, summary) pairs, so results from several
+        # mailboxes can be merged by date without widening the summary dict.
+        if priority is not None:
+            with self.scheduler.priority(priority):
+                return self.search_messages_dated(query, max_results)
+        mailbox_email, account_index = self.get_mailbox_context()
+
+        resp = self.execute(
+            self.service.users().messages().list(userId="me", q=query, maxResults=max_results)
+        )
+
+        msg_ids = [msg["id"] for msg in resp.get("messages", []) if msg.get("id")]
+        return [
+            (
+                int(detail.get("internalDate") or 0),
+                _message_summary(detail, mailbox_email, account_index),
+            )
+            for detail in self.fetch_metadata(msg_ids)
+        ]
+
+    @property
+    def has_credentials(self) -> bool:
+        # False means first use would start the interactive OAuth flow.
+        return bool(self.api_endpoint) or os.path.exists(self.token_path)
+
+    def warm_up(self) -> None:
+        # Only with a saved token: the interactive OAuth flow should still
+        # wait for the first real search.
+        if not self.has_credentials:
+            return
+        try:
+            self.get_mailbox_context()
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("GMAIL_WARM_UP_FAILED %s", exc)
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
 
-        with open(token_path, "w", encoding="utf-8") as token_file:
-            token_file.write(creds.to_json())
 
-    service = build("gmail", "v1", credentials=creds, cache_discovery=False)
-    return service
+_CLIENT: Optional[GmailClient] = None
+_CLIENT_LOCK = threading.Lock()
+_CLIENTS: Optional[List[GmailClient]] = None
+_CLIENTS_LOCK = threading.Lock()
+_MAILBOX_POOL: Optional[ThreadPoolExecutor] = None
+
+
+def get_client() -> GmailClient:
+    # The primary mailbox (token.json).
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = GmailClient()
+        return _CLIENT
+
+
+def get_clients() -> List[GmailClient]:
+    # The primary mailbox plus one client per token_<N>.json found at first
+    # use (restart to pick up a newly added account).
+    global _CLIENTS
+    primary = get_client()
+    with _CLIENTS_LOCK:
+        if _CLIENTS is None:
+            clients = [primary]
+            if API_ENDPOINTS:
+                clients += [
+                    GmailClient(api_endpoint=endpoint, account_index=str(index))
+                    for index, endpoint in enumerate(API_ENDPOINTS[1:], start=1)
+                ]
+            else:
+                clients += [
+                    GmailClient(token_path=str(path), account_index=index)
+                    for index, path in get_extra_token_paths()
+                ]
+            _CLIENTS = clients
+        return _CLIENTS
+
+
+def close_clients() -> None:
+    global _MAILBOX_POOL
+    for client in list(_CLIENTS or [get_client()]):
+        client.close()
+    with _CLIENTS_LOCK:
+        pool, _MAILBOX_POOL = _MAILBOX_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _mailbox_pool() -> ThreadPoolExecutor:
+    global _MAILBOX_POOL
+    with _CLIENTS_LOCK:
+        if _MAILBOX_POOL is None:
+            _MAILBOX_POOL = ThreadPoolExecutor(
+                max_workers=MAILBOX_WORKERS, thread_name_prefix="gmail-mailbox"
+            )
+        return _MAILBOX_POOL
+
+
+def get_gmail_service(
+    credentials_path: str = DEFAULT_CREDENTIALS_PATH,
+    token_path: str = DEFAULT_TOKEN_PATH,
+):
+    if credentials_path == DEFAULT_CREDENTIALS_PATH and token_path == DEFAULT_TOKEN_PATH:
+        return get_client().service
+    return GmailClient(credentials_path, token_path).service
 
 
 def _header_value(headers: List[Dict[str, str]], name: str) -> str:
@@ -51,71 +444,174 @@ def _header_value(headers: List[Dict[str, str]], name: str) -> str:
     return ""
 
 
-def search_messages(query: str, max_results: int = 5) -> List[Dict[str, str]]:
-    service = get_gmail_service()
-    mailbox_email, account_index = get_mailbox_context(service)
-
-    resp = (
-        service.users()
-        .messages()
-        .list(userId="me", q=query, maxResults=max_results)
-        .execute()
-    )
+def _message_summary(
+    detail: Dict[str, Any], mailbox_email: str, account_index: str
+) -> Dict[str, str]:
+    headers = detail.get("payload", {}).get("headers", [])
+    return {
+        "subject": _header_value(headers, "Subject"),
+        "from": _header_value(headers, "From"),
+        "date": _header_value(headers, "Date"),
+        "snippet": detail.get("snippet", ""),
+        "gmail_message_id": detail.get("id", ""),
+        "rfc_message_id": _header_value(headers, "Message-Id"),
+        "mailbox_email": mailbox_email,
+        "account_index": account_index,
+        "link": "",
+    }
+
 
-    messages = resp.get("messages", [])
-    results: List[Dict[str, str]] = []
+def _decode_part(part: Dict[str, Any]) -> str:
+    data = part.get("body", {}).get("data")
+    if not data:
+        return ""
+    raw = base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+    return raw.decode("utf-8", "replace")
 
-    for msg in messages:
-        msg_id = msg.get("id")
-        if not msg_id:
+
+def _message_text(payload: Dict[str, Any]) -> str:
+    plain: List[str] = []
+    rich: List[str] = []
+    stack = [payload]
+    while stack:
+        part = stack.pop(0)
+        mime = (part.get("mimeType") or "").lower()
+        if part.get("parts"):
+            stack[:0] = part["parts"]
+        elif part.get("filename"):
             continue
+        elif mime == "text/plain":
+            plain.append(_decode_part(part))
+        elif mime == "text/html":
+            rich.append(_html_to_text(_decode_part(part)))
+    text = "\n\n".join(t for t in (plain or rich) if t.strip())
+    return re.sub(r"\n{3,}", "\n\n", text.replace("\r\n", "\n")).strip()
+
+
+class _TextExtractor(HTMLParser):
+    _BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "table", "ul", "ol"}
+    _SKIP = {"script", "style", "head", "title"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.chunks: List[str] = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag: str, attrs: Any) -> None:
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCK:
+            self.chunks.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self._BLOCK:
+            self.chunks.append("\n")
 
-        detail = (
-            service.users()
-            .messages()
-            .get(
-                userId="me",
-                id=msg_id,
-                format="metadata",
-                metadataHeaders=["Subject", "From", "Date", "Message-Id"],
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self.chunks.append(data)
+
+
+def _html_to_text(markup: str) -> str:
+    parser = _TextExtractor()
+    parser.feed(markup)
+    parser.close()
+    lines = (re.sub(r"[ \t\xa0]+", " ", line).strip() for line in "".join(parser.chunks).split("\n"))
+    return "\n".join(lines)
+
+
+def merge_results(
+    per_mailbox: List[List[Tuple[int, Dict[str, Any]]]], max_results: int
+) -> List[Dict[str, Any]]:
+    # Newest first across mailboxes (by internalDate, see
+    # search_messages_dated); a message delivered to several of them is kept
+    # once: the newest copy, or on equal dates the one from the first
+    # mailbox in client order (the sort is stable).
+    merged = sorted(
+        (pair for results in per_mailbox for pair in results),
+        key=lambda pair: pair[0],
+        reverse=True,
+    )
+    seen = set()
+    unique = []
+    for _, item in merged:
+        key = item.get("rfc_message_id") or (item.get("mailbox_email"), item.get("gmail_message_id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+    return unique[:max_results]
+
+
+def search_messages(query: str, max_results: int = 5) -> List[Dict[str, str]]:
+    return get_client().search_messages(query, max_results)
+
+
+def search_all(
+    query: str, max_results: int = 5, priority: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    # Searches every mailbox concurrently, so latency is that of the slowest
+    # one. The flag is False when some mailbox failed: its previously cached
+    # links are then not known to be gone. Raises only if all of them fail.
+    clients = get_clients()
+    if len(clients) == 1:
+        return clients[0].search_messages(query, max_results, priority), True
+    pool = _mailbox_pool()
+    futures = [
+        pool.submit(client.search_messages_dated, query, max_results, priority)
+        for client in clients
+    ]
+    per_mailbox = []
+    errors = []
+    for client, future in zip(clients, futures):
+        try:
+            per_mailbox.append(future.result())
+        except Exception as exc:  # noqa: BLE001
+            logger.warning(
+                "GMAIL_MAILBOX_SEARCH_FAILED account_index=%s %s", client.account_index, exc
             )
-            .execute()
-        )
+            errors.append(exc)
+    if not per_mailbox:
+        raise errors[0]
+    return merge_results(per_mailbox, max_results), not errors
 
-        headers = detail.get("payload", {}).get("headers", [])
-        subject = _header_value(headers, "Subject")
-        sender = _header_value(headers, "From")
-        date = _header_value(headers, "Date")
-        rfc_message_id = _header_value(headers, "Message-Id")
-        snippet = detail.get("snippet", "")
-
-        results.append(
-            {
-                "subject": subject,
-                "from": sender,
-                "date": date,
-                "snippet": snippet,
-                "gmail_message_id": msg_id,
-                "rfc_message_id": rfc_message_id,
-                "mailbox_email": mailbox_email,
-                "account_index": account_index,
-                "link": "",
-            }
-        )
 
-    return results
+def client_for_mailbox(mailbox_email: Optional[str]) -> GmailClient:
+    # Falls back to the primary mailbox for unknown or missing addresses.
+    if mailbox_email:
+        for client in get_clients():
+            context = client.cached_mailbox_context()
+            if context is not None and context[0].lower() == mailbox_email.lower():
+                return client
+    return get_client()
+
+
+def warm_up_all() -> None:
+    for client in get_clients():
+        client.warm_up()
 
 
 def get_mailbox_context(service=None) -> tuple[str, str]:
-    global _MAILBOX_EMAIL, _ACCOUNT_INDEX
-    if _MAILBOX_EMAIL is None:
-        if service is None:
-            service = get_gmail_service()
-        profile = service.users().getProfile(userId="me").execute()
-        _MAILBOX_EMAIL = profile.get("emailAddress", "") or ""
-    if not _ACCOUNT_INDEX:
-        _ACCOUNT_INDEX = os.getenv("NDM_GMAIL_ACCOUNT_INDEX", "").strip()
-    return _MAILBOX_EMAIL or "", _ACCOUNT_INDEX
+    # `service` is accepted for backwards compatibility; the shared client
+    # already holds one.
+    return get_client().get_mailbox_context()
+
+
+def cached_mailbox_context() -> Optional[tuple[str, str]]:
+    return get_client().cached_mailbox_context()
+
+
+def cached_mailbox_contexts() -> Dict[str, str]:
+    # mailbox_email -> account_index for every client that knows its mailbox
+    # already. No I/O, and no token discovery before get_clients() ran.
+    contexts = {}
+    for client in list(_CLIENTS or [get_client()]):
+        context = client.cached_mailbox_context()
+        if context is not None:
+            contexts[context[0]] = context[1]
+    return contexts
 
 
 def test_search():
@@ -124,7 +620,20 @@ def test_search():
     return results
 
 
+def add_account(account_index: str) -> str:
+    # Runs the OAuth flow for another mailbox and stores its token as
+    # token_<account_index>.json, picked up by get_clients() on next start.
+    token_path = str(Path(DEFAULT_TOKEN_PATH).with_name(f"token_{int(account_index)}.json"))
+    client = GmailClient(token_path=token_path, account_index=str(int(account_index)))
+    return client.get_mailbox_context()[0]
+
+
 if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) == 3 and sys.argv[1] == "add-account":
+        print(f"Added {add_account(sys.argv[2])} as account {sys.argv[2]}")
+        sys.exit(0)
     print("Running Gmail test search...")
     results = test_search()
     print(f"Results: {len(results)}")
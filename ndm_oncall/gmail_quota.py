@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger("gmail_quota")
+
+T = TypeVar("T")
+
+INTERACTIVE = 0
+BACKGROUND = 1
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+# Gmail's per-user limit is 15,000 quota units per minute.
+QUOTA_UNITS_PER_S = float(os.getenv("NDM_GMAIL_QUOTA_UNITS_PER_S", "250"))
+# Share of the bucket background work may not dip into, so an incoming call
+# always finds budget for its search.
+INTERACTIVE_RESERVE = 0.25
+
+# https://developers.google.com/gmail/api/reference/quota
+QUOTA_UNITS = {
+    "gmail.users.getProfile": 1,
+    "gmail.users.history.list": 2,
+    "gmail.users.messages.list": 5,
+    "gmail.users.messages.get": 5,
+    "gmail.users.messages.attachments.get": 5,
+    "gmail.users.threads.get": 10,
+}
+DEFAULT_UNITS = 5
+
+MAX_RETRIES = 5
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 32.0
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+def request_units(request: Any) -> int:
+    return QUOTA_UNITS.get(getattr(request, "methodId", None) or "", DEFAULT_UNITS)
+
+
+def is_rate_limit(exc: BaseException) -> bool:
+    if not isinstance(exc, HttpError):
+        return False
+    if exc.resp.status == 429:
+        return True
+    if exc.resp.status != 403:
+        return False
+    content = exc.content.decode("utf-8", "replace") if exc.content else ""
+    return any(reason in content for reason in _RATE_LIMIT_REASONS)
+
+
+def _retry_after_s(exc: HttpError) -> float:
+    try:
+        return max(0.0, float(exc.resp.get("retry-after", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class QuotaScheduler:
+    # Token bucket in Gmail quota units shared by every thread that talks to
+    # the API. Waiters are served strictly by (priority, arrival): background
+    # callers (mirror sync, backfill) queue behind any interactive one and
+    # may not spend the last INTERACTIVE_RESERVE of the bucket. Calls failing
+    # with 429 / rate-limit 403 / 5xx are retried with jittered exponential
+    # backoff; a rate limit also pauses the whole bucket for that long,
+    # since every caller shares the same per-user quota.
+
+    def __init__(
+        self,
+        units_per_s: float = QUOTA_UNITS_PER_S,
+        capacity: Optional[float] = None,
+        max_retries: int = MAX_RETRIES,
+        backoff_base_s: float = BACKOFF_BASE_S,
+        backoff_max_s: float = BACKOFF_MAX_S,
+    ) -> None:
+        self.units_per_s = max(0.001, float(units_per_s))
+        self.capacity = float(capacity) if capacity else self.units_per_s
+        self.reserve = self.capacity * INTERACTIVE_RESERVE
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self._cond = threading.Condition()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._local = threading.local()
+        self._counters: Dict[str, float] = {
+            "requests": 0,
+            "units_used": 0,
+            "throttled": 0,
+            "retries": 0,
+            "failures": 0,
+            "wait_s": 0.0,
+            "interactive_requests": 0,
+            "background_requests": 0,
+        }
+
+    @contextlib.contextmanager
+    def priority(self, priority: int) -> Iterator[None]:
+        # Calls made by this thread inside the block default to priority.
+        previous = getattr(self._local, "priority", INTERACTIVE)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self) -> int:
+        return getattr(self._local, "priority", INTERACTIVE)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.units_per_s)
+            self._updated = now
+
+    def acquire(self, units: float, priority: Optional[int] = None) -> float:
+        # Blocks until units can be spent; returns the time spent waiting.
+        if priority is None:
+            priority = self.current_priority()
+        units = min(float(units), self.capacity)
+        floor = 0.0 if priority == INTERACTIVE else min(self.reserve, self.capacity - units)
+        entry = (priority, next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    timeout: Optional[float] = None
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    elif self._waiters[0] == entry:
+                        deficit = units + floor - self._tokens
+                        if deficit <= 0:
+                            self._tokens -= units
+                            break
+                        timeout = deficit / self.units_per_s
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+            waited = time.monotonic() - start
+            self._counters["requests"] += 1
+            self._counters["units_used"] += units
+            self._counters["wait_s"] += waited
+            self._counters[f"{_PRIORITY_NAMES.get(priority, 'background')}_requests"] += 1
+        return waited
+
+    def _pause(self, delay_s: float) -> None:
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay_s)
+            self._tokens = 0.0
+            self._cond.notify_all()
+
+    def throttle(self, attempt: int = 0) -> float:
+        # For rate limits reported outside call(), e.g. inside a batch
+        # response: pause everyone for one backoff step.
+        delay = self._backoff_s(attempt)
+        self._count("throttled")
+        self._pause(delay)
+        return delay
+
+    def _backoff_s(self, attempt: int) -> float:
+        # "Equal jitter": at least half the exponential delay, so retries
+        # from several threads spread out without collapsing to zero.
+        delay = min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        units: float = DEFAULT_UNITS,
+        priority: Optional[int] = None,
+        label: str = "",
+        max_retries: Optional[int] = None,
+    ) -> T:
+        if priority is None:
+            priority = self.current_priority()
+        if max_retries is None:
+            max_retries = self.max_retries
+        attempt = 0
+        while True:
+            self.acquire(units, priority)
+            try:
+                return fn()
+            except HttpError as exc:
+                status = exc.resp.status
+                rate_limited = is_rate_limit(exc)
+                if not (rate_limited or status in _RETRY_STATUSES):
+                    raise
+                delay = max(self._backoff_s(attempt), _retry_after_s(exc))
+                # The quota is spent whether or not this caller retries.
+                if rate_limited:
+                    self._count("throttled")
+                    self._pause(delay)
+                if attempt >= max_retries:
+                    self._count("failures")
+                    raise
+                reason = f"status={status}"
+            except (socket.timeout, ConnectionError) as exc:
+                if attempt >= max_retries:
+                    self._count("failures")
+                    raise
+                delay = self._backoff_s(attempt)
+                reason = type(exc).__name__
+            self._count("retries")
+            logger.warning(
+                "GMAIL_RETRY %s %s attempt=%d delay=%.2fs",
+                label or "request",
+                reason,
+                attempt + 1,
+                delay,
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill(time.monotonic())
+            return {
+                **{k: round(v, 3) if isinstance(v, float) else v for k, v in self._counters.items()},
+                "tokens": round(self._tokens, 1),
+                "capacity": self.capacity,
+                "units_per_s": self.units_per_s,
+                "paused_s": round(max(0.0, self._paused_until - time.monotonic()), 3),
+                "waiting": len(self._waiters),
+            }
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from googleapiclient.errors import HttpError
+
+from ndm_oncall import db
+from ndm_oncall.gmail_client import (
+    BATCH_LIMIT,
+    GmailClient,
+    _header_value,
+    get_client,
+    get_clients,
+)
+from ndm_oncall.gmail_quota import BACKGROUND
+
+logger = logging.getLogger("gmail_sync")
+
+SYNC_INTERVAL_S = 60
+# incoming_call only trusts the mirror if it synced this recently.
+MIRROR_MAX_AGE_S = 600
+FULL_SYNC_PAGE_SIZE = 500
+INBOX = "INBOX"
+
+SYNC_ENABLED = os.getenv("NDM_GMAIL_SYNC", "1").strip() != "0"
+
+# 10-digit NANP numbers with optional +1 / 1 prefix and the usual
+# separators: 5551234567, 555-123-4567, (555) 123 4567, +1.555.123.4567.
+_PHONE_RE = re.compile(
+    r"(?<!\d)(?:\+?1[\s.\-]?)?\(?(\d{3})\)?[\s.\-]?(\d{3})[\s.\-]?(\d{4})(?!\d)"
+)
+
+
+def extract_phones(*texts: Optional[str]) -> List[str]:
+    found = set()
+    for text in texts:
+        for match in _PHONE_RE.finditer(text or ""):
+            found.add("".join(match.groups()))
+    return sorted(found)
+
+
+def _mirror_row(detail: Dict[str, Any]) -> Dict[str, Any]:
+    headers = detail.get("payload", {}).get("headers", [])
+    subject = _header_value(headers, "Subject")
+    snippet = detail.get("snippet", "")
+    return {
+        "gmail_message_id": detail["id"],
+        "thread_id": detail.get("threadId"),
+        "internal_date": int(detail.get("internalDate") or 0),
+        "rfc_message_id": _header_value(headers, "Message-Id"),
+        "subject": subject,
+        "from_addr": _header_value(headers, "From"),
+        "date": _header_value(headers, "Date"),
+        "snippet": snippet,
+        "phones": extract_phones(subject, snippet),
+    }
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class GmailSync:
+    # Mirrors inbox message metadata into gmail_messages /
+    # gmail_message_phones. The first run lists the whole inbox (resumable
+    # via the stored page token) starting from the profile's historyId; after
+    # that each run replays users.history.list from the stored historyId.
+    # If Gmail has expired that history, the next run starts a new full sync.
+
+    def __init__(
+        self, client: Optional[GmailClient] = None, interval_s: float = SYNC_INTERVAL_S
+    ) -> None:
+        self.client = client or get_client()
+        self.interval_s = interval_s
+        self.name = f"gmail-sync-{self.client.account_index or 0}"
+        self._sync_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("GMAIL_SYNC_FAILED %s", exc)
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+    def sync_once(self, wait_s: float = -1) -> bool:
+        # Callers racing an in-flight sync wait for it (up to wait_s) instead
+        # of starting another; returns False if that wait timed out.
+        if not self._sync_lock.acquire(timeout=wait_s):
+            return False
+        try:
+            with self.client.scheduler.priority(BACKGROUND):
+                self._sync()
+        finally:
+            self._sync_lock.release()
+        return True
+
+    def _sync(self) -> None:
+        profile = self.client.get_profile()
+        mailbox = profile.get("emailAddress", "") or ""
+        state = db.get_gmail_sync_state(mailbox) or {}
+        if state.get("full_sync_completed_at") and state.get("history_id"):
+            try:
+                self._incremental(mailbox, state)
+                return
+            except HttpError as exc:
+                if exc.resp.status != 404:
+                    raise
+                logger.info("GMAIL_SYNC_HISTORY_EXPIRED mailbox=%s", mailbox)
+                state = {}
+        self._full_sync(mailbox, state, str(profile.get("historyId") or ""))
+
+    def _full_sync(self, mailbox: str, state: Dict[str, Any], history_id: str) -> None:
+        if not state.get("full_sync_started_at") or state.get("full_sync_completed_at"):
+            state = {
+                "history_id": history_id,
+                "page_token": None,
+                "full_sync_started_at": datetime.now().isoformat(),
+                "full_sync_completed_at": None,
+            }
+        logger.info(
+            "GMAIL_FULL_SYNC mailbox=%s resume=%s", mailbox, bool(state.get("page_token"))
+        )
+        messages_api = self.client.service.users().messages()
+        while not self._stop.is_set():
+            resp = self.client.execute(
+                messages_api.list(
+                    userId="me",
+                    labelIds=[INBOX],
+                    maxResults=FULL_SYNC_PAGE_SIZE,
+                    pageToken=state.get("page_token"),
+                )
+            )
+            self._store(mailbox, [m["id"] for m in resp.get("messages", []) if m.get("id")])
+            state["page_token"] = resp.get("nextPageToken")
+            if not state["page_token"]:
+                break
+            db.save_gmail_sync_state(mailbox, state)
+        if self._stop.is_set():
+            return
+        pruned = db.prune_gmail_messages(mailbox, state["full_sync_started_at"])
+        state["full_sync_completed_at"] = datetime.now().isoformat()
+        db.save_gmail_sync_state(mailbox, state)
+        logger.info("GMAIL_FULL_SYNC_DONE mailbox=%s pruned=%d", mailbox, pruned)
+
+    def _incremental(self, mailbox: str, state: Dict[str, Any]) -> None:
+        history_api = self.client.service.users().history()
+        added: Dict[str, None] = {}
+        removed = set()
+
+        def add(message_id: str) -> None:
+            added[message_id] = None
+            removed.discard(message_id)
+
+        def remove(message_id: str) -> None:
+            added.pop(message_id, None)
+            removed.add(message_id)
+
+        latest = state["history_id"]
+        page_token = None
+        while True:
+            resp = self.client.execute(
+                history_api.list(
+                    userId="me", startHistoryId=state["history_id"], pageToken=page_token
+                )
+            )
+            for record in resp.get("history", []):
+                for item in record.get("messagesAdded", []):
+                    if INBOX in item["message"].get("labelIds", []):
+                        add(item["message"]["id"])
+                for item in record.get("messagesDeleted", []):
+                    remove(item["message"]["id"])
+                for item in record.get("labelsAdded", []):
+                    if INBOX in item.get("labelIds", []):
+                        add(item["message"]["id"])
+                for item in record.get("labelsRemoved", []):
+                    if INBOX in item.get("labelIds", []):
+                        remove(item["message"]["id"])
+            latest = str(resp.get("historyId") or latest)
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                break
+
+        self._store(mailbox, list(added))
+        db.delete_gmail_messages(mailbox, sorted(removed))
+        state["history_id"] = latest
+        db.save_gmail_sync_state(mailbox, state)
+        if added or removed:
+            logger.info(
+                "GMAIL_SYNC mailbox=%s added=%d removed=%d", mailbox, len(added), len(removed)
+            )
+
+    def _store(self, mailbox: str, message_ids: List[str]) -> None:
+        for chunk in _chunks(message_ids, BATCH_LIMIT):
+            details = self.client.fetch_metadata(chunk, skip_missing=True)
+            rows = []
+            gone = []
+            for message_id, detail in zip(chunk, details):
+                if detail is None or INBOX not in detail.get("labelIds", [INBOX]):
+                    gone.append(message_id)
+                else:
+                    rows.append(_mirror_row(detail))
+            db.save_gmail_messages(mailbox, rows)
+            db.delete_gmail_messages(mailbox, gone)
+
+
+_SYNCS: Optional[List[GmailSync]] = None
+_SYNC_LOCK = threading.Lock()
+
+
+def get_syncs() -> List[GmailSync]:
+    # One sync engine per mailbox client.
+    global _SYNCS
+    clients = get_clients()
+    with _SYNC_LOCK:
+        if _SYNCS is None:
+            _SYNCS = [GmailSync(client) for client in clients]
+        return _SYNCS
+
+
+def start_all() -> None:
+    for sync in get_syncs():
+        if sync.client.has_credentials:
+            sync.start()
+
+
+def stop_all() -> None:
+    for sync in _SYNCS or []:
+        sync.stop()
+
+
+def all_running() -> bool:
+    # The mirror only stands in for a search when it covers every mailbox.
+    # Does not discover mailboxes itself, so it is cheap on the event loop.
+    syncs = _SYNCS
+    return bool(syncs) and all(sync.running for sync in syncs)
+
+
+def mailbox_count() -> int:
+    return len(_SYNCS or [])
+
+
+def sync_all(wait_s: float = -1) -> None:
+    # Catch-up for an incoming call: every mailbox in parallel, each waiting
+    # at most wait_s for a sync that is already running.
+    threads = [
+        threading.Thread(target=_sync_quietly, args=(sync, wait_s), name=f"{sync.name}-now")
+        for sync in get_syncs()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _sync_quietly(sync: GmailSync, wait_s: float) -> None:
+    try:
+        sync.sync_once(wait_s)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("GMAIL_SYNC_ON_CALL_FAILED %s %s", sync.name, exc)
@@ -1,22 +1,37 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
+import os
 import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, FileResponse
+from googleapiclient.errors import HttpError
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from ndm_oncall import app_paths, db
+from ndm_oncall import app_paths, db, gmail_backfill, gmail_sync
 from shared import profile_store
-from ndm_oncall.gmail_client import search_messages, get_mailbox_context
+from shared.change_feed import ChangeFeed
+from shared.sqlite_utils import set_change_origin
+from shared.sse_broker import DISCONNECT, SSEBroker, parse_last_event_id
+from ndm_oncall.gmail_client import (
+    cached_mailbox_context,
+    cached_mailbox_contexts,
+    client_for_mailbox,
+    close_clients,
+    get_client,
+    get_clients,
+    search_all,
+    warm_up_all,
+)
 from ndm_oncall.recording import RecordingManager
+from ndm_oncall.search_coordinator import SearchCoordinator
+from ndm_oncall.workspace_state import WorkspaceState
 
 logging.basicConfig(
     level=logging.INFO,
@@ -38,11 +53,36 @@ RECORDINGS_DIR = app_paths.get_recordings_dir()
 
 LATEST_RESULTS: List[dict] = []
 LATEST_NUMBER: Optional[str] = None
-EVENT_QUEUES: List[asyncio.Queue] = []
+# A tab that falls behind is disconnected and catches up from the replay
+# ring with Last-Event-ID. NDM_SSE_REPLAY_PERSIST=1 keeps the ring across
+# restarts.
+BROKER = SSEBroker(
+    policy=DISCONNECT,
+    persist_path=(
+        app_paths.get_app_data_dir() / "events_replay.sse"
+        if os.getenv("NDM_SSE_REPLAY_PERSIST", "0").strip() == "1"
+        else None
+    ),
+)
+WORKSPACE = WorkspaceState(BROKER.publish)
 RECORDING_MANAGER = RecordingManager(RECORDINGS_DIR)
 ACTIVE_CALL_ID: Optional[int] = None
 ACTIVE_PHONE_DIGITS: Optional[str] = None
-
+SEARCHES = SearchCoordinator()
+# Gmail results cached in email_links are served without an API call for
+# this long after the last successful search; older ones are shown at once
+# and revalidated in the background. 0 always revalidates.
+EMAIL_CACHE_TTL_S = float(os.getenv("NDM_EMAIL_CACHE_TTL_S", "300"))
+# Budget for compressed email bodies; the least recently read go first.
+EMAIL_BODY_CACHE_BYTES = int(float(os.getenv("NDM_EMAIL_BODY_CACHE_MB", "64")) * 1024 * 1024)
+# In-flight body fetches by (mailbox_email, gmail_message_id): message ids
+# are only unique within a mailbox.
+BODY_FETCHES: Dict[Tuple[str, str], asyncio.Task] = {}
+# Fire-and-forget work (warm-up, body prefetch). Holding the task keeps it
+# from being garbage-collected mid-run, and shutdown cancels what is left.
+BACKGROUND_TASKS: set = set()
+
+set_change_origin("oncall")
 db.init_db()
 logger.info("DB_PATH %s", app_paths.get_db_path())
 
@@ -73,6 +113,8 @@ class IncomingCall(BaseModel):
 @app.post("/incoming_call")
 async def incoming_call(payload: IncomingCall, request: Request):
     t0 = time.perf_counter()
+    # Wall clock, sent with the workspace so the UI can log time-to-render.
+    received_ms = int(time.time() * 1000)
     client_ip = request.client.host if request.client else "unknown"
     logger.info("INCOMING_CALL payload=%s client_ip=%s", payload.model_dump(), client_ip)
 
@@ -87,6 +129,8 @@ async def incoming_call(payload: IncomingCall, request: Request):
 
     logger.info("INCOMING_CALL digits=%s", payload.digits)
     logger.info("GMAIL_QUERY %s", query)
+    # Leave the Gmail quota and the writer to the live call for a while.
+    gmail_backfill.get_backfill().pause()
 
     global ACTIVE_CALL_ID, ACTIVE_PHONE_DIGITS
     if (
@@ -96,42 +140,69 @@ async def incoming_call(payload: IncomingCall, request: Request):
     ):
         active_call_id = int(RECORDING_MANAGER.active_call_id)
         ACTIVE_CALL_ID = active_call_id
-        recent_calls = _sanitize_calls(db.list_recent_calls(limit=20))
-        opportunity = db.get_opportunity(payload.digits)
-        emails_cached = _apply_mailbox_context(db.list_email_links(payload.digits))
-        emit_event(
+        bundle = await db.run(
+            db.begin_incoming_call,
+            payload.digits,
+            existing_call_id=active_call_id,
+            mirror_max_age_s=_mirror_max_age(),
+            mirror_mailboxes=gmail_sync.mailbox_count(),
+        )
+        recent_calls = _sanitize_calls(bundle["recent_calls"])
+        opportunity = bundle["opportunity"]
+        emails_cached = _apply_mailbox_context(_bundle_emails(bundle))
+        cache_state = db.email_cache_state(bundle, EMAIL_CACHE_TTL_S)
+        WORKSPACE.update(
             "incoming_call_workspace",
             {
                 "phone_digits": payload.digits,
                 "call_id": active_call_id,
                 "display_name": None,
                 "recent_calls": recent_calls,
+                "call_history": _sanitize_calls(bundle["call_history"]),
                 "notes": [],
                 "opportunity": opportunity,
                 "emails": emails_cached,
+                "emails_synced_at": bundle["emails_synced_at"],
+                "emails_fresh": _email_cache_fresh(cache_state),
                 "recording_active": _recording_active_for_call(active_call_id),
+                "profile": bundle["profile"],
             },
+            received_ms=received_ms,
         )
         return {"ok": True, "results": []}
 
-    call_id = db.create_call(payload.digits, status="incoming")
-    recent_calls = _sanitize_calls(db.list_recent_calls(limit=20))
-    opportunity = db.get_opportunity(payload.digits)
-    emails_cached = _apply_mailbox_context(db.list_email_links(payload.digits))
+    bundle = await db.run(
+        db.begin_incoming_call,
+        payload.digits,
+        mirror_max_age_s=_mirror_max_age(),
+        mirror_mailboxes=gmail_sync.mailbox_count(),
+    )
+    call_id = bundle["call_id"]
+    recent_calls = _sanitize_calls(bundle["recent_calls"])
+    opportunity = bundle["opportunity"]
+    mirrored = bundle["mirrored_emails"]
+    emails_cached = _apply_mailbox_context(_bundle_emails(bundle))
+    cache_state = db.email_cache_state(bundle, EMAIL_CACHE_TTL_S)
+    emails_fresh = _email_cache_fresh(cache_state)
 
     t1 = time.perf_counter()
-    emit_event(
+    WORKSPACE.update(
         "incoming_call_workspace",
         {
             "phone_digits": payload.digits,
             "call_id": call_id,
             "display_name": None,
             "recent_calls": recent_calls,
+            "call_history": _sanitize_calls(bundle["call_history"]),
             "notes": [],
             "opportunity": opportunity,
             "emails": emails_cached,
+            "emails_synced_at": bundle["emails_synced_at"],
+            "emails_fresh": emails_fresh,
             "recording_active": _recording_active_for_call(call_id),
+            "profile": bundle["profile"],
         },
+        received_ms=received_ms,
     )
     t2 = time.perf_counter()
 
@@ -155,29 +226,95 @@ async def incoming_call(payload: IncomingCall, request: Request):
     #     )
     t3 = time.perf_counter()
 
-    async def gmail_task():
-        t4 = time.perf_counter()
-        try:
-            results = await asyncio.to_thread(search_messages, query, 5)
-        except FileNotFoundError as exc:
-            logger.error("GMAIL_AUTH_MISSING %s", exc)
-            results = []
-        except Exception as exc:  # noqa: BLE001
-            logger.exception("GMAIL_SEARCH_ERROR %s", exc)
-            results = []
-
-        db.save_email_links(
+    global LATEST_RESULTS, LATEST_NUMBER
+    if cache_state == "fresh":
+        SEARCHES.supersede(payload.digits)
+        LATEST_RESULTS = emails_cached
+        LATEST_NUMBER = payload.digits
+        logger.info(
+            "EMAIL_CACHE_HIT digits=%s synced_at=%s count=%d",
             payload.digits,
-            results,
-            opportunity_id=opportunity["id"] if opportunity else None,
+            bundle["emails_synced_at"],
+            len(emails_cached),
         )
+        logger.info("LATENCY t0->emit=%.0fms", (t2 - t0) * 1000)
+        return {"ok": True, "results": []}
+    # With a stale cache the workspace event already showed the cached links;
+    # the search below only announces itself if it changed them.
+    revalidating = cache_state == "stale"
+
+    async def gmail_task():
+        t4 = time.perf_counter()
+        searched = True
+        complete = True
+        results = None
+        if mirrored is not None:
+            # Catch up on anything that arrived since the last background
+            # sync (one history.list call per mailbox), then answer from the
+            # mirror again.
+            await asyncio.to_thread(gmail_sync.sync_all, 2.0)
+            results = await db.run(
+                db.find_mirrored_emails,
+                payload.digits,
+                5,
+                gmail_sync.MIRROR_MAX_AGE_S,
+                gmail_sync.mailbox_count(),
+            )
+        if results is None:
+            try:
+                results, complete = await asyncio.to_thread(search_all, query, 5)
+            except FileNotFoundError as exc:
+                logger.error("GMAIL_AUTH_MISSING %s", exc)
+                results = []
+                searched = False
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("GMAIL_SEARCH_ERROR %s", exc)
+                results = []
+                searched = False
+        else:
+            logger.info("GMAIL_MIRROR_HIT digits=%s count=%d", payload.digits, len(results))
+
+        # A failed search must not tombstone the cached links.
+        changed = False
+        if searched:
+            changed = await db.run(
+                db.save_email_links,
+                payload.digits,
+                results,
+                opportunity_id=opportunity["id"] if opportunity else None,
+                prune=complete,
+            )
+            logger.info(
+                "EMAIL_LINKS_MERGED digits=%s changed=%s complete=%s",
+                payload.digits,
+                changed,
+                complete,
+            )
         global LATEST_RESULTS, LATEST_NUMBER
-        LATEST_RESULTS = results
-        LATEST_NUMBER = payload.digits
-        emit_event(
-            "gmail_results_ready",
-            {"phone_digits": payload.digits, "emails": _apply_mailbox_context(results)},
-        )
+        if not SEARCHES.is_current(payload.digits):
+            # A newer caller is on screen; the merge above still refreshed
+            # this number's cache.
+            logger.info("GMAIL_RESULTS_DROPPED digits=%s superseded", payload.digits)
+        elif revalidating and not changed:
+            logger.info("EMAIL_CACHE_REVALIDATED digits=%s searched=%s", payload.digits, searched)
+            if searched:
+                LATEST_RESULTS = results
+                LATEST_NUMBER = payload.digits
+        else:
+            LATEST_RESULTS = results
+            LATEST_NUMBER = payload.digits
+            # Send what /workspace would now list, so the UI never refetches:
+            # after a failed or partial search that is the cached links.
+            shown = results
+            if not (searched and complete):
+                shown = await db.run(db.list_email_links, payload.digits)
+            WORKSPACE.update(
+                "gmail_results_ready",
+                {"emails": _apply_mailbox_context(shown)},
+                phone_digits=payload.digits,
+            )
+            if results:
+                _prefetch_email_body(results[0])
         t5 = time.perf_counter()
         logger.info(
             "LATENCY t0->t1=%.0fms t1->t2=%.0fms t4->t5=%.0fms",
@@ -186,7 +323,7 @@ async def incoming_call(payload: IncomingCall, request: Request):
             (t5 - t4) * 1000,
         )
 
-    asyncio.create_task(gmail_task())
+    SEARCHES.submit(payload.digits, gmail_task)
     logger.info(
         "LATENCY t0->emit=%.0fms t2->rec=%.0fms",
         (t2 - t0) * 1000,
@@ -255,14 +392,14 @@ def profile_data(digits: str):
 async def profile_data_update(digits: str, request: Request):
     payload = await request.json()
     payload["phone_digits"] = digits
-    profile = profile_store.save_profile(payload)
+    profile = await db.run(profile_store.save_profile, payload)
     return {"ok": True, "profile": profile}
 
 
 @app.post("/profile-data/{digits}/notes")
 async def profile_note(digits: str, request: Request):
     payload = await request.json()
-    notes = profile_store.add_note(digits, payload.get("note_text", ""))
+    notes = await db.run(profile_store.add_note, digits, payload.get("note_text", ""))
     return {"ok": True, "notes": notes}
 
 
@@ -275,25 +412,70 @@ def favicon():
 
 
 @app.get("/events")
-async def events():
-    queue: asyncio.Queue = asyncio.Queue()
-    EVENT_QUEUES.append(queue)
+async def events(request: Request, last_event_id: Optional[str] = None):
+    # EventSource sends Last-Event-ID on reconnect; the query parameter lets
+    # a freshly loaded page resume too.
+    resume_from = parse_last_event_id(request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(
+        BROKER.stream(BROKER.subscribe(resume_from)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    async def event_generator():
-        try:
-            while True:
-                event_type, data = await queue.get()
-                payload = f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
-                yield payload
-        finally:
-            EVENT_QUEUES.remove(queue)
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+@app.get("/workspace/state")
+def workspace_state():
+    # Full state for a client whose version no longer matches a delta.
+    return WORKSPACE.snapshot()
+
+
+@app.get("/events/stats")
+def events_stats() -> Dict[str, Any]:
+    return {**BROKER.stats(), "change_feed": CHANGES.stats()}
+
+
+def _publish_recording(
+    event_type: str,
+    call_id: int,
+    recording_active: bool,
+    audio_paths: dict,
+    call_history: Optional[List[dict]] = None,
+) -> None:
+    # Only the workspace on screen is versioned. A recording for a call
+    # opened from history sends its state as plain fields instead.
+    state: Dict[str, Any] = {"recording_active": recording_active}
+    if call_history is not None:
+        state["call_history"] = call_history
+    extra: Dict[str, Any] = {"call_id": call_id, "audio_paths": audio_paths}
+    if WORKSPACE.get("call_id") != call_id:
+        extra.update(state)
+        state = {}
+    WORKSPACE.update(event_type, state, **extra)
+
+
+def _on_db_changes(rows: List[dict]) -> None:
+    # Runs on the change feed thread, which already skips rows this process
+    # wrote (those sent their own events). Edits to the number on screen
+    # from the research app refresh the workspace; other numbers are ignored.
+    phone_digits = WORKSPACE.get("phone_digits")
+    if not phone_digits:
+        return
+    last10 = profile_store.normalize_last10(phone_digits)
+    if not any(row["last10"] == last10 for row in rows):
+        return
+    fields = db.workspace_fields(phone_digits)
+    fields["recent_calls"] = _sanitize_calls(fields["recent_calls"])
+    fields["call_history"] = _sanitize_calls(fields["call_history"])
+    if WORKSPACE.refresh("workspace_changed", phone_digits, fields):
+        logger.info("WORKSPACE_CHANGED digits=%s rows=%d", phone_digits, len(rows))
+
+
+CHANGES = ChangeFeed(str(app_paths.get_db_path()), _on_db_changes, skip_origin="oncall")
 
 
 def emit_event(event_type: str, data: dict) -> None:
-    for q in EVENT_QUEUES:
-        q.put_nowait((event_type, data))
+    # Safe from the threadpool endpoints too; the broker hops to the loop.
+    BROKER.publish(event_type, data)
 
 
 def _audio_path_if_valid(audio_path: Optional[str]) -> Optional[str]:
@@ -329,16 +511,96 @@ def _sanitize_calls(calls: List[dict]) -> List[dict]:
     return calls
 
 
+def _mirror_max_age() -> Optional[float]:
+    # The local mirror is only consulted while every mailbox is being synced.
+    return gmail_sync.MIRROR_MAX_AGE_S if gmail_sync.all_running() else None
+
+
+async def _email_body(gmail_message_id: str, mailbox_email: Optional[str]) -> Dict[str, Any]:
+    cached = await db.run(db.get_email_body, gmail_message_id, mailbox_email)
+    if cached is not None:
+        return {**cached, "cached": True}
+    # A click racing the prefetch of the same message shares its fetch.
+    key = (mailbox_email or "", gmail_message_id)
+    task = BODY_FETCHES.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_email_body(gmail_message_id, mailbox_email))
+        BODY_FETCHES[key] = task
+        task.add_done_callback(lambda _: BODY_FETCHES.pop(key, None))
+    return await asyncio.shield(task)
+
+
+async def _fetch_email_body(gmail_message_id: str, mailbox_email: Optional[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    if not mailbox_email:
+        mailbox_email = await db.run(db.email_message_mailbox, gmail_message_id)
+    client = client_for_mailbox(mailbox_email)
+    text = await asyncio.to_thread(client.fetch_body, gmail_message_id)
+    context = client.cached_mailbox_context()
+    mailbox_email = context[0] if context else (mailbox_email or "")
+    evicted = await db.run(
+        db.save_email_body, mailbox_email, gmail_message_id, text, EMAIL_BODY_CACHE_BYTES
+    )
+    logger.info(
+        "EMAIL_BODY_FETCHED id=%s chars=%d evicted=%d %.0fms",
+        gmail_message_id,
+        len(text),
+        evicted,
+        (time.perf_counter() - t0) * 1000,
+    )
+    return {"mailbox_email": mailbox_email, "text": text, "cached": False}
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
+
+
+async def _warm_up_gmail() -> None:
+    try:
+        await asyncio.to_thread(warm_up_all)
+    except Exception as exc:  # noqa: BLE001
+        logger.warning("GMAIL_WARM_UP_FAILED %s", exc)
+
+
+def _prefetch_email_body(email: dict) -> None:
+    gmail_message_id = email.get("gmail_message_id")
+    mailbox_email = email.get("mailbox_email") or None
+    if not gmail_message_id or (mailbox_email or "", gmail_message_id) in BODY_FETCHES:
+        return
+
+    async def prefetch() -> None:
+        try:
+            await _email_body(gmail_message_id, mailbox_email)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("EMAIL_BODY_PREFETCH_FAILED id=%s %s", gmail_message_id, exc)
+
+    _spawn(prefetch())
+
+
+def _email_cache_fresh(cache_state: str) -> bool:
+    return cache_state in ("mirror", "fresh")
+
+
+def _bundle_emails(bundle: dict) -> List[dict]:
+    mirrored = bundle.get("mirrored_emails")
+    return mirrored if mirrored is not None else bundle["emails"]
+
+
 def _apply_mailbox_context(emails: List[dict]) -> List[dict]:
     if not emails:
         return emails
-    try:
-        mailbox_email, account_index = get_mailbox_context()
-    except Exception:  # noqa: BLE001
-        return emails
+    # Runs on the event loop, so only use the context the Gmail clients
+    # already have; it is filled in by startup warm-up or the first search.
+    # Untagged emails are attributed to the primary mailbox.
+    primary = cached_mailbox_context()
+    contexts = cached_mailbox_contexts()
     for email in emails:
-        if mailbox_email and not email.get("mailbox_email"):
-            email["mailbox_email"] = mailbox_email
+        if not email.get("mailbox_email") and primary is not None:
+            email["mailbox_email"] = primary[0]
+        account_index = contexts.get(email.get("mailbox_email") or "")
         if account_index and not email.get("account_index"):
             email["account_index"] = account_index
     return emails
@@ -395,6 +657,47 @@ def health():
     return {"ok": True}
 
 
+@app.get("/email/{gmail_message_id}/body")
+async def email_body(gmail_message_id: str, mailbox: Optional[str] = None):
+    try:
+        body = await _email_body(gmail_message_id, mailbox)
+    except FileNotFoundError as exc:
+        logger.error("GMAIL_AUTH_MISSING %s", exc)
+        return JSONResponse(status_code=503, content={"ok": False, "error": "gmail auth missing"})
+    except HttpError as exc:
+        if exc.resp.status == 404:
+            return JSONResponse(status_code=404, content={"ok": False, "error": "not found"})
+        logger.exception("EMAIL_BODY_ERROR id=%s", gmail_message_id)
+        return JSONResponse(status_code=502, content={"ok": False, "error": "gmail error"})
+    except Exception:  # noqa: BLE001
+        logger.exception("EMAIL_BODY_ERROR id=%s", gmail_message_id)
+        return JSONResponse(status_code=502, content={"ok": False, "error": "gmail error"})
+    return {"ok": True, "gmail_message_id": gmail_message_id, **body}
+
+
+@app.get("/db/pool")
+def db_pool():
+    return {"ok": True, "pool": db.pool_stats()}
+
+
+@app.get("/gmail/searches")
+async def gmail_searches():
+    quota = [
+        {
+            "mailbox_email": (client.cached_mailbox_context() or ("", ""))[0],
+            "account_index": client.account_index,
+            **client.scheduler.stats(),
+        }
+        for client in get_clients()
+    ]
+    return {
+        "ok": True,
+        "searches": SEARCHES.stats(),
+        "quota": quota,
+        "backfill": gmail_backfill.get_backfill().stats(),
+    }
+
+
 @app.post("/notes")
 def add_note(payload: dict):
     call_id = payload.get("call_id")
@@ -439,13 +742,11 @@ def start_recording(call_id: int):
         audio_paths["mic_path"] = mic_public
     if sys_public:
         audio_paths["sys_path"] = sys_public
-    emit_event(
+    _publish_recording(
         "recording_started",
-        {
-            "call_id": int(call_id),
-            "recording_active": _recording_active_for_call(int(call_id)),
-            "audio_paths": audio_paths,
-        },
+        int(call_id),
+        _recording_active_for_call(int(call_id)),
+        audio_paths,
     )
     return _recording_response(
         ok=True,
@@ -494,13 +795,13 @@ def stop_recording(call_id: int):
         ACTIVE_PHONE_DIGITS = None
 
     recording_active = _recording_active_for_call(int(call_id))
-    emit_event(
+    phone_digits = call.get("phone_digits", "") if call else ""
+    _publish_recording(
         "recording_stopped",
-        {
-            "call_id": int(call_id),
-            "recording_active": recording_active,
-            "audio_paths": audio_paths,
-        },
+        int(call_id),
+        recording_active,
+        audio_paths,
+        call_history=_sanitize_calls(db.list_call_history(phone_digits, None, 3)),
     )
     return _recording_response(
         ok=True,
@@ -537,6 +838,8 @@ def workspace(phone_digits: str):
     recent_calls = _sanitize_calls(db.list_recent_calls(limit=20))
     opportunity = db.get_opportunity(phone_digits)
     emails = _apply_mailbox_context(db.list_email_links(phone_digits))
+    call_history = _sanitize_calls(db.list_call_history(phone_digits, None, 3))
+    profile = profile_store.load_profile(phone_digits)
     latest_call = db.get_latest_call(phone_digits)
     notes = db.get_notes(latest_call["id"]) if latest_call else []
     current_call_id = latest_call["id"] if latest_call else None
@@ -547,6 +850,8 @@ def workspace(phone_digits: str):
         "notes": notes,
         "opportunity": opportunity,
         "emails": emails,
+        "call_history": call_history,
+        "profile": profile,
         "current_call_id": current_call_id,
         "recording_active": _recording_active_for_call(current_call_id),
     }
@@ -558,6 +863,33 @@ def opportunity_upsert(payload: dict):
     return {"ok": True, "id": op_id}
 
 
+@app.on_event("startup")
+async def startup() -> None:
+    BROKER.bind_loop()
+    CHANGES.start()
+    await asyncio.to_thread(gmail_sync.get_syncs)  # discovers the mailbox tokens
+    _spawn(_warm_up_gmail())
+    if gmail_sync.SYNC_ENABLED:
+        gmail_sync.start_all()
+    if gmail_backfill.BACKFILL_ENABLED and get_client().has_credentials:
+        gmail_backfill.get_backfill().start()
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await SEARCHES.shutdown()
+    BROKER.close()
+    pending = [*BACKGROUND_TASKS, *BODY_FETCHES.values()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    gmail_backfill.get_backfill().stop()
+    gmail_sync.stop_all()
+    CHANGES.stop()
+    close_clients()
+    db.shutdown()
+
+
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 app.mount("/recordings", StaticFiles(directory=RECORDINGS_DIR), name="recordings")
 if SHARED_STATIC_DIR.exists():
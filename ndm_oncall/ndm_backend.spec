@@ -1,6 +1,8 @@
 # -*- mode: python ; coding: utf-8 -*-
 from pathlib import Path
 
+import googleapiclient
+
 block_cipher = None
 base_dir = Path(__file__).resolve().parent
 repo_root = base_dir.parent
@@ -8,6 +10,11 @@ repo_root = base_dir.parent
 datas = [
     (str(base_dir / "templates"), "templates"),
     (str(base_dir / "static"), "static"),
+    # gmail_client builds the service with static_discovery=True.
+    (
+        str(Path(googleapiclient.__file__).parent / "discovery_cache" / "documents" / "gmail.v1.json"),
+        "googleapiclient/discovery_cache/documents",
+    ),
 ]
 
 a = Analysis(
@@ -19,7 +26,8 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Dev-only code (tests/fake_gmail.py and the test suite) stays out of the build.
+    excludes=["tests"],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger("search_coordinator")
+
+MAX_CONCURRENT_SEARCHES = 2
+
+
+class SearchCoordinator:
+    # Owns the per-call Gmail search tasks started by incoming_call.
+    # - Single flight: submitting a key that is already pending returns the
+    #   existing task instead of starting a second search.
+    # - Supersede: a newer key becomes the current one. Older searches that
+    #   are still waiting for a slot are cancelled; ones already running are
+    #   allowed to finish (their result still refreshes the cache) but
+    #   is_current() tells them not to publish it.
+    # - At most max_concurrency searches run at once.
+    # Must only be used from the event loop thread.
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_SEARCHES) -> None:
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._started: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._current: Optional[str] = None
+        self._closed = False
+        self._counters = {"started": 0, "merged": 0, "superseded": 0, "failed": 0}
+
+    def is_current(self, key: str) -> bool:
+        return key == self._current
+
+    def supersede(self, key: str) -> None:
+        # Marks key as the caller on screen without starting a search (e.g.
+        # when it was answered from cache).
+        self._current = key
+        for other, task in list(self._pending.items()):
+            if other != key and other not in self._started and not task.done():
+                task.cancel()
+                del self._pending[other]
+                self._counters["superseded"] += 1
+                logger.info("SEARCH_SUPERSEDED key=%s by=%s", other, key)
+
+    def submit(
+        self, key: str, factory: Callable[[], Awaitable[Any]]
+    ) -> Optional[asyncio.Task]:
+        if self._closed:
+            return None
+        self.supersede(key)
+        task = self._pending.get(key)
+        if task is not None and not task.done():
+            self._counters["merged"] += 1
+            logger.info("SEARCH_MERGED key=%s", key)
+            return task
+        task = asyncio.get_running_loop().create_task(
+            self._run(key, factory), name=f"gmail-search-{key}"
+        )
+        self._pending[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._finished(key, t))
+        self._counters["started"] += 1
+        return task
+
+    async def _run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        async with self._slots:
+            self._started.add(key)
+            return await factory()
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if self._pending.get(key) is task:
+            del self._pending[key]
+            self._started.discard(key)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None:
+            self._counters["failed"] += 1
+            logger.error("SEARCH_FAILED key=%s", key, exc_info=exc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "pending": len(self._pending),
+            "running": len(self._started),
+            "current": self._current,
+        }
+
+    async def shutdown(self) -> None:
+        self._closed = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,7 +1,6 @@
 let currentPhoneDigits = null;
 let currentCallId = null;
 let toastTimer = null;
-let emailRefreshTimer = null;
 // Preserve Gmail results to avoid race-condition clears after refreshes.
 let currentGmailResults = null;
 let currentGmailPhone = null;
@@ -220,14 +219,41 @@ async function applyProfile(phoneDigits) {
       baseUrl: window.__PROFILE_API_BASE__ || "",
     });
     console.log("[NDM] Loaded profile for", phoneDigits, profile);
-    if (window.ProfileStore?.renderOnCall) {
-      window.ProfileStore.renderOnCall(profile);
-    }
+    renderProfile(profile);
   } catch (err) {
     console.error("[NDM] Failed to load profile:", err);
   }
 }
 
+function renderProfile(profile) {
+  if (window.ProfileStore?.renderOnCall) {
+    window.ProfileStore.renderOnCall(profile || null);
+  }
+}
+
+async function toggleEmailBody(bodyEl, messageId, mailboxEmail) {
+  if (!bodyEl.classList.contains("hidden")) {
+    bodyEl.classList.add("hidden");
+    return;
+  }
+  bodyEl.classList.remove("hidden");
+  if (bodyEl.dataset.loaded) return;
+  bodyEl.textContent = "Loading…";
+  const query = mailboxEmail ? `?mailbox=${encodeURIComponent(mailboxEmail)}` : "";
+  try {
+    const res = await fetch(`/email/${encodeURIComponent(messageId)}/body${query}`);
+    const data = await res.json();
+    if (data.ok) {
+      bodyEl.textContent = data.text || "(empty message)";
+      bodyEl.dataset.loaded = "1";
+    } else {
+      bodyEl.textContent = "Could not load this email.";
+    }
+  } catch (err) {
+    bodyEl.textContent = "Could not load this email.";
+  }
+}
+
 function renderEmails(items) {
   emailsRecentEl.innerHTML = "";
   emailsRelatedEl.innerHTML = "";
@@ -274,6 +300,25 @@ function renderEmails(items) {
       );
     }
     emailsRecentEl.appendChild(div);
+
+    const messageId = email.gmail_message_id || email.gmailMessageId;
+    if (messageId) {
+      const bodyEl = document.createElement("pre");
+      bodyEl.className = "email-body hidden";
+      const readBtn = document.createElement("button");
+      readBtn.className = "email-read";
+      readBtn.textContent = "Read";
+      readBtn.addEventListener("click", (event) => {
+        event.stopPropagation();
+        toggleEmailBody(
+          bodyEl,
+          messageId,
+          email.mailbox_email || email.mailboxEmail || "",
+        );
+      });
+      div.querySelector(".email-time").appendChild(readBtn);
+      emailsRecentEl.appendChild(bodyEl);
+    }
   });
 
   if (related.length === 0) {
@@ -323,19 +368,6 @@ function renderGmailFromState() {
   return false;
 }
 
-async function refreshEmailsFromWorkspace() {
-  if (!currentPhoneDigits) return;
-  if (currentGmailPhone === currentPhoneDigits && renderGmailFromState()) {
-    return;
-  }
-  const res = await fetch(`/workspace/${currentPhoneDigits}`);
-  const data = await res.json();
-  if (!currentGmailResults || currentGmailPhone !== currentPhoneDigits) {
-    renderEmails(data.emails || []);
-  }
-  setSeenBadge((data.emails || []).length > 0);
-}
-
 function showToast(phoneDigits) {
   if (!toastEl) return;
   const formatted = formatPhoneDigits(phoneDigits || "+1-205-240-3989");
@@ -353,22 +385,6 @@ function hideToast() {
   toastEl.classList.add("hidden");
 }
 
-async function refreshRecordingStatus() {
-  if (!currentCallId) {
-    setRecordingButtons(false);
-    return;
-  }
-  try {
-    const res = await fetch(
-      `/recording/status?call_id=${encodeURIComponent(currentCallId)}`,
-    );
-    const data = await res.json();
-    setRecordingButtons(!!data.recording_active);
-  } catch (err) {
-    setRecordingButtons(false);
-  }
-}
-
 async function startRecording() {
   if (!currentCallId) return;
   try {
@@ -400,7 +416,6 @@ async function stopRecording() {
     setRecordingButtons(!!data.recording_active);
     if (data.ok) {
       statusEl.textContent = `Recording stopped: ${currentCallId}`;
-      await fetchCallHistory(currentPhoneDigits);
     } else {
       statusEl.textContent = `Recording stop failed: ${data.reason || "error"}`;
     }
@@ -418,28 +433,15 @@ async function loadWorkspace(phoneDigits) {
   setRecordingButtons(!!data.recording_active);
   renderCaller({ phone_digits: phoneDigits, display_name: data.display_name });
   setSeenBadge(false);
-  await fetchCallHistory(phoneDigits);
-  await applyProfile(phoneDigits);
+  renderRecentCalls(data.call_history || []);
+  renderProfile(data.profile);
   renderOpportunity(data.opportunity || null);
   if (!renderGmailFromState()) {
     renderEmails(data.emails || []);
   }
-  await refreshRecordingStatus();
   statusEl.textContent = `Workspace ready: ${phoneDigits}`;
 }
 
-async function fetchCallHistory(phoneDigits) {
-  if (!phoneDigits) {
-    renderRecentCalls([]);
-    return;
-  }
-  const res = await fetch(
-    `/call_history?digits=${encodeURIComponent(phoneDigits)}`,
-  );
-  const data = await res.json();
-  renderRecentCalls(data.calls || []);
-}
-
 async function saveNote() {
   const text = noteInput.value.trim();
   if (!text || !currentPhoneDigits) return;
@@ -478,58 +480,145 @@ document.addEventListener("keydown", (event) => {
   }
 });
 
-const evtSource = new EventSource("/events");
+// Mirror of the server's workspace state (workspace_state.py). Events carry
+// only what changed since base_version; a client on any other version loads
+// /workspace/state instead.
+const WORKSPACE_LIST_FIELDS = new Set(["recent_calls", "call_history", "notes", "emails"]);
+const workspaceState = { version: null, fields: {}, lists: {} };
+let snapshotRequest = null;
+
+function applyListDelta(name, delta) {
+  const previous = workspaceState.lists[name] || new Map();
+  const rows = new Map();
+  delta.order.forEach((key) => {
+    rows.set(key, key in delta.upsert ? delta.upsert[key] : previous.get(key));
+  });
+  workspaceState.lists[name] = rows;
+  workspaceState.fields[name] = Array.from(rows.values());
+}
 
-evtSource.addEventListener("incoming_call_workspace", (event) => {
-  const data = JSON.parse(event.data);
-  const isNewCall = data.phone_digits !== currentPhoneDigits;
-  currentPhoneDigits = data.phone_digits;
-  currentCallId = data.call_id;
-  if (isNewCall) {
-    currentGmailResults = null;
-    currentGmailPhone = null;
+function applyWorkspaceChanges(changes) {
+  Object.entries(changes).forEach(([name, value]) => {
+    if (WORKSPACE_LIST_FIELDS.has(name)) {
+      applyListDelta(name, value);
+    } else {
+      workspaceState.fields[name] = value;
+    }
+  });
+}
+
+function renderWorkspace(changed) {
+  const ws = workspaceState.fields;
+  if (!ws.phone_digits) return;
+  // After loadWorkspace() showed another number, redraw everything.
+  const all = ws.phone_digits !== currentPhoneDigits;
+  const has = (name) => all || changed.includes(name);
+  if (has("phone_digits")) {
+    currentPhoneDigits = ws.phone_digits;
+    renderCaller(ws);
+    setSeenBadge(false);
   }
-  renderCaller(data);
-  setSeenBadge(false);
-  fetchCallHistory(data.phone_digits);
-  applyProfile(data.phone_digits);
-  renderOpportunity(data.opportunity || null);
-  if (!renderGmailFromState()) {
-    renderEmails(data.emails || []);
+  if (has("phone_digits") || has("profile")) renderProfile(ws.profile);
+  if (has("call_id")) currentCallId = ws.call_id;
+  if (has("call_history")) renderRecentCalls(ws.call_history || []);
+  if (has("opportunity")) renderOpportunity(ws.opportunity || null);
+  if (has("phone_digits") || has("emails")) {
+    currentGmailResults = ws.emails || [];
+    currentGmailPhone = ws.phone_digits;
+    renderEmails(currentGmailResults);
   }
-  setRecordingButtons(!!data.recording_active);
-  statusEl.textContent = `Incoming call: ${data.phone_digits}`;
-  showToast(data.phone_digits);
+  if (has("recording_active")) setRecordingButtons(!!ws.recording_active);
+}
+
+function loadWorkspaceSnapshot() {
+  if (!snapshotRequest) {
+    snapshotRequest = fetch("/workspace/state")
+      .then((res) => res.json())
+      .then((data) => {
+        workspaceState.version = data.version;
+        workspaceState.fields = {};
+        workspaceState.lists = {};
+        applyWorkspaceChanges(data.changes || {});
+        renderWorkspace(Object.keys(data.changes || {}));
+      })
+      .finally(() => {
+        snapshotRequest = null;
+      });
+  }
+  return snapshotRequest;
+}
+
+async function applyWorkspaceEvent(data) {
+  if (data.base_version !== workspaceState.version) {
+    // Missed a version (or just loaded): the snapshot covers this event,
+    // and later ones apply on top of it.
+    await loadWorkspaceSnapshot();
+    if (data.base_version !== workspaceState.version) return;
+  }
+  applyWorkspaceChanges(data.changes || {});
+  workspaceState.version = data.version;
+  renderWorkspace(Object.keys(data.changes || {}));
+}
+
+const evtSource = new EventSource("/events");
+loadWorkspaceSnapshot();
 
-  if (emailRefreshTimer) clearTimeout(emailRefreshTimer);
-  emailRefreshTimer = setTimeout(refreshEmailsFromWorkspace, 1200);
+evtSource.addEventListener("incoming_call_workspace", async (event) => {
+  const t0 = performance.now();
+  const data = JSON.parse(event.data);
+  await applyWorkspaceEvent(data);
+  statusEl.textContent = `Incoming call: ${currentPhoneDigits}`;
+  showToast(currentPhoneDigits);
+  // The event carries the whole workspace, so this is the full render.
+  requestAnimationFrame(() => {
+    console.log(
+      "[NDM] WORKSPACE_READY render=%dms since_call=%dms",
+      Math.round(performance.now() - t0),
+      data.received_ms ? Date.now() - data.received_ms : -1,
+    );
+  });
 });
 
-evtSource.addEventListener("gmail_results_ready", (event) => {
+evtSource.addEventListener("gmail_results_ready", async (event) => {
   const data = JSON.parse(event.data);
+  await applyWorkspaceEvent(data);
   if (data.phone_digits !== currentPhoneDigits) return;
-  if (data.emails && data.emails.length > 0) {
-    currentGmailResults = data.emails || [];
-    currentGmailPhone = data.phone_digits;
-    renderEmails(currentGmailResults);
-    setSeenBadge(true);
-  } else {
-    refreshEmailsFromWorkspace();
-  }
+  setSeenBadge((currentGmailResults || []).length > 0);
   statusEl.textContent = `Gmail results ready: ${data.phone_digits}`;
 });
 
-evtSource.addEventListener("recording_started", (event) => {
+function onRecordingEvent(data) {
+  // A call opened from history is not the versioned workspace; its state
+  // comes as plain fields.
+  if (!data.call_id || Number(data.call_id) !== Number(currentCallId)) return false;
+  if ("recording_active" in data) setRecordingButtons(!!data.recording_active);
+  if (data.call_history) renderRecentCalls(data.call_history);
+  return true;
+}
+
+evtSource.addEventListener("recording_started", async (event) => {
   const data = JSON.parse(event.data);
-  if (!data.call_id || Number(data.call_id) !== Number(currentCallId)) return;
-  setRecordingButtons(true);
-  statusEl.textContent = `Recording started: ${data.call_id}`;
+  await applyWorkspaceEvent(data);
+  if (onRecordingEvent(data)) {
+    statusEl.textContent = `Recording started: ${data.call_id}`;
+  }
 });
 
-evtSource.addEventListener("recording_stopped", (event) => {
+evtSource.addEventListener("recording_stopped", async (event) => {
   const data = JSON.parse(event.data);
-  if (!data.call_id || Number(data.call_id) !== Number(currentCallId)) return;
-  setRecordingButtons(false);
-  statusEl.textContent = `Recording stopped: ${data.call_id}`;
-  fetchCallHistory(currentPhoneDigits);
+  await applyWorkspaceEvent(data);
+  if (onRecordingEvent(data)) {
+    statusEl.textContent = `Recording stopped: ${data.call_id}`;
+  }
+});
+
+// Edits from the research app (or another tab) to the number on screen.
+evtSource.addEventListener("workspace_changed", (event) => {
+  applyWorkspaceEvent(JSON.parse(event.data));
+});
+
+// The server replays missed events after a reconnect (Last-Event-ID); this
+// only fires when the gap was too old to replay.
+evtSource.addEventListener("resync", () => {
+  loadWorkspaceSnapshot();
 });
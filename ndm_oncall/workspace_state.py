@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+
+def _row_id(row: dict) -> str:
+    return str(row.get("id"))
+
+
+def _email_key(row: dict) -> str:
+    message = row.get("gmail_message_id") or row.get("link") or ""
+    return f"{row.get('mailbox_email') or ''}/{message}"
+
+
+# List fields are diffed row by row; the value is how a row is keyed.
+LIST_KEYS: Dict[str, Callable[[dict], str]] = {
+    "recent_calls": _row_id,
+    "call_history": _row_id,
+    "notes": _row_id,
+    "emails": _email_key,
+}
+
+_MISSING = object()
+
+
+def _list_delta(name: str, old: Any, new: List[dict]) -> Optional[Dict[str, Any]]:
+    # {"order": [keys], "upsert": {key: row}}: rows not in order are gone,
+    # rows not in upsert are unchanged. None when nothing changed.
+    key = LIST_KEYS[name]
+    old_rows = {key(row): row for row in old} if isinstance(old, list) else {}
+    old_order = [key(row) for row in old] if isinstance(old, list) else None
+    order = [key(row) for row in new]
+    upsert = {k: row for k, row in zip(order, new) if old_rows.get(k) != row}
+    if not upsert and order == old_order:
+        return None
+    return {"order": order, "upsert": upsert}
+
+
+class WorkspaceState:
+    # The caller workspace every open UI shows, kept on the server with a
+    # version. update() publishes only the fields (and list rows) that
+    # changed, as {"version", "base_version", "changes", ...extra}. A client
+    # whose version is not base_version missed something and loads
+    # snapshot() (GET /workspace/state) instead of applying the delta.
+    # Versions start at the current time in ms so they never repeat across
+    # restarts. Safe to call from the threadpool endpoints.
+
+    def __init__(self, publish: Callable[[str, Dict[str, Any]], Any]) -> None:
+        self._publish = publish
+        self._lock = threading.Lock()
+        self._fields: Dict[str, Any] = {}
+        self.version = int(time.time() * 1000)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        with self._lock:
+            return self._fields.get(name, default)
+
+    def _apply(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        changes: Dict[str, Any] = {}
+        for name, value in fields.items():
+            old = self._fields.get(name, _MISSING)
+            if name in LIST_KEYS and isinstance(value, list):
+                delta = _list_delta(name, old, value)
+                if delta is not None:
+                    changes[name] = delta
+            elif old is _MISSING or old != value:
+                changes[name] = value
+            self._fields[name] = value
+        return changes
+
+    def _publish_locked(
+        self, event_type: str, changes: Dict[str, Any], extra: Dict[str, Any]
+    ) -> int:
+        base_version = self.version
+        if changes:
+            self.version += 1
+        # Published under the lock so versions reach the stream in order.
+        self._publish(
+            event_type,
+            {
+                "version": self.version,
+                "base_version": base_version,
+                "changes": changes,
+                **extra,
+            },
+        )
+        return self.version
+
+    def update(self, event_type: str, fields: Dict[str, Any], **extra: Any) -> int:
+        with self._lock:
+            return self._publish_locked(event_type, self._apply(fields), extra)
+
+    def refresh(self, event_type: str, phone_digits: str, fields: Dict[str, Any]) -> bool:
+        # For changes made elsewhere (the research app): applies fields only
+        # if phone_digits is still on screen, and publishes only if something
+        # actually changed.
+        with self._lock:
+            if self._fields.get("phone_digits") != phone_digits:
+                return False
+            changes = self._apply(fields)
+            if not changes:
+                return False
+            self._publish_locked(event_type, changes, {})
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        # Same shape as a delta from an empty workspace.
+        with self._lock:
+            state: Dict[str, Any] = {}
+            for name, value in self._fields.items():
+                if name in LIST_KEYS and isinstance(value, list):
+                    value = _list_delta(name, None, value) or {"order": [], "upsert": {}}
+                state[name] = value
+            return {"version": self.version, "base_version": None, "changes": state}
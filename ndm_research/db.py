@@ -1,135 +1,68 @@
 from __future__ import annotations
 
+import base64
+import html
+import json
+import re
 import sqlite3
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Tuple, TypeVar
 
 from shared.app_paths import get_db_path
-from shared.sqlite_utils import connect_sqlite
+from shared.db_executor import DBExecutor
+from shared.migrations import migrate
+from shared.sqlite_utils import get_pool, plain_text
+from shared.write_queue import get_write_queue
 
 DB_PATH = str(get_db_path())
 
+T = TypeVar("T")
+
+_EXECUTOR = DBExecutor()
+
+# The trigram tokenizer cannot match substrings shorter than three characters.
+TRIGRAM_MIN_LEN = 3
+
+_SNIPPET_OPEN = "\x02"
+_SNIPPET_CLOSE = "\x03"
+
 
 def _now_iso() -> str:
     return datetime.now().isoformat()
 
 
-def get_db() -> sqlite3.Connection:
-    return connect_sqlite(DB_PATH)
+def _trigram_phrase(digits: str) -> str:
+    cleaned = "".join(ch for ch in digits if ch.isdigit())
+    return f'"{cleaned}"'
+
+
+def get_db() -> ContextManager[sqlite3.Connection]:
+    return get_pool(DB_PATH).connection()
+
+
+def _write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Writes go through the shared single-writer queue so they are
+    # group-committed with oncall's instead of contending for the lock. Each
+    # fn runs in its own savepoint, so one fn is one atomic change.
+    return get_write_queue(DB_PATH).execute(fn, *args, **kwargs)
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    return await _EXECUTOR.run(fn, *args, **kwargs)
+
+
+def shutdown() -> None:
+    _EXECUTOR.shutdown()
+    get_write_queue(DB_PATH).close()
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {**get_pool(DB_PATH).stats(), "writer": get_write_queue(DB_PATH).stats()}
 
 
 def init_db() -> None:
-    with connect_sqlite(DB_PATH) as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS calls (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ts_start TEXT NOT NULL,
-                ts_end TEXT,
-                phone_digits TEXT NOT NULL,
-                last10 TEXT,
-                display_name TEXT,
-                status TEXT,
-                call_subject TEXT,
-                audio_path TEXT,
-                notes_preview TEXT
-            );
-            CREATE TABLE IF NOT EXISTS call_notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                call_id INTEGER NOT NULL,
-                ts TEXT NOT NULL,
-                note_text TEXT NOT NULL,
-                note_preview TEXT,
-                FOREIGN KEY(call_id) REFERENCES calls(id)
-            );
-            CREATE TABLE IF NOT EXISTS email_links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                opportunity_id INTEGER,
-                phone_digits TEXT,
-                gmail_message_id TEXT,
-                subject TEXT,
-                from_addr TEXT,
-                date TEXT,
-                snippet TEXT,
-                gmail_link TEXT,
-                is_pinned_jd INTEGER DEFAULT 0
-            );
-            CREATE TABLE IF NOT EXISTS research_profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                phone_digits TEXT NOT NULL UNIQUE,
-                last4 TEXT NOT NULL,
-                vendor_name TEXT,
-                vendor_company TEXT,
-                vendor_title TEXT,
-                created_at TEXT,
-                updated_at TEXT
-            );
-            CREATE TABLE IF NOT EXISTS research_jd (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                phone_digits TEXT NOT NULL UNIQUE,
-                jd_text TEXT NOT NULL DEFAULT '',
-                updated_at TEXT
-            );
-            CREATE TABLE IF NOT EXISTS research_resume_lines (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                phone_digits TEXT NOT NULL UNIQUE,
-                resume_text TEXT NOT NULL DEFAULT '',
-                updated_at TEXT
-            );
-            CREATE TABLE IF NOT EXISTS research_recordings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                call_id INTEGER,
-                phone_digits TEXT NOT NULL,
-                audio_path TEXT,
-                file_path TEXT NOT NULL,
-                created_at TEXT,
-                duration_sec INTEGER DEFAULT 0
-            );
-            CREATE TABLE IF NOT EXISTS research_notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                phone_digits TEXT NOT NULL,
-                ts TEXT NOT NULL,
-                note_text TEXT NOT NULL
-            );
-            """
-        )
-        columns = [row[1] for row in conn.execute("PRAGMA table_info(calls)")]
-        if "last10" not in columns:
-            conn.execute("ALTER TABLE calls ADD COLUMN last10 TEXT")
-        conn.execute(
-            "UPDATE calls SET last10 = substr(phone_digits, -10) "
-            "WHERE (last10 IS NULL OR last10 = '') AND phone_digits IS NOT NULL"
-        )
-        recording_columns = [row[1] for row in conn.execute("PRAGMA table_info(research_recordings)")]
-        if "call_id" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN call_id INTEGER")
-        if "audio_path" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN audio_path TEXT")
-        if "file_path" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN file_path TEXT")
-        if "duration_sec" not in recording_columns:
-            conn.execute("ALTER TABLE research_recordings ADD COLUMN duration_sec INTEGER DEFAULT 0")
-
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_calls_phone_digits ON calls(phone_digits)"
-        )
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_last10 ON calls(last10)")
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_email_links_phone_digits ON email_links(phone_digits)"
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_research_profiles_phone_digits "
-            "ON research_profiles(phone_digits)"
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_research_profiles_last4 "
-            "ON research_profiles(last4)"
-        )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_research_notes_phone_digits "
-            "ON research_notes(phone_digits)"
-        )
-        conn.commit()
+    with get_db() as conn:
+        migrate(conn)
 
 
 def search_calls_by_last10(
@@ -137,17 +70,12 @@ def search_calls_by_last10(
 ) -> List[Dict[str, Any]]:
     rows = conn.execute(
         """
-        SELECT COALESCE(last10, substr(phone_digits, -10)) AS phone_digits,
-               MAX(ts_start) AS last_call_ts,
-               COUNT(*) AS call_count,
-               MAX(display_name) AS display_name
-        FROM calls
-        WHERE last10 = ? OR phone_digits = ?
-        GROUP BY COALESCE(last10, substr(phone_digits, -10))
-        ORDER BY last_call_ts DESC
+        SELECT last10 AS phone_digits, last_call_ts, call_count, display_name
+        FROM number_stats
+        WHERE last10 = ?
         LIMIT ?
         """,
-        (last10, last10, limit),
+        (last10, limit),
     ).fetchall()
     return [dict(row) for row in rows]
 
@@ -157,13 +85,9 @@ def search_calls_by_last4(
 ) -> List[Dict[str, Any]]:
     rows = conn.execute(
         """
-        SELECT COALESCE(last10, substr(phone_digits, -10)) AS phone_digits,
-               MAX(ts_start) AS last_call_ts,
-               COUNT(*) AS call_count,
-               MAX(display_name) AS display_name
-        FROM calls
-        WHERE substr(COALESCE(last10, phone_digits), -4) = ?
-        GROUP BY COALESCE(last10, substr(phone_digits, -10))
+        SELECT last10 AS phone_digits, last_call_ts, call_count, display_name
+        FROM number_stats
+        WHERE last4 = ?
         ORDER BY last_call_ts DESC
         LIMIT ?
         """,
@@ -175,20 +99,31 @@ def search_calls_by_last4(
 def search_calls_by_partial(
     conn: sqlite3.Connection, partial: str, limit: int
 ) -> List[Dict[str, Any]]:
-    pattern = f"%{partial}%"
+    if len(partial) < TRIGRAM_MIN_LEN:
+        rows = conn.execute(
+            """
+            SELECT last10 AS phone_digits, last_call_ts, call_count, display_name
+            FROM number_stats
+            WHERE last10 LIKE ?
+            ORDER BY last_call_ts DESC
+            LIMIT ?
+            """,
+            (f"%{partial}%", limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
     rows = conn.execute(
         """
-        SELECT COALESCE(last10, substr(phone_digits, -10)) AS phone_digits,
-               MAX(ts_start) AS last_call_ts,
-               COUNT(*) AS call_count,
-               MAX(display_name) AS display_name
-        FROM calls
-        WHERE last10 LIKE ? OR phone_digits LIKE ?
-        GROUP BY COALESCE(last10, substr(phone_digits, -10))
-        ORDER BY last_call_ts DESC
+        SELECT number_stats.last10 AS phone_digits,
+               number_stats.last_call_ts,
+               number_stats.call_count,
+               number_stats.display_name
+        FROM number_stats_trigram
+        JOIN number_stats ON number_stats.id = number_stats_trigram.rowid
+        WHERE number_stats_trigram MATCH ?
+        ORDER BY number_stats.last_call_ts DESC
         LIMIT ?
         """,
-        (pattern, pattern, limit),
+        (_trigram_phrase(partial), limit),
     ).fetchall()
     return [dict(row) for row in rows]
 
@@ -226,88 +161,257 @@ def search_profiles_by_last4(
 def search_profiles_by_partial(
     conn: sqlite3.Connection, partial: str, limit: int
 ) -> List[Dict[str, Any]]:
-    pattern = f"%{partial}%"
+    if len(partial) < TRIGRAM_MIN_LEN:
+        rows = conn.execute(
+            """
+            SELECT phone_digits, last4, vendor_name, vendor_company, vendor_title
+            FROM research_profiles
+            WHERE phone_digits LIKE ?
+            LIMIT ?
+            """,
+            (f"%{partial}%", limit),
+        ).fetchall()
+        return [dict(row) for row in rows]
     rows = conn.execute(
         """
-        SELECT phone_digits, last4, vendor_name, vendor_company, vendor_title
-        FROM research_profiles
-        WHERE phone_digits LIKE ?
+        SELECT research_profiles.phone_digits,
+               research_profiles.last4,
+               research_profiles.vendor_name,
+               research_profiles.vendor_company,
+               research_profiles.vendor_title
+        FROM research_profiles_trigram
+        JOIN research_profiles ON research_profiles.id = research_profiles_trigram.rowid
+        WHERE research_profiles_trigram MATCH ?
         LIMIT ?
         """,
-        (pattern, limit),
+        (_trigram_phrase(partial), limit),
     ).fetchall()
     return [dict(row) for row in rows]
 
 
-def list_all_numbers(
-    conn: sqlite3.Connection,
-    limit: int = 500,
-    offset: int = 0,
+def _fulltext_match(query: str) -> str:
+    terms = re.findall(r"\w+", query or "")
+    if not terms:
+        return ""
+    # Every term must match; the last one is a prefix so results follow typing.
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _clean_snippet(raw: str) -> str:
+    # The index holds plain text (the *_plain columns, see migration 5), so
+    # the snippet only needs escaping before the match markers become <mark>.
+    text = html.escape(raw or "", quote=False)
+    text = text.replace(_SNIPPET_OPEN, "<mark>").replace(_SNIPPET_CLOSE, "</mark>")
+    return " ".join(text.split())
+
+
+def search_fulltext(
+    conn: sqlite3.Connection, query: str, limit: int
 ) -> List[Dict[str, Any]]:
+    match = _fulltext_match(query)
+    if not match:
+        return []
     rows = conn.execute(
         """
-        WITH call_stats AS (
-            SELECT COALESCE(last10, substr(phone_digits, -10)) AS phone_digits,
-                   MAX(ts_start) AS last_call_ts,
-                   COUNT(*) AS call_count,
-                   MAX(display_name) AS display_name
-            FROM calls
-            GROUP BY COALESCE(last10, substr(phone_digits, -10))
-        ),
-        all_numbers AS (
-            SELECT phone_digits FROM research_profiles
-            UNION
-            SELECT phone_digits FROM call_stats
-        )
-        SELECT all_numbers.phone_digits,
-               call_stats.last_call_ts,
-               COALESCE(call_stats.call_count, 0) AS call_count,
-               call_stats.display_name,
-               research_profiles.vendor_name
-        FROM all_numbers
-        LEFT JOIN call_stats
-            ON call_stats.phone_digits = all_numbers.phone_digits
-        LEFT JOIN research_profiles
-            ON research_profiles.phone_digits = all_numbers.phone_digits
-        ORDER BY call_stats.last_call_ts DESC, all_numbers.phone_digits ASC
-        LIMIT ? OFFSET ?
+        SELECT phone_digits,
+               source,
+               ref_id,
+               bm25(fulltext_index, 0.0, 0.0, 0.0, 2.0, 1.0) AS rank,
+               snippet(fulltext_index, -1, ?, ?, '…', 12) AS snippet
+        FROM fulltext_index
+        WHERE fulltext_index MATCH ?
+        ORDER BY rank
+        LIMIT ?
         """,
-        (limit, offset),
+        (_SNIPPET_OPEN, _SNIPPET_CLOSE, match, limit),
     ).fetchall()
-    return [dict(row) for row in rows]
+
+    groups: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        phone_digits = row["phone_digits"] or ""
+        group = groups.get(phone_digits)
+        if group is None:
+            group = {"phone_digits": phone_digits, "rank": row["rank"], "hits": []}
+            groups[phone_digits] = group
+        group["hits"].append(
+            {
+                "source": row["source"],
+                "ref_id": row["ref_id"],
+                "rank": row["rank"],
+                "snippet": _clean_snippet(row["snippet"]),
+            }
+        )
+
+    numbers = [key for key in groups if key]
+    if numbers:
+        placeholders = ",".join("?" for _ in numbers)
+        for row in conn.execute(
+            f"""
+            SELECT number_stats.last10 AS phone_digits,
+                   number_stats.last_call_ts,
+                   number_stats.call_count,
+                   number_stats.display_name
+            FROM number_stats
+            WHERE number_stats.last10 IN ({placeholders})
+            """,
+            numbers,
+        ):
+            groups[row["phone_digits"]].update(
+                {
+                    "last_call_ts": row["last_call_ts"],
+                    "call_count": row["call_count"],
+                    "display_name": row["display_name"],
+                }
+            )
+        for row in conn.execute(
+            f"""
+            SELECT phone_digits, vendor_name
+            FROM research_profiles
+            WHERE phone_digits IN ({placeholders})
+            """,
+            numbers,
+        ):
+            groups[row["phone_digits"]]["vendor_name"] = row["vendor_name"]
+    return list(groups.values())
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], size: int) -> Optional[List[Any]]:
+    if not token:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def list_all_numbers(
+    conn: sqlite3.Connection,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # Numbers with calls come first, newest call first, keyed on
+    # (last_call_ts, phone_digits); numbers that only have a research profile
+    # follow in phone_digits order (cursor ts is null there). Each page is an
+    # index range scan, so cost does not grow with depth.
+    after = decode_cursor(cursor, 2)
+    rows: List[Dict[str, Any]] = []
+    if after is None or after[0] is not None:
+        params: List[Any] = []
+        where = ""
+        if after is not None:
+            where = "WHERE (number_stats.last_call_ts, number_stats.last10) < (?, ?)"
+            params.extend(after)
+        params.append(limit + 1)
+        rows.extend(
+            dict(row)
+            for row in conn.execute(
+                f"""
+                SELECT number_stats.last10 AS phone_digits,
+                       number_stats.last_call_ts AS last_call_ts,
+                       number_stats.call_count AS call_count,
+                       number_stats.display_name AS display_name,
+                       research_profiles.vendor_name AS vendor_name
+                FROM number_stats
+                LEFT JOIN research_profiles
+                    ON research_profiles.phone_digits = number_stats.last10
+                {where}
+                ORDER BY number_stats.last_call_ts DESC, number_stats.last10 DESC
+                LIMIT ?
+                """,
+                params,
+            )
+        )
+    if len(rows) <= limit:
+        after_digits = after[1] if after is not None and after[0] is None else ""
+        rows.extend(
+            dict(row)
+            for row in conn.execute(
+                """
+                SELECT research_profiles.phone_digits AS phone_digits,
+                       NULL AS last_call_ts,
+                       0 AS call_count,
+                       NULL AS display_name,
+                       research_profiles.vendor_name AS vendor_name
+                FROM research_profiles
+                WHERE research_profiles.phone_digits > ?
+                  AND NOT EXISTS (
+                      SELECT 1 FROM number_stats
+                      WHERE number_stats.last10 = research_profiles.phone_digits
+                  )
+                ORDER BY research_profiles.phone_digits ASC
+                LIMIT ?
+                """,
+                (after_digits, limit + 1 - len(rows)),
+            )
+        )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last["last_call_ts"], last["phone_digits"]])
+    return rows, next_cursor
 
 
 def list_calls(
     conn: sqlite3.Connection,
     last10: str,
     limit: int,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    rows = conn.execute(
-        """
-        SELECT * FROM calls
-        WHERE last10 = ? OR phone_digits = ?
-        ORDER BY ts_start DESC
-        LIMIT ? OFFSET ?
-        """,
-        (last10, last10, limit, offset),
-    ).fetchall()
-    return [dict(row) for row in rows]
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    # last10 is always populated (migration 2 backfilled legacy rows), so the
+    # (last10, ts_start) index serves both the filter and the cursor range.
+    after = decode_cursor(cursor, 2)
+    params: List[Any] = [last10]
+    where = ""
+    if after is not None:
+        where = "AND (ts_start, id) < (?, ?)"
+        params.extend(after)
+    params.append(limit + 1)
+    rows = [
+        dict(row)
+        for row in conn.execute(
+            f"""
+            SELECT * FROM calls
+            WHERE last10 = ? {where}
+            ORDER BY ts_start DESC, id DESC
+            LIMIT ?
+            """,
+            params,
+        )
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]["ts_start"], rows[-1]["id"]])
+    return rows, next_cursor
 
 
 def list_call_notes(
     conn: sqlite3.Connection, last10: str, limit: int
 ) -> List[Dict[str, Any]]:
+    # Newest call first, then newest note within it: both index ranges are
+    # walked in order instead of sorting every note the number has.
     rows = conn.execute(
         """
         SELECT call_notes.id, call_notes.call_id, call_notes.ts, call_notes.note_text
-        FROM call_notes
-        JOIN calls ON call_notes.call_id = calls.id
-        WHERE calls.last10 = ? OR calls.phone_digits = ?
-        ORDER BY call_notes.ts DESC
+        FROM calls
+        JOIN call_notes ON call_notes.call_id = calls.id
+        WHERE calls.last10 = ?
+        ORDER BY calls.ts_start DESC, calls.id DESC, call_notes.ts DESC
         LIMIT ?
         """,
-        (last10, last10, limit),
+        (last10, limit),
     ).fetchall()
     return [dict(row) for row in rows]
 
@@ -331,14 +435,18 @@ def list_research_notes(
 def list_email_links(
     conn: sqlite3.Connection, last10: str
 ) -> List[Dict[str, Any]]:
-    pattern = f"%{last10}%"
+    # OnCall stores the digits it was posted, i.e. last10 or 1 + last10. Two
+    # index ranges merged by id, rather than IN (...) and a sort.
     rows = conn.execute(
         """
         SELECT * FROM email_links
-        WHERE phone_digits = ? OR phone_digits LIKE ?
+        WHERE phone_digits = ? AND deleted_at IS NULL
+        UNION ALL
+        SELECT * FROM email_links
+        WHERE phone_digits = ? AND deleted_at IS NULL
         ORDER BY id DESC
         """,
-        (last10, pattern),
+        (last10, f"1{last10}"),
     ).fetchall()
     return [dict(row) for row in rows]
 
@@ -367,40 +475,26 @@ def list_recordings(
 
 def get_latest_call_id(conn: sqlite3.Connection, last10: str) -> Optional[int]:
     row = conn.execute(
-        """
-        SELECT id FROM calls
-        WHERE last10 = ? OR phone_digits = ?
-        ORDER BY ts_start DESC
-        LIMIT 1
-        """,
-        (last10, last10),
+        "SELECT latest_call_id FROM number_stats WHERE last10 = ?",
+        (last10,),
     ).fetchone()
-    return int(row[0]) if row else None
+    return int(row[0]) if row and row[0] is not None else None
 
 
 def get_latest_call_display_name(
     conn: sqlite3.Connection, last10: str
 ) -> Optional[str]:
     row = conn.execute(
-        """
-        SELECT display_name FROM calls
-        WHERE last10 = ? OR phone_digits = ?
-        ORDER BY ts_start DESC
-        LIMIT 1
-        """,
-        (last10, last10),
+        "SELECT display_name FROM number_stats WHERE last10 = ?",
+        (last10,),
     ).fetchone()
     return str(row[0]) if row and row[0] else None
 
 
 def get_call_stats(conn: sqlite3.Connection, last10: str) -> Dict[str, Any]:
     row = conn.execute(
-        """
-        SELECT COUNT(*) AS call_count, MAX(ts_start) AS last_call_ts
-        FROM calls
-        WHERE last10 = ? OR phone_digits = ?
-        """,
-        (last10, last10),
+        "SELECT call_count, last_call_ts FROM number_stats WHERE last10 = ?",
+        (last10,),
     ).fetchone()
     return dict(row) if row else {"call_count": 0, "last_call_ts": None}
 
@@ -415,7 +509,7 @@ def get_profile(conn: sqlite3.Connection, last10: str) -> Optional[Dict[str, Any
     return dict(row) if row else None
 
 
-def upsert_profile(
+def _upsert_profile(
     conn: sqlite3.Connection,
     last10: str,
     last4: str,
@@ -438,10 +532,19 @@ def upsert_profile(
         """,
         (last10, last4, vendor_name, vendor_company, vendor_title, now, now),
     )
-    conn.commit()
 
 
-def ensure_profile(conn: sqlite3.Connection, last10: str, last4: str) -> None:
+def upsert_profile(
+    last10: str,
+    last4: str,
+    vendor_name: Optional[str],
+    vendor_company: Optional[str],
+    vendor_title: Optional[str],
+) -> None:
+    _write(_upsert_profile, last10, last4, vendor_name, vendor_company, vendor_title)
+
+
+def _ensure_profile(conn: sqlite3.Connection, last10: str, last4: str) -> None:
     now = _now_iso()
     conn.execute(
         """
@@ -451,7 +554,34 @@ def ensure_profile(conn: sqlite3.Connection, last10: str, last4: str) -> None:
         """,
         (last10, last4, now, now),
     )
-    conn.commit()
+
+
+def ensure_profile(last10: str, last4: str) -> None:
+    _write(_ensure_profile, last10, last4)
+
+
+def _create_profile(
+    conn: sqlite3.Connection,
+    last10: str,
+    last4: str,
+    vendor_name: Optional[str],
+    vendor_company: Optional[str],
+    vendor_title: Optional[str],
+) -> None:
+    _upsert_profile(conn, last10, last4, vendor_name, vendor_company, vendor_title)
+    _ensure_jd(conn, last10)
+    _ensure_resume(conn, last10)
+
+
+def create_profile(
+    last10: str,
+    last4: str,
+    vendor_name: Optional[str],
+    vendor_company: Optional[str],
+    vendor_title: Optional[str],
+) -> None:
+    # Profile plus its empty JD and resume rows, all or nothing.
+    _write(_create_profile, last10, last4, vendor_name, vendor_company, vendor_title)
 
 
 def get_jd_text(conn: sqlite3.Connection, last10: str) -> str:
@@ -462,27 +592,34 @@ def get_jd_text(conn: sqlite3.Connection, last10: str) -> str:
     return str(row[0]) if row and row[0] else ""
 
 
-def upsert_jd(conn: sqlite3.Connection, last10: str, jd_text: str) -> None:
+def _upsert_jd(conn: sqlite3.Connection, last10: str, jd_text: str) -> None:
     now = _now_iso()
     conn.execute(
         """
-        INSERT INTO research_jd (phone_digits, jd_text, updated_at)
-        VALUES (?, ?, ?)
+        INSERT INTO research_jd (phone_digits, jd_text, jd_plain, updated_at)
+        VALUES (?, ?, ?, ?)
         ON CONFLICT(phone_digits) DO UPDATE SET
             jd_text = excluded.jd_text,
+            jd_plain = excluded.jd_plain,
             updated_at = excluded.updated_at
         """,
-        (last10, jd_text, now),
+        (last10, jd_text, plain_text(jd_text), now),
     )
-    conn.commit()
 
 
-def ensure_jd(conn: sqlite3.Connection, last10: str) -> None:
+def upsert_jd(last10: str, jd_text: str) -> None:
+    _write(_upsert_jd, last10, jd_text)
+
+
+def _ensure_jd(conn: sqlite3.Connection, last10: str) -> None:
     conn.execute(
         "INSERT OR IGNORE INTO research_jd (phone_digits, jd_text, updated_at) VALUES (?, '', ?)",
         (last10, _now_iso()),
     )
-    conn.commit()
+
+
+def ensure_jd(last10: str) -> None:
+    _write(_ensure_jd, last10)
 
 
 def get_resume_text(conn: sqlite3.Connection, last10: str) -> str:
@@ -493,30 +630,37 @@ def get_resume_text(conn: sqlite3.Connection, last10: str) -> str:
     return str(row[0]) if row and row[0] else ""
 
 
-def upsert_resume(conn: sqlite3.Connection, last10: str, resume_text: str) -> None:
+def _upsert_resume(conn: sqlite3.Connection, last10: str, resume_text: str) -> None:
     now = _now_iso()
     conn.execute(
         """
-        INSERT INTO research_resume_lines (phone_digits, resume_text, updated_at)
-        VALUES (?, ?, ?)
+        INSERT INTO research_resume_lines (phone_digits, resume_text, resume_plain, updated_at)
+        VALUES (?, ?, ?, ?)
         ON CONFLICT(phone_digits) DO UPDATE SET
             resume_text = excluded.resume_text,
+            resume_plain = excluded.resume_plain,
             updated_at = excluded.updated_at
         """,
-        (last10, resume_text, now),
+        (last10, resume_text, plain_text(resume_text), now),
     )
-    conn.commit()
 
 
-def ensure_resume(conn: sqlite3.Connection, last10: str) -> None:
+def upsert_resume(last10: str, resume_text: str) -> None:
+    _write(_upsert_resume, last10, resume_text)
+
+
+def _ensure_resume(conn: sqlite3.Connection, last10: str) -> None:
     conn.execute(
         "INSERT OR IGNORE INTO research_resume_lines (phone_digits, resume_text, updated_at) VALUES (?, '', ?)",
         (last10, _now_iso()),
     )
-    conn.commit()
 
 
-def add_call_note(
+def ensure_resume(last10: str) -> None:
+    _write(_ensure_resume, last10)
+
+
+def _add_call_note(
     conn: sqlite3.Connection, call_id: int, note_text: str
 ) -> Dict[str, Any]:
     ts = _now_iso()
@@ -524,12 +668,11 @@ def add_call_note(
     cur = conn.cursor()
     cur.execute(
         """
-        INSERT INTO call_notes (call_id, ts, note_text, note_preview)
-        VALUES (?, ?, ?, ?)
+        INSERT INTO call_notes (call_id, ts, note_text, note_plain, note_preview)
+        VALUES (?, ?, ?, ?, ?)
         """,
-        (call_id, ts, note_text, preview),
+        (call_id, ts, note_text, plain_text(note_text), preview),
     )
-    conn.commit()
     return {
         "id": int(cur.lastrowid),
         "call_id": call_id,
@@ -539,52 +682,67 @@ def add_call_note(
     }
 
 
-def add_research_note(
+def add_call_note(call_id: int, note_text: str) -> Dict[str, Any]:
+    return _write(_add_call_note, call_id, note_text)
+
+
+def _add_research_note(
     conn: sqlite3.Connection, last10: str, note_text: str
 ) -> Dict[str, Any]:
     ts = _now_iso()
     cur = conn.cursor()
     cur.execute(
         """
-        INSERT INTO research_notes (phone_digits, ts, note_text)
-        VALUES (?, ?, ?)
+        INSERT INTO research_notes (phone_digits, ts, note_text, note_plain)
+        VALUES (?, ?, ?, ?)
         """,
-        (last10, ts, note_text),
+        (last10, ts, note_text, plain_text(note_text)),
     )
-    conn.commit()
     return {"id": int(cur.lastrowid), "ts": ts, "note_text": note_text}
 
 
-def update_note_any(conn: sqlite3.Connection, note_id: int, note_text: str) -> bool:
+def add_research_note(last10: str, note_text: str) -> Dict[str, Any]:
+    return _write(_add_research_note, last10, note_text)
+
+
+def _update_note_any(conn: sqlite3.Connection, note_id: int, note_text: str) -> bool:
     preview = note_text[:140]
+    plain = plain_text(note_text)
     cur = conn.execute(
-        "UPDATE research_notes SET note_text = ? WHERE id = ?",
-        (note_text, note_id),
+        "UPDATE research_notes SET note_text = ?, note_plain = ? WHERE id = ?",
+        (note_text, plain, note_id),
     )
     if cur.rowcount:
-        conn.commit()
         return True
 
     cur = conn.execute(
-        "UPDATE call_notes SET note_text = ?, note_preview = ? WHERE id = ?",
-        (note_text, preview, note_id),
+        "UPDATE call_notes SET note_text = ?, note_plain = ?, note_preview = ? WHERE id = ?",
+        (note_text, plain, preview, note_id),
     )
-    conn.commit()
     return bool(cur.rowcount)
 
 
-def delete_note_any(conn: sqlite3.Connection, note_id: int) -> bool:
+def update_note_any(note_id: int, note_text: str) -> bool:
+    return _write(_update_note_any, note_id, note_text)
+
+
+def _delete_note_any(conn: sqlite3.Connection, note_id: int) -> bool:
     cur = conn.execute("DELETE FROM research_notes WHERE id = ?", (note_id,))
     if cur.rowcount:
-        conn.commit()
         return True
 
     cur = conn.execute("DELETE FROM call_notes WHERE id = ?", (note_id,))
-    conn.commit()
     return bool(cur.rowcount)
 
 
-def delete_call(conn: sqlite3.Connection, call_id: int) -> None:
+def delete_note_any(note_id: int) -> bool:
+    return _write(_delete_note_any, note_id)
+
+
+def _delete_call(conn: sqlite3.Connection, call_id: int) -> None:
     conn.execute("DELETE FROM call_notes WHERE call_id = ?", (call_id,))
     conn.execute("DELETE FROM calls WHERE id = ?", (call_id,))
-    conn.commit()
+
+
+def delete_call(call_id: int) -> None:
+    _write(_delete_call, call_id)
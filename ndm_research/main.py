@@ -3,23 +3,26 @@ from __future__ import annotations
 import logging
 import re
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import sqlite3
 from fastapi import Depends, FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from shared import profile_store
 from fastapi.templating import Jinja2Templates
 
 from ndm_research import db
 from shared.app_paths import get_db_path
-from shared.sqlite_utils import get_journal_mode
+from shared.change_feed import ChangeFeed
+from shared.sqlite_utils import get_journal_mode, set_change_origin
+from shared.sse_broker import SSEBroker, parse_last_event_id
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger("ndm_research")
 
 app = FastAPI(title="NDM Research")
+set_change_origin("research")
 
 RESOURCE_DIR = Path(__file__).parent
 TEMPLATES_DIR = RESOURCE_DIR / "templates"
@@ -27,6 +30,24 @@ STATIC_DIR = RESOURCE_DIR / "static"
 SHARED_STATIC_DIR = RESOURCE_DIR.parent / "shared" / "static"
 
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+BROKER = SSEBroker()
+
+
+def _on_db_changes(rows: List[dict]) -> None:
+    # Runs on the change feed thread: one db_changed event per batch, with
+    # each (table, number) listed once.
+    changes = {}
+    for row in rows:
+        changes[(row["table_name"], row["last10"])] = {
+            "table": row["table_name"],
+            "op": row["op"],
+            "row_id": row["row_id"],
+            "last10": row["last10"],
+        }
+    BROKER.publish("db_changed", {"changes": list(changes.values())})
+
+
+CHANGES = ChangeFeed(str(get_db_path()), _on_db_changes)
 
 
 def normalize_digits(value: str) -> str:
@@ -67,11 +88,8 @@ def format_phone(last10: str) -> str:
 
 
 def get_db_conn():
-    conn = db.get_db()
-    try:
+    with db.get_db() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 @app.on_event("startup")
@@ -79,12 +97,33 @@ def startup() -> None:
     db.init_db()
     db_path = get_db_path()
     logger.info("NDM_RESEARCH_DB_PATH=%s", db_path)
-    conn = db.get_db()
-    try:
+    with db.get_db() as conn:
         journal_mode = get_journal_mode(conn)
-    finally:
-        conn.close()
     logger.info("DB_JOURNAL_MODE %s", journal_mode)
+    BROKER.bind_loop()
+    CHANGES.start()
+
+
+@app.on_event("shutdown")
+def shutdown() -> None:
+    CHANGES.stop()
+    BROKER.close()
+    db.shutdown()
+
+
+@app.get("/research/events")
+async def research_events(request: Request, last_event_id: Optional[str] = None):
+    resume_from = parse_last_event_id(request.headers.get("last-event-id") or last_event_id)
+    return StreamingResponse(
+        BROKER.stream(BROKER.subscribe(resume_from)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/research/events/stats")
+def research_events_stats():
+    return {**BROKER.stats(), "change_feed": CHANGES.stats()}
 
 
 @app.get("/research", response_class=HTMLResponse)
@@ -104,17 +143,22 @@ def research_profile_data(digits: str):
 async def research_profile_update(digits: str, request: Request):
     payload = await request.json()
     payload["phone_digits"] = digits
-    profile = profile_store.save_profile(payload)
+    profile = await db.run(profile_store.save_profile, payload)
     return {"ok": True, "profile": profile}
 
 
 @app.post("/research/profile-data/{digits}/notes")
 async def research_profile_note(digits: str, request: Request):
     payload = await request.json()
-    notes = profile_store.add_note(digits, payload.get("note_text", ""))
+    notes = await db.run(profile_store.add_note, digits, payload.get("note_text", ""))
     return {"ok": True, "notes": notes}
 
 
+@app.get("/research/db/pool")
+def research_db_pool():
+    return {"ok": True, "pool": db.pool_stats()}
+
+
 @app.get("/research/search")
 def research_search(
     q: Optional[str] = None, conn: sqlite3.Connection = Depends(get_db_conn)
@@ -160,15 +204,46 @@ def research_search(
     return {"ok": True, "results": formatted_results}
 
 
+@app.get("/research/fulltext")
+def research_fulltext(
+    q: Optional[str] = None,
+    limit: int = 200,
+    conn: sqlite3.Connection = Depends(get_db_conn),
+):
+    query = (q or "").strip()
+    if not query:
+        return {"ok": True, "results": []}
+    limit = max(1, min(limit, 500))
+    try:
+        groups = db.search_fulltext(conn, query, limit=limit)
+    except sqlite3.OperationalError as exc:
+        logger.warning("FULLTEXT_QUERY_ERROR q=%s error=%s", query, exc)
+        return {"ok": True, "results": []}
+    results = []
+    for group in groups:
+        results.append(
+            {
+                "phone_digits": group.get("phone_digits"),
+                "formatted": format_phone(group.get("phone_digits")),
+                "vendor_name": group.get("vendor_name"),
+                "last_call_ts": group.get("last_call_ts"),
+                "call_count": group.get("call_count", 0),
+                "display_name": group.get("display_name"),
+                "rank": group.get("rank"),
+                "hits": group.get("hits", []),
+            }
+        )
+    return {"ok": True, "results": results}
+
+
 @app.get("/research/numbers")
 def research_numbers(
-    limit: int = 500,
-    offset: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
     conn: sqlite3.Connection = Depends(get_db_conn),
 ):
-    limit = max(1, min(limit, 2000))
-    offset = max(0, offset)
-    rows = db.list_all_numbers(conn, limit=limit, offset=offset)
+    limit = max(1, min(limit, 500))
+    rows, next_cursor = db.list_all_numbers(conn, limit=limit, cursor=cursor)
     results = []
     for row in rows:
         results.append(
@@ -181,19 +256,18 @@ def research_numbers(
                 "display_name": row.get("display_name"),
             }
         )
-    return {"ok": True, "results": results}
+    return {"ok": True, "results": results, "next_cursor": next_cursor}
 
 
 def build_workspace_data(
     conn: sqlite3.Connection,
     phone_digits: str,
-    offset: int,
+    cursor: Optional[str],
     limit: int,
 ) -> Dict[str, Any]:
     normalized = normalize_last10(phone_digits)
 
     limit = max(1, min(limit, 200))
-    offset = max(0, offset)
 
     profile = db.get_profile(conn, normalized) if normalized else None
     shared_profile = profile_store.load_profile(normalized) if normalized else None
@@ -230,16 +304,15 @@ def build_workspace_data(
 
         if profile_missing_vendor and shared_has_vendor:
             db.upsert_profile(
-                conn,
                 normalized,
                 normalized[-4:] if len(normalized) >= 4 else "",
                 profile.get("vendor_name") or None,
                 profile.get("vendor_company") or None,
                 profile.get("vendor_title") or None,
             )
-    calls = db.list_calls(conn, normalized, limit + 1, offset) if normalized else []
-    has_more_calls = len(calls) > limit
-    calls = calls[:limit]
+    calls, next_calls_cursor = (
+        db.list_calls(conn, normalized, limit, cursor) if normalized else ([], None)
+    )
     call_notes = db.list_call_notes(conn, normalized, limit=200) if normalized else []
     research_notes = (
         db.list_research_notes(conn, normalized, limit=200) if normalized else []
@@ -291,8 +364,9 @@ def build_workspace_data(
         "latest_call_id": latest_call_id,
         "call_count": stats.get("call_count", 0),
         "last_call_ts": stats.get("last_call_ts"),
-        "has_more_calls": has_more_calls,
-        "offset": offset,
+        "has_more_calls": next_calls_cursor is not None,
+        "calls_cursor": cursor,
+        "next_calls_cursor": next_calls_cursor,
         "limit": limit,
         "has_profile": bool(profile),
     }
@@ -302,11 +376,11 @@ def build_workspace_data(
 def research_workspace(
     request: Request,
     digits: str,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
     conn: sqlite3.Connection = Depends(get_db_conn),
 ):
-    workspace = build_workspace_data(conn, digits, offset=offset, limit=limit)
+    workspace = build_workspace_data(conn, digits, cursor=cursor, limit=limit)
     return templates.TemplateResponse(
         "workspace.html",
         {"request": request, "workspace": workspace},
@@ -316,49 +390,43 @@ def research_workspace(
 @app.get("/research/workspace/{digits}/data")
 def research_workspace_data(
     digits: str,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
     conn: sqlite3.Connection = Depends(get_db_conn),
 ):
-    data = build_workspace_data(conn, digits, offset=offset, limit=limit)
+    data = build_workspace_data(conn, digits, cursor=cursor, limit=limit)
     return JSONResponse(content={"ok": True, "workspace": data})
 
 
 @app.post("/research/profile")
-async def create_profile(
-    request: Request, conn: sqlite3.Connection = Depends(get_db_conn)
-):
+async def create_profile(request: Request):
     payload = await request.json()
     last10, last4, _ = normalize_query(payload.get("phone_digits", ""))
     if not last10 or not last4:
         return JSONResponse(
             status_code=400, content={"ok": False, "error": "phone_digits required"}
         )
-    db.upsert_profile(
-        conn,
+    await db.run(
+        db.create_profile,
         last10,
         last4,
         payload.get("vendor_name"),
         payload.get("vendor_company"),
         payload.get("vendor_title"),
     )
-    db.ensure_jd(conn, last10)
-    db.ensure_resume(conn, last10)
     return {"ok": True, "phone_digits": last10}
 
 
 @app.put("/research/profile/{phone_digits}")
-async def update_profile(
-    phone_digits: str, request: Request, conn: sqlite3.Connection = Depends(get_db_conn)
-):
+async def update_profile(phone_digits: str, request: Request):
     payload = await request.json()
     last10, last4, _ = normalize_query(phone_digits)
     if not last10 or not last4:
         return JSONResponse(
             status_code=400, content={"ok": False, "error": "phone_digits required"}
         )
-    db.upsert_profile(
-        conn,
+    await db.run(
+        db.upsert_profile,
         last10,
         last4,
         payload.get("vendor_name"),
@@ -369,37 +437,31 @@ async def update_profile(
 
 
 @app.put("/research/jd/{phone_digits}")
-async def update_jd(
-    phone_digits: str, request: Request, conn: sqlite3.Connection = Depends(get_db_conn)
-):
+async def update_jd(phone_digits: str, request: Request):
     payload = await request.json()
     last10, _, _ = normalize_query(phone_digits)
     if not last10:
         return JSONResponse(
             status_code=400, content={"ok": False, "error": "phone_digits required"}
         )
-    db.upsert_jd(conn, last10, payload.get("jd_text", ""))
+    await db.run(db.upsert_jd, last10, payload.get("jd_text", ""))
     return {"ok": True}
 
 
 @app.put("/research/resume/{phone_digits}")
-async def update_resume(
-    phone_digits: str, request: Request, conn: sqlite3.Connection = Depends(get_db_conn)
-):
+async def update_resume(phone_digits: str, request: Request):
     payload = await request.json()
     last10, _, _ = normalize_query(phone_digits)
     if not last10:
         return JSONResponse(
             status_code=400, content={"ok": False, "error": "phone_digits required"}
         )
-    db.upsert_resume(conn, last10, payload.get("resume_text", ""))
+    await db.run(db.upsert_resume, last10, payload.get("resume_text", ""))
     return {"ok": True}
 
 
 @app.post("/research/note")
-async def create_note(
-    request: Request, conn: sqlite3.Connection = Depends(get_db_conn)
-):
+async def create_note(request: Request):
     payload = await request.json()
     call_id = payload.get("call_id")
     note_text = (payload.get("note_text") or "").strip()
@@ -411,7 +473,7 @@ async def create_note(
         )
 
     if call_id:
-        note = db.add_call_note(conn, int(call_id), note_text)
+        note = await db.run(db.add_call_note, int(call_id), note_text)
         return {"ok": True, "note": note}
 
     if not last10 or not last4:
@@ -419,37 +481,35 @@ async def create_note(
             status_code=400,
             content={"ok": False, "error": "phone_digits required"},
         )
-    note = db.add_research_note(conn, last10, note_text)
+    note = await db.run(db.add_research_note, last10, note_text)
     return {"ok": True, "note": note}
 
 
 @app.put("/research/note/{note_id}")
-async def update_note(
-    note_id: int, request: Request, conn: sqlite3.Connection = Depends(get_db_conn)
-):
+async def update_note(note_id: int, request: Request):
     payload = await request.json()
     note_text = (payload.get("note_text") or "").strip()
     if not note_text:
         return JSONResponse(
             status_code=400, content={"ok": False, "error": "note_text required"}
         )
-    updated = db.update_note_any(conn, note_id, note_text)
+    updated = await db.run(db.update_note_any, note_id, note_text)
     if not updated:
         return JSONResponse(status_code=404, content={"ok": False, "error": "not found"})
     return {"ok": True}
 
 
 @app.delete("/research/note/{note_id}")
-def delete_note(note_id: int, conn: sqlite3.Connection = Depends(get_db_conn)):
-    deleted = db.delete_note_any(conn, note_id)
+def delete_note(note_id: int):
+    deleted = db.delete_note_any(note_id)
     if not deleted:
         return JSONResponse(status_code=404, content={"ok": False, "error": "not found"})
     return {"ok": True}
 
 
 @app.delete("/research/call/{call_id}")
-def delete_call(call_id: int, conn: sqlite3.Connection = Depends(get_db_conn)):
-    db.delete_call(conn, call_id)
+def delete_call(call_id: int):
+    db.delete_call(call_id)
     return {"ok": True}
 
 
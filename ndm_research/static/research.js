@@ -41,6 +41,8 @@ let noteQuill = null;
 let resumeQuill = null;
 let vendorDirty = false;
 const noteEditors = new Map();
+// Notes edited in place but not saved yet; a live refresh would drop them.
+const dirtyNotes = new Set();
 
 async function persistVendorProfile() {
   if (!activeDigits) return;
@@ -221,24 +223,63 @@ function setState(state, payload) {
   }
 }
 
-async function loadAllNumbers() {
-  if (!allNumbersList) return;
-  setState("all");
-  if (!allNumbersLoaded) {
-    setEmpty(allNumbersList, "Loading numbers...");
-    try {
-      const data = await fetchJson("/research/numbers");
-      const results = data.results || [];
+const NUMBERS_PAGE_SIZE = 100;
+let allNumbersCursor = null;
+let allNumbersLoading = false;
+let allNumbersSentinel = null;
+let allNumbersObserver = null;
+
+async function loadNumbersPage() {
+  if (allNumbersLoading || (allNumbersLoaded && !allNumbersCursor)) return;
+  allNumbersLoading = true;
+  try {
+    const params = new URLSearchParams({ limit: String(NUMBERS_PAGE_SIZE) });
+    if (allNumbersCursor) params.set("cursor", allNumbersCursor);
+    const data = await fetchJson(`/research/numbers?${params.toString()}`);
+    const results = data.results || [];
+    if (!allNumbersLoaded) {
       allNumbersList.innerHTML = "";
       if (results.length === 0) {
         setEmpty(allNumbersList, "No numbers found.");
-      } else {
-        results.forEach((item) => renderResultRow(item, allNumbersList));
       }
-      allNumbersLoaded = true;
-    } catch (err) {
+    }
+    results.forEach((item) => renderResultRow(item, allNumbersList));
+    allNumbersCursor = data.next_cursor || null;
+    allNumbersLoaded = true;
+    if (allNumbersSentinel) {
+      // Keep the sentinel last so the observer fires as the list grows.
+      allNumbersList.appendChild(allNumbersSentinel);
+      allNumbersSentinel.classList.toggle("hidden", !allNumbersCursor);
+    }
+  } catch (err) {
+    if (!allNumbersLoaded) {
       setEmpty(allNumbersList, "Failed to load numbers.");
     }
+  } finally {
+    allNumbersLoading = false;
+  }
+}
+
+function ensureNumbersObserver() {
+  if (allNumbersObserver || !("IntersectionObserver" in window)) return;
+  allNumbersSentinel = document.createElement("div");
+  allNumbersSentinel.className = "empty-state hidden";
+  allNumbersSentinel.textContent = "Loading more...";
+  allNumbersObserver = new IntersectionObserver((entries) => {
+    if (entries.some((entry) => entry.isIntersecting)) {
+      loadNumbersPage();
+    }
+  });
+  allNumbersObserver.observe(allNumbersSentinel);
+}
+
+async function loadAllNumbers() {
+  if (!allNumbersList) return;
+  setState("all");
+  if (!allNumbersLoaded) {
+    setEmpty(allNumbersList, "Loading numbers...");
+    ensureNumbersObserver();
+    await loadNumbersPage();
   }
 }
 
@@ -273,6 +314,7 @@ function renderNotes(items) {
   if (!notesList) return;
   notesList.innerHTML = "";
   noteEditors.clear();
+  dirtyNotes.clear();
   if (!items || items.length === 0) {
     setEmpty(notesList, "No notes yet.");
     return;
@@ -353,6 +395,7 @@ function renderNotes(items) {
     if (quill) {
       setQuillHtml(quill, note.note_text || "");
       noteEditors.set(note.id, quill);
+      quill.on("text-change", onUserEdit(() => dirtyNotes.add(note.id)));
     } else {
       editor.innerHTML = note.note_text || "";
     }
@@ -516,10 +559,11 @@ function renderWorkspace(payload) {
   if (vendorName && !(vendorNameInput && vendorNameInput.value)) {
     vendorName.textContent = payload.display_name || "Research Profile";
   }
-  if (jdQuill) {
+  // Re-setting identical content would move the cursor.
+  if (jdQuill && getQuillHtml(jdQuill) !== (payload.jd_text || "")) {
     setQuillHtml(jdQuill, payload.jd_text || "");
   }
-  if (resumeQuill) {
+  if (resumeQuill && getQuillHtml(resumeQuill) !== (payload.resume_text || "")) {
     setQuillHtml(resumeQuill, payload.resume_text || "");
   }
   if (summaryLastCall)
@@ -546,6 +590,7 @@ async function syncVendorFromProfileStore() {
 
 async function refreshWorkspace() {
   if (!activeDigits) return;
+  liveRefreshPending = false;
   const data = await fetchJson(
     `/research/workspace/${encodeURIComponent(activeDigits)}/data`,
   );
@@ -553,9 +598,55 @@ async function refreshWorkspace() {
   await syncVendorFromProfileStore();
 }
 
+const FULLTEXT_SOURCE_LABELS = {
+  call_note: "Call note",
+  research_note: "Note",
+  jd: "JD",
+  resume: "Resume",
+  email: "Email",
+};
+
+function renderFulltextRow(item, container) {
+  renderResultRow(item, container);
+  const row = container.lastElementChild;
+  const info = row?.querySelector(".result-info");
+  if (!info) return;
+  (item.hits || []).slice(0, 3).forEach((hit) => {
+    const line = document.createElement("div");
+    line.className = "result-meta";
+    const label = FULLTEXT_SOURCE_LABELS[hit.source] || hit.source;
+    // Snippets are escaped server-side; only <mark> highlights remain.
+    line.innerHTML = `${label}: ${hit.snippet || ""}`;
+    info.appendChild(line);
+  });
+}
+
+async function runFulltextSearch(q) {
+  setState("results");
+  setEmpty(list, "Searching...");
+  try {
+    const data = await fetchJson(
+      `/research/fulltext?q=${encodeURIComponent(q)}`,
+    );
+    const results = data.results || [];
+    list.innerHTML = "";
+    if (results.length === 0) {
+      setEmpty(list, "No matching notes, JDs, resumes or emails.");
+      return;
+    }
+    results.forEach((item) => renderFulltextRow(item, list));
+  } catch (err) {
+    setEmpty(list, "Search failed.");
+  }
+}
+
 async function runSearch() {
   if (!list || !input) return;
   const q = input.value.trim();
+  if (/[^\d\s()+.-]/.test(q)) {
+    await runFulltextSearch(q);
+    return;
+  }
   const normalized = normalizeQuery(q);
   if (!normalized) {
     setState("idle");
@@ -673,53 +764,109 @@ noteQuill = createQuillInstance(
   "Add a new note...",
 );
 
+// Only the user's own edits are saved; content set by a refresh is not.
+function onUserEdit(handler) {
+  return (delta, oldDelta, source) => {
+    if (source === "user") handler();
+  };
+}
+
 if (jdQuill) {
   jdQuill.on(
     "text-change",
-    debounceSave(async () => {
-      if (!activeDigits) return;
-      const html = getQuillHtml(jdQuill);
-      const payload = { phone_digits: activeDigits, jd_text: html };
-      if (window.ProfileStore?.saveProfile) {
-        await window.ProfileStore.saveProfile(payload, {
-          baseUrl: window.__PROFILE_API_BASE__ || "/research",
-        });
-      } else {
-        await fetchJson(`/research/jd/${encodeURIComponent(activeDigits)}`, {
-          method: "PUT",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify({ jd_text: html }),
-        });
-      }
-    }),
+    onUserEdit(
+      debounceSave(async () => {
+        if (!activeDigits) return;
+        const html = getQuillHtml(jdQuill);
+        const payload = { phone_digits: activeDigits, jd_text: html };
+        if (window.ProfileStore?.saveProfile) {
+          await window.ProfileStore.saveProfile(payload, {
+            baseUrl: window.__PROFILE_API_BASE__ || "/research",
+          });
+        } else {
+          await fetchJson(`/research/jd/${encodeURIComponent(activeDigits)}`, {
+            method: "PUT",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ jd_text: html }),
+          });
+        }
+      }),
+    ),
   );
 }
 
 if (resumeQuill) {
   resumeQuill.on(
     "text-change",
-    debounceSave(async () => {
-      if (!activeDigits) return;
-      const html = getQuillHtml(resumeQuill);
-      const payload = { phone_digits: activeDigits, resume_text: html };
-      if (window.ProfileStore?.saveProfile) {
-        await window.ProfileStore.saveProfile(payload, {
-          baseUrl: window.__PROFILE_API_BASE__ || "/research",
-        });
-      } else {
-        await fetchJson(
-          `/research/resume/${encodeURIComponent(activeDigits)}`,
-          {
-            method: "PUT",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ resume_text: html }),
-          },
-        );
-      }
-    }),
+    onUserEdit(
+      debounceSave(async () => {
+        if (!activeDigits) return;
+        const html = getQuillHtml(resumeQuill);
+        const payload = { phone_digits: activeDigits, resume_text: html };
+        if (window.ProfileStore?.saveProfile) {
+          await window.ProfileStore.saveProfile(payload, {
+            baseUrl: window.__PROFILE_API_BASE__ || "/research",
+          });
+        } else {
+          await fetchJson(
+            `/research/resume/${encodeURIComponent(activeDigits)}`,
+            {
+              method: "PUT",
+              headers: { "Content-Type": "application/json" },
+              body: JSON.stringify({ resume_text: html }),
+            },
+          );
+        }
+      }),
+    ),
   );
 }
 
+// Live updates: the server tails change_log and sends db_changed for edits
+// from either app. The open workspace reloads, but never under the user's
+// cursor: while an editor has focus (or a note has unsaved edits) the
+// reload waits until they leave it.
+let liveRefreshPending = false;
+let liveRefreshTimer = null;
+
+function isEditing() {
+  if (dirtyNotes.size > 0) return true;
+  const el = document.activeElement;
+  if (!el || el === document.body) return false;
+  return (
+    el.matches("input, textarea, select, [contenteditable='true']") ||
+    !!el.closest(".ql-editor")
+  );
+}
+
+function scheduleLiveRefresh(delay = 300) {
+  liveRefreshPending = true;
+  if (liveRefreshTimer) clearTimeout(liveRefreshTimer);
+  liveRefreshTimer = setTimeout(() => {
+    liveRefreshTimer = null;
+    if (liveRefreshPending && !isEditing()) refreshWorkspace();
+  }, delay);
+}
+
+document.addEventListener("focusout", () => {
+  // Longer than debounceSave's 600ms, so the field's own save lands first.
+  if (liveRefreshPending) scheduleLiveRefresh(1000);
+});
+
+if (window.EventSource) {
+  const researchEvents = new EventSource("/research/events");
+  researchEvents.addEventListener("db_changed", (event) => {
+    if (!activeDigits) return;
+    const data = JSON.parse(event.data);
+    if ((data.changes || []).some((change) => change.last10 === activeDigits)) {
+      scheduleLiveRefresh();
+    }
+  });
+  researchEvents.addEventListener("resync", () => {
+    if (activeDigits) scheduleLiveRefresh();
+  });
+}
+
 if (workspacePayload) {
   renderWorkspace(workspacePayload);
   syncVendorFromProfileStore();
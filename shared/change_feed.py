@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from shared.sqlite_utils import connect_sqlite
+from shared.write_queue import get_write_queue
+
+logger = logging.getLogger("change_feed")
+
+POLL_INTERVAL_S = 0.25
+BATCH = 500
+# change_log keeps at least this many rows (and anything newer than
+# KEEP_S), so a process that was busy for a while can still catch up.
+KEEP_ROWS = 10000
+KEEP_S = 3600
+PRUNE_EVERY_S = 600
+
+
+def _prune(conn: sqlite3.Connection, keep_rows: int, keep_s: float) -> None:
+    conn.execute(
+        """
+        DELETE FROM change_log
+        WHERE id <= (SELECT MAX(id) FROM change_log) - ?
+          AND changed_at < strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime', ?)
+        """,
+        (keep_rows, f"-{int(keep_s)} seconds"),
+    )
+
+
+class ChangeFeed:
+    # Tails change_log (filled by triggers, see migration 12) so edits made
+    # by the other app -- or by another connection in this one -- reach
+    # on_changes(rows) within about a poll interval. Each poll is a single
+    # PRAGMA data_version on a private connection, which only moves when
+    # some other connection committed; change_log is read only then.
+    # on_changes runs on the feed thread. Rows whose origin is skip_origin
+    # (this app's own writes, see install_change_origin) are not passed on.
+
+    def __init__(
+        self,
+        db_path: str,
+        on_changes: Callable[[List[Dict[str, Any]]], None],
+        interval_s: float = POLL_INTERVAL_S,
+        name: str = "change-feed",
+        skip_origin: Optional[str] = None,
+    ) -> None:
+        self.db_path = db_path
+        self.on_changes = on_changes
+        self.interval_s = interval_s
+        self.name = name
+        self.skip_origin = skip_origin
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._cursor = 0
+        self._counters = {"polls": 0, "wakeups": 0, "rows": 0, "skipped": 0, "failures": 0}
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
+        conn = connect_sqlite(self.db_path)
+        try:
+            row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()
+            self._cursor = int(row[0])
+            data_version = None
+            next_prune = time.monotonic()
+            while not self._stop.is_set():
+                try:
+                    version = conn.execute("PRAGMA data_version").fetchone()[0]
+                    self._counters["polls"] += 1
+                    if version != data_version:
+                        data_version = version
+                        self._drain(conn)
+                    if time.monotonic() >= next_prune:
+                        next_prune = time.monotonic() + PRUNE_EVERY_S
+                        get_write_queue(self.db_path).submit(_prune, KEEP_ROWS, KEEP_S)
+                except Exception as exc:  # noqa: BLE001
+                    self._counters["failures"] += 1
+                    logger.warning("CHANGE_FEED_FAILED %s", exc)
+                    self._stop.wait(5)
+                self._stop.wait(self.interval_s)
+        finally:
+            conn.close()
+
+    def _drain(self, conn: sqlite3.Connection) -> None:
+        self._counters["wakeups"] += 1
+        while True:
+            rows = conn.execute(
+                """
+                SELECT id, table_name, op, row_id, last10, origin, changed_at
+                FROM change_log WHERE id > ? ORDER BY id LIMIT ?
+                """,
+                (self._cursor, BATCH),
+            ).fetchall()
+            if not rows:
+                return
+            self._cursor = int(rows[-1]["id"])
+            self._counters["rows"] += len(rows)
+            changes = [
+                dict(row)
+                for row in rows
+                if self.skip_origin is None or row["origin"] != self.skip_origin
+            ]
+            self._counters["skipped"] += len(rows) - len(changes)
+            if changes:
+                self.on_changes(changes)
+            if len(rows) < BATCH:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "cursor": self._cursor}
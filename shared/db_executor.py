@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_DB_WORKERS = 4
+
+
+class DBExecutor:
+    # Dedicated worker threads for blocking sqlite3 calls made from async
+    # handlers. Kept separate from the default asyncio.to_thread pool so slow
+    # Gmail calls cannot starve database work (and vice versa), and so a
+    # commit waiting on busy_timeout never blocks the event loop itself.
+
+    def __init__(self, max_workers: int = DEFAULT_DB_WORKERS, name: str = "ndm-db") -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=name
+        )
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,815 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from shared.sqlite_utils import plain_text
+
+logger = logging.getLogger("migrations")
+
+LOCK_WAIT_SEC = 120.0
+
+
+def _run_script(conn: sqlite3.Connection, script: str) -> None:
+    # executescript() would COMMIT the migration transaction, so statements
+    # are split and executed one at a time (triggers stay intact because a
+    # statement is only complete once its END; is seen).
+    pending = ""
+    for line in script.splitlines(keepends=True):
+        pending += line
+        if sqlite3.complete_statement(pending):
+            conn.execute(pending)
+            pending = ""
+    if pending.strip():
+        conn.execute(pending)
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_missing_columns(
+    conn: sqlite3.Connection, table: str, columns: Dict[str, str]
+) -> None:
+    existing = _table_columns(conn, table)
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def _m001_baseline(conn: sqlite3.Connection) -> None:
+    _run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts_start TEXT NOT NULL,
+            ts_end TEXT,
+            phone_digits TEXT NOT NULL,
+            last10 TEXT,
+            display_name TEXT,
+            status TEXT,
+            call_subject TEXT,
+            audio_path TEXT,
+            notes_preview TEXT
+        );
+        CREATE TABLE IF NOT EXISTS call_notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            call_id INTEGER NOT NULL,
+            ts TEXT NOT NULL,
+            note_text TEXT NOT NULL,
+            note_preview TEXT,
+            FOREIGN KEY(call_id) REFERENCES calls(id)
+        );
+        CREATE TABLE IF NOT EXISTS contacts (
+            phone_digits TEXT PRIMARY KEY,
+            display_name TEXT,
+            company TEXT,
+            tags TEXT
+        );
+        CREATE TABLE IF NOT EXISTS opportunities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_digits TEXT NOT NULL,
+            jd_title TEXT,
+            jd_text TEXT,
+            resume_match_text TEXT,
+            talk_track_text TEXT,
+            status TEXT,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS email_links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            opportunity_id INTEGER,
+            phone_digits TEXT,
+            gmail_message_id TEXT,
+            rfc_message_id TEXT,
+            mailbox_email TEXT,
+            account_index TEXT,
+            subject TEXT,
+            from_addr TEXT,
+            date TEXT,
+            snippet TEXT,
+            gmail_link TEXT,
+            is_pinned_jd INTEGER DEFAULT 0,
+            FOREIGN KEY(opportunity_id) REFERENCES opportunities(id)
+        );
+        CREATE TABLE IF NOT EXISTS research_recordings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            call_id INTEGER,
+            phone_digits TEXT NOT NULL,
+            audio_path TEXT,
+            file_path TEXT,
+            created_at TEXT,
+            duration_sec INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS research_profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_digits TEXT NOT NULL UNIQUE,
+            last4 TEXT NOT NULL,
+            vendor_name TEXT,
+            vendor_company TEXT,
+            vendor_title TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS research_jd (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_digits TEXT NOT NULL UNIQUE,
+            jd_text TEXT NOT NULL DEFAULT '',
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS research_resume_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_digits TEXT NOT NULL UNIQUE,
+            resume_text TEXT NOT NULL DEFAULT '',
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS research_notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            phone_digits TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            note_text TEXT NOT NULL
+        );
+        """,
+    )
+    # Databases created before schema_version existed may predate these
+    # columns; this is the only place that still probes table_info.
+    _add_missing_columns(conn, "calls", {"last10": "TEXT"})
+    _add_missing_columns(
+        conn,
+        "email_links",
+        {
+            "rfc_message_id": "TEXT",
+            "mailbox_email": "TEXT",
+            "account_index": "TEXT",
+        },
+    )
+    _add_missing_columns(
+        conn,
+        "research_recordings",
+        {
+            "call_id": "INTEGER",
+            "audio_path": "TEXT",
+            "file_path": "TEXT",
+            "duration_sec": "INTEGER DEFAULT 0",
+        },
+    )
+
+
+def _m002_lookup_indexes(conn: sqlite3.Connection) -> None:
+    _run_script(
+        conn,
+        """
+        UPDATE calls SET last10 = substr(phone_digits, -10)
+        WHERE (last10 IS NULL OR last10 = '') AND phone_digits IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS idx_calls_phone_digits ON calls(phone_digits);
+        CREATE INDEX IF NOT EXISTS idx_calls_last10 ON calls(last10);
+        CREATE INDEX IF NOT EXISTS idx_email_links_phone_digits
+            ON email_links(phone_digits);
+        CREATE INDEX IF NOT EXISTS idx_research_profiles_phone_digits
+            ON research_profiles(phone_digits);
+        CREATE INDEX IF NOT EXISTS idx_research_profiles_last4
+            ON research_profiles(last4);
+        CREATE INDEX IF NOT EXISTS idx_research_notes_phone_digits
+            ON research_notes(phone_digits);
+        """,
+    )
+
+
+# Canonical per-number key used by research: last10 when present, otherwise
+# the tail of phone_digits (same grouping the old GROUP BY queries used).
+_CALL_KEY = "COALESCE(NULLIF({row}.last10, ''), substr({row}.phone_digits, -10))"
+
+_NUMBER_STATS_REFRESH = """
+    INSERT INTO number_stats
+        (last10, last4, call_count, first_call_ts, last_call_ts, display_name, latest_call_id)
+    SELECT {key}, substr({key}, -4), COUNT(*), MIN(ts_start), MAX(ts_start),
+           (SELECT display_name FROM calls
+            WHERE (last10 = {key} OR phone_digits = {key}) AND display_name IS NOT NULL
+            ORDER BY ts_start DESC, id DESC LIMIT 1),
+           (SELECT id FROM calls
+            WHERE last10 = {key} OR phone_digits = {key}
+            ORDER BY ts_start DESC, id DESC LIMIT 1)
+    FROM calls
+    WHERE last10 = {key} OR phone_digits = {key}
+    GROUP BY 1
+    ON CONFLICT(last10) DO UPDATE SET
+        call_count = excluded.call_count,
+        first_call_ts = excluded.first_call_ts,
+        last_call_ts = excluded.last_call_ts,
+        display_name = excluded.display_name,
+        latest_call_id = excluded.latest_call_id;
+    DELETE FROM number_stats
+    WHERE last10 = {key}
+      AND NOT EXISTS (SELECT 1 FROM calls WHERE last10 = {key} OR phone_digits = {key});
+"""
+
+
+def _m003_number_stats(conn: sqlite3.Connection) -> None:
+    new_key = _CALL_KEY.format(row="new")
+    old_key = _CALL_KEY.format(row="old")
+    _run_script(
+        conn,
+        f"""
+        CREATE TABLE IF NOT EXISTS number_stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            last10 TEXT NOT NULL UNIQUE,
+            last4 TEXT NOT NULL,
+            call_count INTEGER NOT NULL DEFAULT 0,
+            first_call_ts TEXT,
+            last_call_ts TEXT,
+            display_name TEXT,
+            latest_call_id INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_number_stats_last_call
+            ON number_stats(last_call_ts DESC, last10);
+        CREATE INDEX IF NOT EXISTS idx_number_stats_last4
+            ON number_stats(last4, last_call_ts DESC);
+
+        CREATE TRIGGER IF NOT EXISTS calls_number_stats_ai AFTER INSERT ON calls
+        BEGIN
+            INSERT INTO number_stats
+                (last10, last4, call_count, first_call_ts, last_call_ts, display_name, latest_call_id)
+            VALUES ({new_key}, substr({new_key}, -4), 1, new.ts_start, new.ts_start,
+                    new.display_name, new.id)
+            ON CONFLICT(last10) DO UPDATE SET
+                call_count = call_count + 1,
+                first_call_ts = MIN(first_call_ts, excluded.first_call_ts),
+                last_call_ts = MAX(last_call_ts, excluded.last_call_ts),
+                display_name = CASE
+                    WHEN excluded.last_call_ts >= last_call_ts
+                        THEN COALESCE(excluded.display_name, display_name)
+                    ELSE COALESCE(display_name, excluded.display_name)
+                END,
+                latest_call_id = CASE
+                    WHEN excluded.last_call_ts >= last_call_ts THEN excluded.latest_call_id
+                    ELSE latest_call_id
+                END;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS calls_number_stats_ad AFTER DELETE ON calls
+        BEGIN
+            {_NUMBER_STATS_REFRESH.format(key=old_key)}
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS calls_number_stats_au
+        AFTER UPDATE OF ts_start, phone_digits, last10, display_name ON calls
+        BEGIN
+            {_NUMBER_STATS_REFRESH.format(key=old_key)}
+            {_NUMBER_STATS_REFRESH.format(key=new_key)}
+        END;
+        """,
+    )
+    calls_key = _CALL_KEY.format(row="calls")
+    stats_key = "number_stats.last10"
+    _run_script(
+        conn,
+        f"""
+        INSERT OR IGNORE INTO number_stats
+            (last10, last4, call_count, first_call_ts, last_call_ts)
+        SELECT {calls_key}, substr({calls_key}, -4), COUNT(*), MIN(ts_start), MAX(ts_start)
+        FROM calls
+        WHERE phone_digits IS NOT NULL
+        GROUP BY {calls_key};
+        UPDATE number_stats SET
+            display_name = (
+                SELECT display_name FROM calls
+                WHERE (last10 = {stats_key} OR phone_digits = {stats_key})
+                  AND display_name IS NOT NULL
+                ORDER BY ts_start DESC, id DESC LIMIT 1
+            ),
+            latest_call_id = (
+                SELECT id FROM calls
+                WHERE last10 = {stats_key} OR phone_digits = {stats_key}
+                ORDER BY ts_start DESC, id DESC LIMIT 1
+            );
+        """,
+    )
+
+
+def _trigram_index_script(table: str, column: str) -> str:
+    # External-content FTS5 table over a single phone column, kept in sync by
+    # triggers so partial digit search never scans the base table.
+    fts = f"{table}_trigram"
+    return f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {column}, content='{table}', content_rowid='id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+        END;
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table}
+        BEGIN
+            INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+        END;
+        INSERT INTO {fts}({fts}) VALUES ('rebuild');
+    """
+
+
+def _m004_phone_trigram(conn: sqlite3.Connection) -> None:
+    _run_script(conn, _trigram_index_script("number_stats", "last10"))
+    _run_script(conn, _trigram_index_script("research_profiles", "phone_digits"))
+
+
+# fulltext_index rowids are ref_id * 8 + source code, so every source row
+# maps to exactly one index row that triggers can replace or delete by rowid.
+FULLTEXT_SOURCES = {
+    1: "call_note",
+    2: "research_note",
+    3: "jd",
+    4: "resume",
+    5: "email",
+}
+
+_EMAIL_KEY = (
+    "CASE WHEN length({row}.phone_digits) = 11 AND substr({row}.phone_digits, 1, 1) = '1' "
+    "THEN substr({row}.phone_digits, 2) ELSE substr({row}.phone_digits, -10) END"
+)
+
+
+def _fulltext_triggers(
+    table: str,
+    code: int,
+    key: str,
+    title: str,
+    body: str,
+    watched: str,
+    live: Optional[str] = None,
+) -> str:
+    # `live`, when given, is a per-row condition; rows failing it (e.g.
+    # tombstones) are kept out of the index.
+    def values(row: str) -> str:
+        return (
+            f"{row}.id * 8 + {code}, {key.format(row=row)}, "
+            f"'{FULLTEXT_SOURCES[code]}', {row}.id, "
+            f"{title.format(row=row)}, {body.format(row=row)}"
+        )
+
+    def where(row: str) -> str:
+        return f" WHERE {live.format(row=row)}" if live else ""
+
+    if live:
+        insert = (
+            "INSERT INTO fulltext_index "
+            "(rowid, phone_digits, source, ref_id, title, body) SELECT {values}{where};"
+        )
+    else:
+        insert = (
+            "INSERT INTO fulltext_index "
+            "(rowid, phone_digits, source, ref_id, title, body) VALUES ({values});"
+        )
+    return f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_fulltext_ai AFTER INSERT ON {table}
+        BEGIN
+            {insert.format(values=values("new"), where=where("new"))}
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_fulltext_ad AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM fulltext_index WHERE rowid = old.id * 8 + {code};
+        END;
+        CREATE TRIGGER IF NOT EXISTS {table}_fulltext_au AFTER UPDATE OF {watched} ON {table}
+        BEGIN
+            DELETE FROM fulltext_index WHERE rowid = old.id * 8 + {code};
+            {insert.format(values=values("new"), where=where("new"))}
+        END;
+        INSERT INTO fulltext_index (rowid, phone_digits, source, ref_id, title, body)
+        SELECT {values(table)} FROM {table}{where(table)};
+    """
+
+
+# Notes, JDs and resumes are editor HTML and Gmail snippets are
+# entity-escaped, so the write helpers also store plain_text() of each in a
+# *_plain column and the index is fed from that. Rows written by other
+# clients (no plain copy) fall back to the raw column.
+FULLTEXT_PLAIN_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "call_notes": ("note_text", "note_plain"),
+    "research_notes": ("note_text", "note_plain"),
+    "research_jd": ("jd_text", "jd_plain"),
+    "research_resume_lines": ("resume_text", "resume_plain"),
+    "email_links": ("snippet", "snippet_plain"),
+}
+
+
+def _m005_fulltext(conn: sqlite3.Connection) -> None:
+    call_key = (
+        "(SELECT " + _CALL_KEY.format(row="calls") + " FROM calls WHERE calls.id = {row}.call_id)"
+    )
+    for table, (source, plain) in FULLTEXT_PLAIN_COLUMNS.items():
+        _add_missing_columns(conn, table, {plain: "TEXT"})
+        rows = conn.execute(f"SELECT id, {source} FROM {table} WHERE {source} IS NOT NULL")
+        conn.executemany(
+            f"UPDATE {table} SET {plain} = ? WHERE id = ?",
+            [(plain_text(row[1]), row[0]) for row in rows.fetchall()],
+        )
+    _run_script(
+        conn,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS fulltext_index USING fts5(
+            phone_digits UNINDEXED,
+            source UNINDEXED,
+            ref_id UNINDEXED,
+            title,
+            body,
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        """,
+    )
+    _run_script(
+        conn,
+        _fulltext_triggers(
+            "call_notes", 1, call_key, "''", "COALESCE({row}.note_plain, {row}.note_text)",
+            "call_id, note_text, note_plain",
+        ),
+    )
+    _run_script(
+        conn,
+        _fulltext_triggers(
+            "research_notes", 2, "{row}.phone_digits", "''",
+            "COALESCE({row}.note_plain, {row}.note_text)", "phone_digits, note_text, note_plain",
+        ),
+    )
+    _run_script(
+        conn,
+        _fulltext_triggers(
+            "research_jd", 3, "{row}.phone_digits", "''",
+            "COALESCE({row}.jd_plain, {row}.jd_text)", "phone_digits, jd_text, jd_plain",
+        ),
+    )
+    _run_script(
+        conn,
+        _fulltext_triggers(
+            "research_resume_lines", 4, "{row}.phone_digits", "''",
+            "COALESCE({row}.resume_plain, {row}.resume_text)",
+            "phone_digits, resume_text, resume_plain",
+        ),
+    )
+    _run_script(
+        conn,
+        _fulltext_triggers(
+            "email_links", 5, _EMAIL_KEY, "COALESCE({row}.subject, '')",
+            "COALESCE({row}.snippet_plain, {row}.snippet, '')",
+            "phone_digits, subject, snippet, snippet_plain",
+        ),
+    )
+
+
+def _m006_keyset_indexes(conn: sqlite3.Connection) -> None:
+    # Same-direction composite keys so (ts, tiebreak) < (?, ?) cursors and
+    # the matching ORDER BY ... DESC are both served by a reverse index scan.
+    _run_script(
+        conn,
+        """
+        DROP INDEX IF EXISTS idx_number_stats_last_call;
+        CREATE INDEX IF NOT EXISTS idx_number_stats_recent
+            ON number_stats(last_call_ts, last10);
+        DROP INDEX IF EXISTS idx_calls_last10;
+        CREATE INDEX IF NOT EXISTS idx_calls_last10_ts ON calls(last10, ts_start);
+        """,
+    )
+
+
+def _m007_hot_path_indexes(conn: sqlite3.Connection) -> None:
+    # opportunities is looked up (and now upserted) by phone_digits; collapse
+    # any historical duplicates onto the newest row before making it unique.
+    _run_script(
+        conn,
+        """
+        UPDATE email_links
+        SET opportunity_id = (
+            SELECT MAX(keep.id) FROM opportunities AS keep
+            WHERE keep.phone_digits = (
+                SELECT phone_digits FROM opportunities WHERE id = email_links.opportunity_id
+            )
+        )
+        WHERE opportunity_id IS NOT NULL;
+        DELETE FROM opportunities
+        WHERE id NOT IN (SELECT MAX(id) FROM opportunities GROUP BY phone_digits);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_opportunities_phone_digits
+            ON opportunities(phone_digits);
+
+        DROP INDEX IF EXISTS idx_calls_phone_digits;
+        CREATE INDEX IF NOT EXISTS idx_calls_phone_digits_ts ON calls(phone_digits, ts_start);
+        CREATE INDEX IF NOT EXISTS idx_calls_ts_start ON calls(ts_start);
+        CREATE INDEX IF NOT EXISTS idx_call_notes_call_ts ON call_notes(call_id, ts);
+        DROP INDEX IF EXISTS idx_email_links_phone_digits;
+        CREATE INDEX IF NOT EXISTS idx_email_links_phone_id ON email_links(phone_digits, id);
+        CREATE INDEX IF NOT EXISTS idx_email_links_opportunity_id
+            ON email_links(opportunity_id);
+        CREATE INDEX IF NOT EXISTS idx_email_links_message
+            ON email_links(gmail_message_id);
+        DROP INDEX IF EXISTS idx_research_notes_phone_digits;
+        CREATE INDEX IF NOT EXISTS idx_research_notes_phone_ts
+            ON research_notes(phone_digits, ts);
+        CREATE INDEX IF NOT EXISTS idx_research_recordings_phone_created
+            ON research_recordings(phone_digits, created_at);
+        CREATE INDEX IF NOT EXISTS idx_research_recordings_call_id
+            ON research_recordings(call_id);
+        DROP INDEX IF EXISTS idx_research_profiles_phone_digits;
+        """,
+    )
+
+
+def _m008_email_links_merge(conn: sqlite3.Connection) -> None:
+    # save_email_links now upserts on (phone_digits, gmail_message_id) and
+    # tombstones messages that dropped out of the search instead of deleting
+    # and re-inserting every row. Collapse duplicates onto the newest row,
+    # keeping any pin, before adding the key.
+    _add_missing_columns(conn, "email_links", {"deleted_at": "TEXT"})
+    _run_script(
+        conn,
+        """
+        UPDATE email_links
+        SET is_pinned_jd = 1
+        WHERE is_pinned_jd = 0 AND EXISTS (
+            SELECT 1 FROM email_links AS dup
+            WHERE dup.phone_digits = email_links.phone_digits
+              AND dup.gmail_message_id = email_links.gmail_message_id
+              AND dup.is_pinned_jd = 1
+        );
+        DELETE FROM email_links
+        WHERE gmail_message_id IS NOT NULL
+          AND id NOT IN (
+            SELECT MAX(id) FROM email_links
+            WHERE gmail_message_id IS NOT NULL
+            GROUP BY phone_digits, gmail_message_id
+          );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_email_links_phone_message
+            ON email_links(phone_digits, gmail_message_id);
+        CREATE TABLE IF NOT EXISTS email_sync_state (
+            phone_digits TEXT PRIMARY KEY,
+            last_synced_at TEXT NOT NULL
+        );
+        DROP TRIGGER IF EXISTS email_links_fulltext_ai;
+        DROP TRIGGER IF EXISTS email_links_fulltext_au;
+        DROP TRIGGER IF EXISTS email_links_fulltext_ad;
+        DELETE FROM fulltext_index WHERE rowid % 8 = 5;
+        """,
+    )
+    _run_script(
+        conn,
+        _fulltext_triggers(
+            "email_links", 5, _EMAIL_KEY, "COALESCE({row}.subject, '')",
+            "COALESCE({row}.snippet_plain, {row}.snippet, '')",
+            "phone_digits, subject, snippet, snippet_plain, deleted_at",
+            live="{row}.deleted_at IS NULL",
+        ),
+    )
+
+
+def _m009_gmail_mirror(conn: sqlite3.Connection) -> None:
+    # Local copy of inbox message metadata, kept current by
+    # ndm_oncall/gmail_sync.py, plus the phone numbers found in each
+    # message's subject/snippet so incoming calls can be matched without a
+    # live Gmail search.
+    _run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS gmail_messages (
+            mailbox_email TEXT NOT NULL,
+            gmail_message_id TEXT NOT NULL,
+            thread_id TEXT,
+            internal_date INTEGER,
+            rfc_message_id TEXT,
+            subject TEXT,
+            from_addr TEXT,
+            date TEXT,
+            snippet TEXT,
+            synced_at TEXT,
+            PRIMARY KEY (mailbox_email, gmail_message_id)
+        );
+        CREATE TABLE IF NOT EXISTS gmail_message_phones (
+            last10 TEXT NOT NULL,
+            internal_date INTEGER,
+            mailbox_email TEXT NOT NULL,
+            gmail_message_id TEXT NOT NULL,
+            PRIMARY KEY (last10, internal_date, mailbox_email, gmail_message_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_gmail_messages_message
+            ON gmail_messages(gmail_message_id);
+        CREATE INDEX IF NOT EXISTS idx_gmail_message_phones_message
+            ON gmail_message_phones(mailbox_email, gmail_message_id);
+        CREATE TABLE IF NOT EXISTS gmail_sync_state (
+            mailbox_email TEXT PRIMARY KEY,
+            history_id TEXT,
+            page_token TEXT,
+            full_sync_started_at TEXT,
+            full_sync_completed_at TEXT,
+            last_sync_at TEXT
+        );
+        """,
+    )
+
+
+def _m010_gmail_backfill(conn: sqlite3.Connection) -> None:
+    # Single-row cursor for ndm_oncall/gmail_backfill.py, which walks every
+    # known number (by last10) and fills email_links ahead of calls.
+    _run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS gmail_backfill_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            cursor TEXT,
+            pass_started_at TEXT,
+            pass_completed_at TEXT,
+            numbers_searched INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        );
+        """,
+    )
+
+
+def _m011_email_bodies(conn: sqlite3.Connection) -> None:
+    # Plain-text Gmail bodies fetched on demand: zlib-compressed blobs keyed
+    # by the SHA-256 of the text (a message delivered to several mailboxes
+    # is stored once), plus which message points at which blob. Blobs are
+    # evicted least-recently-used first, walking idx_email_body_blobs_lru
+    # (sha256 breaks ties, stored_size feeds the running total).
+    _run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS email_body_blobs (
+            sha256 TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored_size INTEGER NOT NULL,
+            created_at TEXT,
+            last_access_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_email_body_blobs_lru
+            ON email_body_blobs(last_access_at, sha256, stored_size);
+        CREATE TABLE IF NOT EXISTS email_bodies (
+            mailbox_email TEXT NOT NULL,
+            gmail_message_id TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            fetched_at TEXT,
+            PRIMARY KEY (mailbox_email, gmail_message_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_email_bodies_message
+            ON email_bodies(gmail_message_id);
+        CREATE INDEX IF NOT EXISTS idx_email_bodies_sha256
+            ON email_bodies(sha256);
+        """,
+    )
+
+
+# Tables whose edits other processes need to hear about, with how to get a
+# row's last10 and which columns count as a change on UPDATE.
+CHANGE_LOG_TABLES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "research_profiles": (
+        "{row}.phone_digits",
+        ("vendor_name", "vendor_company", "vendor_title"),
+    ),
+    "research_jd": ("{row}.phone_digits", ("jd_text",)),
+    "research_resume_lines": ("{row}.phone_digits", ("resume_text",)),
+    "research_notes": ("{row}.phone_digits", ("note_text",)),
+    "research_recordings": (
+        "substr({row}.phone_digits, -10)",
+        ("audio_path", "file_path", "duration_sec"),
+    ),
+    "calls": (
+        "COALESCE({row}.last10, substr({row}.phone_digits, -10))",
+        ("ts_end", "display_name", "status", "audio_path", "notes_preview"),
+    ),
+    "call_notes": (
+        "(SELECT COALESCE(last10, substr(phone_digits, -10)) FROM calls WHERE id = {row}.call_id)",
+        ("note_text",),
+    ),
+    "opportunities": (
+        "substr({row}.phone_digits, -10)",
+        ("jd_title", "jd_text", "resume_match_text", "talk_track_text", "status"),
+    ),
+}
+
+
+def _m012_change_log(conn: sqlite3.Connection) -> None:
+    # oncall and research share data.db from separate processes. Triggers
+    # append every relevant insert/update/delete here, and each process
+    # tails the table (shared/change_feed.py) to push the change to its own
+    # SSE clients. UPDATEs that leave the watched columns alone (e.g. an
+    # idempotent upsert that only bumps updated_at) are not logged. origin
+    # is filled in by a TEMP trigger on each app's writer connection (see
+    # install_change_origin), so rows written by any other client stay NULL
+    # and the saved triggers remain plain SQL.
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER,
+            last10 TEXT,
+            origin TEXT,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'))
+        );
+        """
+    ]
+    for table, (last10_expr, columns) in CHANGE_LOG_TABLES.items():
+        changed = " OR ".join(f"NEW.{col} IS NOT OLD.{col}" for col in columns)
+        for op, row, when in (
+            ("INSERT", "NEW", ""),
+            ("UPDATE", "NEW", f"WHEN {changed}"),
+            ("DELETE", "OLD", ""),
+        ):
+            statements.append(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS trg_change_log_{table}_{op.lower()}
+                AFTER {op} ON {table} {when}
+                BEGIN
+                    INSERT INTO change_log (table_name, op, row_id, last10)
+                    VALUES ('{table}', '{op}', {row}.id, {last10_expr.format(row=row)});
+                END;
+                """
+            )
+    _run_script(conn, "".join(statements))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "baseline", _m001_baseline),
+    (2, "lookup_indexes", _m002_lookup_indexes),
+    (3, "number_stats", _m003_number_stats),
+    (4, "phone_trigram", _m004_phone_trigram),
+    (5, "fulltext", _m005_fulltext),
+    (6, "keyset_indexes", _m006_keyset_indexes),
+    (7, "hot_path_indexes", _m007_hot_path_indexes),
+    (8, "email_links_merge", _m008_email_links_merge),
+    (9, "gmail_mirror", _m009_gmail_mirror),
+    (10, "gmail_backfill", _m010_gmail_backfill),
+    (11, "email_bodies", _m011_email_bodies),
+    (12, "change_log", _m012_change_log),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def _begin_immediate(conn: sqlite3.Connection) -> None:
+    # BEGIN IMMEDIATE takes SQLite's RESERVED lock, which doubles as the
+    # cross-process migration lock: a second process blocks here until the
+    # first one commits and then sees the new version.
+    deadline = time.monotonic() + LOCK_WAIT_SEC
+    while True:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as exc:
+            if "locked" not in str(exc) or time.monotonic() >= deadline:
+                raise
+            time.sleep(0.1)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    current = get_schema_version(conn)
+    if current >= SCHEMA_VERSION:
+        return current
+
+    if conn.in_transaction:
+        conn.commit()
+    _begin_immediate(conn)
+    try:
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+            """
+        )
+        current = get_schema_version(conn)
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            t0 = time.perf_counter()
+            step(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.now().isoformat()),
+            )
+            logger.info(
+                "MIGRATION applied version=%d name=%s %.0fms",
+                version,
+                name,
+                (time.perf_counter() - t0) * 1000,
+            )
+            current = version
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return current
@@ -4,19 +4,29 @@ import logging
 import re
 import sqlite3
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, ContextManager, Dict, List, Optional, TypeVar
 
 from shared.app_paths import get_db_path
+from shared.migrations import migrate
+from shared.sqlite_utils import get_pool, plain_text
+from shared.write_queue import get_write_queue
 
 logger = logging.getLogger("profile_store")
 
+T = TypeVar("T")
+
 DB_PATH = str(get_db_path())
 
+_SCHEMA_READY = False
+
+
+def _connect() -> ContextManager[sqlite3.Connection]:
+    return get_pool(DB_PATH).connection()
 
-def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+
+def _write(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Same single-writer queue as the oncall and research db modules.
+    return get_write_queue(DB_PATH).execute(fn, *args, **kwargs)
 
 
 def _now_iso() -> str:
@@ -54,69 +64,35 @@ def _derive_jd_title(jd_text: str) -> str:
 
 
 def _ensure_schema(conn: sqlite3.Connection) -> None:
-    conn.executescript(
-        """
-        CREATE TABLE IF NOT EXISTS research_profiles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone_digits TEXT NOT NULL UNIQUE,
-            last4 TEXT NOT NULL,
-            vendor_name TEXT,
-            vendor_company TEXT,
-            vendor_title TEXT,
-            created_at TEXT,
-            updated_at TEXT
-        );
-        CREATE TABLE IF NOT EXISTS research_jd (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone_digits TEXT NOT NULL UNIQUE,
-            jd_text TEXT NOT NULL DEFAULT '',
-            updated_at TEXT
-        );
-        CREATE TABLE IF NOT EXISTS research_resume_lines (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone_digits TEXT NOT NULL UNIQUE,
-            resume_text TEXT NOT NULL DEFAULT '',
-            updated_at TEXT
-        );
-        CREATE TABLE IF NOT EXISTS research_notes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            phone_digits TEXT NOT NULL,
-            ts TEXT NOT NULL,
-            note_text TEXT NOT NULL
-        );
-        CREATE INDEX IF NOT EXISTS idx_research_profiles_phone_digits
-            ON research_profiles(phone_digits);
-        CREATE INDEX IF NOT EXISTS idx_research_notes_phone_digits
-            ON research_notes(phone_digits);
-        """
-    )
-    conn.commit()
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    migrate(conn)
+    _SCHEMA_READY = True
 
 
-def load_profile(phone_digits: str) -> Optional[Dict[str, Any]]:
+def read_profile(conn: sqlite3.Connection, phone_digits: str) -> Optional[Dict[str, Any]]:
+    # For callers that already hold a connection (and migrated it), e.g. the
+    # oncall workspace bundle, which reads everything in one transaction.
     last10 = normalize_last10(phone_digits)
     if not last10:
-        logger.warning("load_profile: invalid phone_digits=%s", phone_digits)
         return None
-    logger.info("load_profile: phone_digits=%s last10=%s", phone_digits, last10)
-    with _connect() as conn:
-        _ensure_schema(conn)
-        profile = conn.execute(
-            "SELECT * FROM research_profiles WHERE phone_digits = ?",
-            (last10,),
-        ).fetchone()
-        jd_row = conn.execute(
-            "SELECT jd_text FROM research_jd WHERE phone_digits = ?",
-            (last10,),
-        ).fetchone()
-        resume_row = conn.execute(
-            "SELECT resume_text FROM research_resume_lines WHERE phone_digits = ?",
-            (last10,),
-        ).fetchone()
-        notes_rows = conn.execute(
-            "SELECT id, ts, note_text FROM research_notes WHERE phone_digits = ? ORDER BY ts DESC",
-            (last10,),
-        ).fetchall()
+    profile = conn.execute(
+        "SELECT * FROM research_profiles WHERE phone_digits = ?",
+        (last10,),
+    ).fetchone()
+    jd_row = conn.execute(
+        "SELECT jd_text FROM research_jd WHERE phone_digits = ?",
+        (last10,),
+    ).fetchone()
+    resume_row = conn.execute(
+        "SELECT resume_text FROM research_resume_lines WHERE phone_digits = ?",
+        (last10,),
+    ).fetchone()
+    notes_rows = conn.execute(
+        "SELECT id, ts, note_text FROM research_notes WHERE phone_digits = ? ORDER BY ts DESC",
+        (last10,),
+    ).fetchall()
 
     vendor_name = profile["vendor_name"] if profile else ""
     vendor_company = profile["vendor_company"] if profile else ""
@@ -128,13 +104,6 @@ def load_profile(phone_digits: str) -> Optional[Dict[str, Any]]:
     last4 = last10[-4:] if len(last10) >= 4 else ""
 
     notes = [dict(row) for row in notes_rows]
-    
-    logger.info(
-        "load_profile: result vendor_name=%s jd_text_len=%d resume_text_len=%d",
-        vendor_name,
-        len(jd_text),
-        len(resume_text),
-    )
 
     return {
         "phone_digits": last10,
@@ -148,10 +117,81 @@ def load_profile(phone_digits: str) -> Optional[Dict[str, Any]]:
         "jd_text": jd_text,
         "resume_text": resume_text,
         "notes": notes,
-        "updated_at": _now_iso(),
     }
 
 
+def load_profile(phone_digits: str) -> Optional[Dict[str, Any]]:
+    last10 = normalize_last10(phone_digits)
+    if not last10:
+        logger.warning("load_profile: invalid phone_digits=%s", phone_digits)
+        return None
+    logger.info("load_profile: phone_digits=%s last10=%s", phone_digits, last10)
+    with _connect() as conn:
+        _ensure_schema(conn)
+        profile = read_profile(conn, last10)
+
+    logger.info(
+        "load_profile: result vendor_name=%s jd_text_len=%d resume_text_len=%d",
+        profile["name"],
+        len(profile["jd_text"]),
+        len(profile["resume_text"]),
+    )
+    return {**profile, "updated_at": _now_iso()}
+
+
+def _save_profile(
+    conn: sqlite3.Connection,
+    last10: str,
+    last4: str,
+    vendor_name: str,
+    vendor_company: str,
+    vendor_title: str,
+    jd_text: Optional[str],
+    resume_text: Optional[str],
+) -> None:
+    now = _now_iso()
+    conn.execute(
+        """
+        INSERT INTO research_profiles
+        (phone_digits, last4, vendor_name, vendor_company, vendor_title, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(phone_digits) DO UPDATE SET
+            last4 = excluded.last4,
+            vendor_name = excluded.vendor_name,
+            vendor_company = excluded.vendor_company,
+            vendor_title = excluded.vendor_title,
+            updated_at = excluded.updated_at
+        """,
+        (last10, last4, vendor_name, vendor_company, vendor_title, now, now),
+    )
+    if jd_text is not None:
+        logger.info("save_profile: saving jd_text len=%d", len(jd_text))
+        conn.execute(
+            """
+            INSERT INTO research_jd (phone_digits, jd_text, jd_plain, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(phone_digits) DO UPDATE SET
+                jd_text = excluded.jd_text,
+                jd_plain = excluded.jd_plain,
+                updated_at = excluded.updated_at
+            """,
+            (last10, jd_text, plain_text(jd_text), now),
+        )
+    if resume_text is not None:
+        logger.info("save_profile: saving resume_text len=%d", len(resume_text))
+        conn.execute(
+            """
+            INSERT INTO research_resume_lines (phone_digits, resume_text, resume_plain, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(phone_digits) DO UPDATE SET
+                resume_text = excluded.resume_text,
+                resume_plain = excluded.resume_plain,
+                updated_at = excluded.updated_at
+            """,
+            (last10, resume_text, plain_text(resume_text), now),
+        )
+
+
 def save_profile(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     last10 = normalize_last10(payload.get("phone_digits", ""))
     if not last10:
@@ -172,64 +212,33 @@ def save_profile(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         "provided" if resume_text is not None else "None",
     )
 
-    with _connect() as conn:
-        _ensure_schema(conn)
-        now = _now_iso()
-        conn.execute(
-            """
-            INSERT INTO research_profiles
-            (phone_digits, last4, vendor_name, vendor_company, vendor_title, created_at, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(phone_digits) DO UPDATE SET
-                last4 = excluded.last4,
-                vendor_name = excluded.vendor_name,
-                vendor_company = excluded.vendor_company,
-                vendor_title = excluded.vendor_title,
-                updated_at = excluded.updated_at
-            """,
-            (last10, last4, vendor_name, vendor_company, vendor_title, now, now),
-        )
-        if jd_text is not None:
-            logger.info("save_profile: saving jd_text len=%d", len(jd_text))
-            conn.execute(
-                """
-                INSERT INTO research_jd (phone_digits, jd_text, updated_at)
-                VALUES (?, ?, ?)
-                ON CONFLICT(phone_digits) DO UPDATE SET
-                    jd_text = excluded.jd_text,
-                    updated_at = excluded.updated_at
-                """,
-                (last10, jd_text, now),
-            )
-        if resume_text is not None:
-            logger.info("save_profile: saving resume_text len=%d", len(resume_text))
-            conn.execute(
-                """
-                INSERT INTO research_resume_lines (phone_digits, resume_text, updated_at)
-                VALUES (?, ?, ?)
-                ON CONFLICT(phone_digits) DO UPDATE SET
-                    resume_text = excluded.resume_text,
-                    updated_at = excluded.updated_at
-                """,
-                (last10, resume_text, now),
-            )
-        conn.commit()
-        logger.info("save_profile: committed for last10=%s", last10)
+    _write(
+        _save_profile,
+        last10,
+        last4,
+        vendor_name,
+        vendor_company,
+        vendor_title,
+        jd_text,
+        resume_text,
+    )
+    logger.info("save_profile: committed for last10=%s", last10)
 
     return load_profile(last10)
 
 
+def _add_note(conn: sqlite3.Connection, last10: str, note_text: str) -> None:
+    conn.execute(
+        "INSERT INTO research_notes (phone_digits, ts, note_text, note_plain) VALUES (?, ?, ?, ?)",
+        (last10, _now_iso(), note_text, plain_text(note_text)),
+    )
+
+
 def add_note(phone_digits: str, note_text: str) -> List[Dict[str, Any]]:
     last10 = normalize_last10(phone_digits)
     if not last10 or not note_text:
         return []
-    with _connect() as conn:
-        _ensure_schema(conn)
-        conn.execute(
-            "INSERT INTO research_notes (phone_digits, ts, note_text) VALUES (?, ?, ?)",
-            (last10, _now_iso(), note_text),
-        )
-        conn.commit()
+    _write(_add_note, last10, note_text)
     return list_notes(last10)
 
 
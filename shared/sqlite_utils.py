@@ -1,15 +1,76 @@
 from __future__ import annotations
 
+import html
+import os
+import queue
+import re
 import sqlite3
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set
 
+DEFAULT_BUSY_TIMEOUT_MS = 8000
+DEFAULT_CACHE_SIZE_KIB = 16384
+DEFAULT_MMAP_SIZE = 128 * 1024 * 1024
+DEFAULT_POOL_SIZE = 8
 
-def connect_sqlite(db_path: str, busy_timeout_ms: int = 8000) -> sqlite3.Connection:
+_BLOCK_TAG_RE = re.compile(
+    r"</?(?:p|div|br|li|ul|ol|h[1-6]|blockquote|pre|table|tr|td|th)\b[^>]*>", re.IGNORECASE
+)
+_TAG_RE = re.compile(r"<[^>]*>")
+# Which app this process is ("oncall", "research"); recorded in
+# change_log.origin by install_change_origin.
+_CHANGE_ORIGIN: Optional[str] = None
+
+
+def plain_text(value: Optional[str]) -> Optional[str]:
+    # Editor HTML (notes, JD, resume) reduced to the words the user typed.
+    # The write helpers store it in the *_plain columns the full-text index
+    # reads (see migrations.FULLTEXT_PLAIN_COLUMNS), so markup never matches.
+    if value is None:
+        return None
+    text = _TAG_RE.sub("", _BLOCK_TAG_RE.sub(" ", str(value)))
+    return " ".join(html.unescape(text).split())
+
+
+def set_change_origin(origin: Optional[str]) -> None:
+    # Call once at startup, before the first write.
+    global _CHANGE_ORIGIN
+    _CHANGE_ORIGIN = origin
+
+
+def install_change_origin(conn: sqlite3.Connection) -> None:
+    # Tags the change_log rows this connection's writes produce with the
+    # process origin. A TEMP trigger exists only on this connection, so
+    # other clients (the sqlite3 CLI, a backup script, an older build) write
+    # through the saved schema untouched and leave origin NULL.
+    if _CHANGE_ORIGIN is None:
+        return
+    origin = _CHANGE_ORIGIN.replace("'", "''")
+    conn.execute(
+        f"""
+        CREATE TEMP TRIGGER IF NOT EXISTS change_log_origin
+        AFTER INSERT ON main.change_log WHEN new.origin IS NULL
+        BEGIN
+            UPDATE change_log SET origin = '{origin}' WHERE id = new.id;
+        END
+        """
+    )
+
+
+def connect_sqlite(
+    db_path: str,
+    busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+    cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+    mmap_size: int = DEFAULT_MMAP_SIZE,
+) -> sqlite3.Connection:
     conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA synchronous=NORMAL")
     conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    conn.execute(f"PRAGMA cache_size = -{int(cache_size_kib)}")
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
     conn.execute("PRAGMA foreign_keys=ON")
     return conn
 
@@ -19,3 +80,149 @@ def get_journal_mode(conn: sqlite3.Connection) -> Optional[str]:
     if not row:
         return None
     return str(row[0])
+
+
+class ConnectionPool:
+    # Connections are opened lazily up to max_size and reused, so the PRAGMA
+    # setup runs once per connection. When all of them are checked out (e.g. a
+    # request holding one and calling a helper that needs another) an overflow
+    # connection is opened instead of blocking, and closed on release. Every
+    # open and close goes through _opened/_close so "open" is exact.
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = DEFAULT_POOL_SIZE,
+        busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+    ) -> None:
+        self.db_path = db_path
+        self.max_size = max(1, int(max_size))
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_count = 0
+        self._reserved = 0
+        self._overflow_conns: Set[int] = set()
+        self._in_use = 0
+        self._checkouts = 0
+        self._overflow = 0
+        self._closed = False
+
+    def _close(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._open_count -= 1
+            self._overflow_conns.discard(id(conn))
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._checkouts += 1
+                self._in_use += 1
+                overflow = False
+                if conn is None:
+                    # _reserved covers connections still being opened, so
+                    # concurrent acquires cannot overshoot max_size.
+                    overflow = self._open_count + self._reserved >= self.max_size
+                    if overflow:
+                        self._overflow += 1
+                    else:
+                        self._reserved += 1
+        if closed:
+            if conn is not None:
+                self._close(conn)
+            raise sqlite3.ProgrammingError("connection pool is closed")
+        if conn is not None:
+            return conn
+        try:
+            conn = connect_sqlite(self.db_path, busy_timeout_ms=self.busy_timeout_ms)
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                if not overflow:
+                    self._reserved -= 1
+            raise
+        with self._lock:
+            self._open_count += 1
+            if overflow:
+                self._overflow_conns.add(id(conn))
+            else:
+                self._reserved -= 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+        with self._lock:
+            self._in_use -= 1
+            keep = healthy and not self._closed and id(conn) not in self._overflow_conns
+        if keep:
+            self._idle.put(conn)
+        else:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        # Commits on success and rolls back on error, like the old
+        # `with sqlite3.connect(...) as conn` call sites.
+        conn = self.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "max_size": self.max_size,
+                "open": self._open_count,
+                "overflow_open": len(self._overflow_conns),
+                "idle": self._idle.qsize(),
+                "in_use": self._in_use,
+                "checkouts": self._checkouts,
+                "overflow": self._overflow,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close(conn)
+
+
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    key = os.path.abspath(db_path)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _POOLS[key] = pool
+        return pool
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.items())
+    return {key: pool.stats() for key, pool in pools}
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger("sse_broker")
+
+DEFAULT_BUFFER = 256
+DEFAULT_HEARTBEAT_S = 15.0
+DEFAULT_REPLAY = 1024
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+_HEARTBEAT = b": ping\n\n"
+
+
+def encode_event(event_type: str, data: Any) -> bytes:
+    body = json.dumps(data, separators=(",", ":"), default=str)
+    return f"event: {event_type}\ndata: {body}\n\n".encode("utf-8")
+
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    # None for a fresh connection. An id that does not parse still means
+    # the client has state, so it maps to 0: older than any ring, a resync.
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return 0
+
+
+class Subscriber:
+    __slots__ = ("buffer", "replay", "last_id", "wakeup", "closed", "dropped", "delivered")
+
+    def __init__(self, size: int) -> None:
+        self.buffer: Deque[Tuple[int, bytes]] = deque(maxlen=size)
+        self.replay: List[Tuple[int, bytes]] = []
+        self.last_id = 0
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+        self.delivered = 0
+
+
+class SSEBroker:
+    # Fan-out for server-sent events. Each event is encoded to bytes once and
+    # the same object is appended to every subscriber's bounded buffer. A
+    # subscriber that falls max_buffer events behind (a backgrounded tab, a
+    # hung webview) either loses its oldest events (DROP_OLDEST) or is
+    # disconnected (DISCONNECT) so EventSource reconnects. Idle streams get
+    # a comment line every heartbeat_s so proxies and dead peers are noticed.
+    # publish() may be called from any thread; delivery happens on the loop.
+    #
+    # Every event gets an increasing id and the last replay_size events are
+    # kept, so a client reconnecting with Last-Event-ID is sent what it
+    # missed. If the gap is no longer in the ring (or the id is from before
+    # a restart) it gets a "resync" event and must reload its state. Ids
+    # start at the current time in ms, so they keep increasing across
+    # restarts. With persist_path the ring is saved on close() and loaded
+    # again on start.
+
+    def __init__(
+        self,
+        max_buffer: int = DEFAULT_BUFFER,
+        policy: str = DROP_OLDEST,
+        heartbeat_s: float = DEFAULT_HEARTBEAT_S,
+        replay_size: int = DEFAULT_REPLAY,
+        persist_path: Optional[Path] = None,
+    ) -> None:
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"unknown overflow policy {policy!r}")
+        self.max_buffer = max(1, int(max_buffer))
+        self.policy = policy
+        self.heartbeat_s = heartbeat_s
+        self.persist_path = persist_path
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._lock = threading.Lock()
+        self._ring: Deque[Tuple[int, bytes]] = deque(maxlen=max(0, int(replay_size)))
+        self._pending: Deque[Tuple[int, bytes]] = deque()
+        self._last_id = int(time.time() * 1000)
+        if persist_path is not None:
+            self._load()
+        self._counters = {
+            "published": 0,
+            "encoded_bytes": 0,
+            "delivered": 0,
+            "dropped": 0,
+            "disconnected": 0,
+            "heartbeats": 0,
+            "replayed": 0,
+            "resyncs": 0,
+            "subscribed": 0,
+            "peak_subscribers": 0,
+        }
+
+    def publish(self, event_type: str, data: Any) -> int:
+        return self.publish_encoded(encode_event(event_type, data))
+
+    def bind_loop(self) -> None:
+        # Must run on the event loop (e.g. at startup); otherwise the first
+        # subscribe() binds it.
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+
+    def publish_encoded(self, payload: bytes) -> int:
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            frame = b"id: %d\n" % event_id + payload
+            self._ring.append((event_id, frame))
+            self._counters["published"] += 1
+            self._counters["encoded_bytes"] += len(frame)
+            loop = self._loop
+            if loop is None:
+                return event_id  # nobody has subscribed yet; the ring has it
+            self._pending.append((event_id, frame))
+        if threading.get_ident() == self._loop_thread:
+            self._fan_out()
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._fan_out)
+        return event_id
+
+    def _fan_out(self) -> None:
+        # Delivers everything pending in id order, whichever thread
+        # published it, so subscribers never see ids go backwards.
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        for event_id, frame in pending:
+            for sub in list(self._subscribers):
+                if len(sub.buffer) == self.max_buffer:
+                    if self.policy == DISCONNECT:
+                        self._disconnect(sub)
+                        continue
+                    sub.dropped += 1
+                    self._counters["dropped"] += 1
+                sub.buffer.append((event_id, frame))
+                sub.wakeup.set()
+
+    def _disconnect(self, sub: Subscriber) -> None:
+        sub.closed = True
+        sub.buffer.clear()
+        sub.wakeup.set()
+        self._subscribers.discard(sub)
+        self._counters["disconnected"] += 1
+        logger.info("SSE_SLOW_SUBSCRIBER_DISCONNECTED buffer=%d", self.max_buffer)
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscriber:
+        if self._loop_thread is None:
+            self.bind_loop()
+        sub = Subscriber(self.max_buffer)
+        self._fan_out()  # existing subscribers get what is pending first
+        with self._lock:
+            sub.last_id = self._last_id
+            if last_event_id is not None and last_event_id != self._last_id:
+                oldest = self._ring[0][0] if self._ring else self._last_id + 1
+                if oldest - 1 <= last_event_id < self._last_id:
+                    sub.replay = [item for item in self._ring if item[0] > last_event_id]
+                    self._counters["replayed"] += len(sub.replay)
+                else:
+                    frame = b"id: %d\nevent: resync\ndata: {}\n\n" % self._last_id
+                    sub.replay = [(self._last_id, frame)]
+                    self._counters["resyncs"] += 1
+        self._subscribers.add(sub)
+        self._counters["subscribed"] += 1
+        self._counters["peak_subscribers"] = max(
+            self._counters["peak_subscribers"], len(self._subscribers)
+        )
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        sub.closed = True
+        self._subscribers.discard(sub)
+
+    async def stream(self, sub: Optional[Subscriber] = None) -> AsyncIterator[bytes]:
+        # Body for a StreamingResponse; unsubscribes when the client goes.
+        sub = sub or self.subscribe()
+        try:
+            for _, frame in sub.replay:
+                yield frame
+            sub.replay = []
+            while not sub.closed:
+                if not sub.buffer:
+                    sub.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(sub.wakeup.wait(), self.heartbeat_s)
+                    except asyncio.TimeoutError:
+                        self._counters["heartbeats"] += 1
+                        yield _HEARTBEAT
+                        continue
+                while sub.buffer:
+                    event_id, frame = sub.buffer.popleft()
+                    if event_id <= sub.last_id:
+                        continue  # already covered by subscribe()
+                    sub.last_id = event_id
+                    sub.delivered += 1
+                    self._counters["delivered"] += 1
+                    yield frame
+        finally:
+            self.unsubscribe(sub)
+
+    def close(self) -> None:
+        for sub in list(self._subscribers):
+            sub.closed = True
+            sub.wakeup.set()
+        self._subscribers.clear()
+        if self.persist_path is not None:
+            self._save()
+
+    def _load(self) -> None:
+        try:
+            raw = self.persist_path.read_bytes()
+        except FileNotFoundError:
+            return
+        except OSError as exc:
+            logger.warning("SSE_REPLAY_LOAD_FAILED %s", exc)
+            return
+        for frame in raw.split(b"\n\n"):
+            if not frame.startswith(b"id: "):
+                continue
+            try:
+                event_id = int(frame[4:frame.index(b"\n")])
+            except ValueError:
+                continue
+            self._ring.append((event_id, frame + b"\n\n"))
+            self._last_id = max(self._last_id, event_id)
+        logger.info("SSE_REPLAY_LOADED events=%d last_id=%d", len(self._ring), self._last_id)
+
+    def _save(self) -> None:
+        with self._lock:
+            raw = b"".join(frame for _, frame in self._ring)
+        tmp = self.persist_path.with_suffix(".tmp")
+        try:
+            tmp.write_bytes(raw)
+            os.replace(tmp, self.persist_path)
+        except OSError as exc:
+            logger.warning("SSE_REPLAY_SAVE_FAILED %s", exc)
+
+    def stats(self) -> Dict[str, Any]:
+        subs = list(self._subscribers)
+        return {
+            **self._counters,
+            "subscribers": len(subs),
+            "buffered": sum(len(sub.buffer) for sub in subs),
+            "max_lag": max((len(sub.buffer) for sub in subs), default=0),
+            "max_buffer": self.max_buffer,
+            "last_id": self._last_id,
+            "replay_buffered": len(self._ring),
+            "policy": self.policy,
+        }
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from shared.migrations import migrate
+from shared.sqlite_utils import connect_sqlite, install_change_origin
+
+logger = logging.getLogger("write_queue")
+
+T = TypeVar("T")
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_DELAY_S = 0.002
+
+_Op = Tuple[Callable[..., Any], tuple, dict, Future, float]
+
+
+class WriteQueue:
+    # One writer thread per database file and process. Writes are functions
+    # taking the writer's connection as their first argument; they must not
+    # commit themselves. Pending writes are drained into a single BEGIN
+    # IMMEDIATE .. COMMIT (group commit) once the oldest one has waited
+    # max_delay_s, each wrapped in a SAVEPOINT so a failing write is rolled
+    # back without taking the rest of the batch with it.
+
+    def __init__(
+        self,
+        db_path: str,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay_s: float = DEFAULT_MAX_DELAY_S,
+    ) -> None:
+        self.db_path = db_path
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay_s = max(0.0, float(max_delay_s))
+        self._queue: "queue.Queue[Optional[_Op]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._closed = False
+        self._writes = 0
+        self._failed = 0
+        self._batches = 0
+        self._largest_batch = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("write queue is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="ndm-db-writer", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        self._ensure_started()
+        future: "Future[T]" = Future()
+        self._queue.put((fn, args, kwargs, future, time.monotonic()))
+        return future
+
+    def execute(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # Called from inside another write (the writer thread itself) the
+        # function simply joins the current transaction.
+        if threading.current_thread() is self._thread:
+            return fn(self._conn, *args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self) -> None:
+        try:
+            conn = connect_sqlite(self.db_path)
+            migrate(conn)
+            install_change_origin(conn)
+        except Exception as exc:
+            logger.exception("WRITE_QUEUE_OPEN_FAILED path=%s", self.db_path)
+            with self._lock:
+                self._closed = True
+            self._fail_pending(exc)
+            return
+        conn.isolation_level = None
+        self._conn = conn
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = item[4] + self.max_delay_s
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = (
+                        self._queue.get(timeout=remaining)
+                        if remaining > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._commit_batch(batch)
+            if stop:
+                break
+        conn.close()
+
+    def _fail_pending(self, exc: BaseException) -> None:
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                _fail(item[3], exc)
+
+    def _commit_batch(self, batch: List[_Op]) -> None:
+        conn = self._conn
+        assert conn is not None
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, kwargs, future, _ in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT write_op")
+                try:
+                    result = fn(conn, *args, **kwargs)
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO write_op")
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, None, exc))
+                else:
+                    conn.execute("RELEASE write_op")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+        except Exception as exc:
+            logger.exception("WRITE_BATCH_FAILED size=%d", len(batch))
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, _, _, future, _ in batch:
+                _fail(future, exc)
+            with self._lock:
+                self._batches += 1
+                self._failed += len(batch)
+            return
+
+        failed = 0
+        for future, result, error in outcomes:
+            if error is not None:
+                failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        with self._lock:
+            self._batches += 1
+            self._writes += len(outcomes) - failed
+            self._failed += failed
+            self._largest_batch = max(self._largest_batch, len(batch))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "writes": self._writes,
+                "failed": self._failed,
+                "batches": self._batches,
+                "largest_batch": self._largest_batch,
+                "max_delay_ms": round(self.max_delay_s * 1000, 3),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+def _fail(future: Future, exc: BaseException) -> None:
+    if future.done():
+        return
+    if future.running() or future.set_running_or_notify_cancel():
+        future.set_exception(exc)
+
+
+_QUEUES: Dict[str, WriteQueue] = {}
+_QUEUES_LOCK = threading.Lock()
+
+
+def get_write_queue(db_path: str) -> WriteQueue:
+    key = os.path.abspath(db_path)
+    with _QUEUES_LOCK:
+        writer = _QUEUES.get(key)
+        if writer is None:
+            writer = WriteQueue(db_path)
+            _QUEUES[key] = writer
+        return writer
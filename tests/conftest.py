@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import os
+import tempfile
+
+# Every module resolves its DB path at import, so point APPDATA at a scratch
+# directory before any of them is imported.
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="ndm-tests-")
+
+import pytest  # noqa: E402
+
+from shared.app_paths import get_db_path  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def db_path() -> str:
+    from ndm_oncall import db as oncall_db
+    from ndm_research import db as research_db
+
+    oncall_db.init_db()
+    research_db.init_db()
+    return str(get_db_path())
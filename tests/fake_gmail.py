@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+# Minimal stand-in for the Gmail REST API, for local development and timing.
+# Serves just what gmail_client / gmail_sync use (profile, messages.list,
+# messages.get with format=metadata or full, history.list and
+# multipart/mixed batch requests) from an in-memory mailbox, with optional per-request latency.
+# add_message / archive_message / delete_message mutate the mailbox and
+# record history the way Gmail does; throttle_rate / throttle_next make API
+# calls fail with 429 rateLimitExceeded to exercise the quota scheduler;
+# fail_batches answers whole batch requests with 503 and drop_batch_parts
+# leaves sub-responses out of the next batch replies, to exercise the
+# client's per-message fallback.
+#
+#   python -m tests.fake_gmail --port 8765 --latency-ms 80
+#   NDM_GMAIL_API_ENDPOINT=http://127.0.0.1:8765/ python -m ndm_oncall.ndm_backend
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_MAILBOX = "dev@example.com"
+
+_MESSAGE_PATH = re.compile(r"^/gmail/v1/users/[^/]+/messages/([^/]+)$")
+_QUOTED = re.compile(r'"([^"]+)"')
+_REASONS = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 503: "Service Unavailable"}
+
+
+def sample_messages(count: int = 200) -> List[Dict[str, Any]]:
+    messages = []
+    base_ts = 1_700_000_000_000
+    for i in range(count):
+        digits = f"555{i % 50:03d}{i:04d}"
+        messages.append(
+            {
+                "id": f"m{i:06x}",
+                "threadId": f"t{i:06x}",
+                "internalDate": str(base_ts + i * 60_000),
+                "snippet": f"Call me at {digits} about the role",
+                "labelIds": ["INBOX"],
+                "headers": {
+                    "Subject": f"Opportunity {i}",
+                    "From": f"Recruiter {i % 7} <recruiter{i % 7}@example.com>",
+                    "Date": time.strftime(
+                        "%a, %d %b %Y %H:%M:%S +0000",
+                        time.gmtime((base_ts + i * 60_000) / 1000),
+                    ),
+                    "Message-Id": f"<m{i:06x}@example.com>",
+                },
+            }
+        )
+    return messages
+
+
+class FakeGmailServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        messages: Optional[List[Dict[str, Any]]] = None,
+        latency_ms: float = 0.0,
+        mailbox: str = DEFAULT_MAILBOX,
+        throttle_rate: float = 0.0,
+    ) -> None:
+        super().__init__(address, FakeGmailHandler)
+        self.messages = messages if messages is not None else sample_messages()
+        self.latency_s = max(0.0, latency_ms) / 1000.0
+        self.mailbox = mailbox
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "http_requests": 0,
+            "batch_requests": 0,
+            "api_calls": 0,
+            "throttled": 0,
+        }
+        self.throttle_rate = max(0.0, min(1.0, throttle_rate))
+        self.throttle_next = 0
+        self.fail_batches = 0
+        self.drop_batch_parts = 0
+        self._random = random.Random(0)
+        self.history_id = 1000
+        # history.list answers 404 for anything older, like an expired
+        # startHistoryId on the real API.
+        self.history_floor = self.history_id
+        self.history: List[Dict[str, Any]] = []
+
+    def _record(self, kind: str, item: Dict[str, Any]) -> None:
+        self.history_id += 1
+        self.history.append({"id": str(self.history_id), kind: [item]})
+
+    def add_message(self, message: Dict[str, Any]) -> None:
+        with self.lock:
+            message.setdefault("labelIds", ["INBOX"])
+            self.messages.append(message)
+            self._record("messagesAdded", {"message": _ref(message)})
+
+    def archive_message(self, msg_id: str) -> None:
+        with self.lock:
+            for message in self.messages:
+                if message["id"] == msg_id and "INBOX" in message["labelIds"]:
+                    message["labelIds"].remove("INBOX")
+                    self._record("labelsRemoved", {"message": _ref(message), "labelIds": ["INBOX"]})
+
+    def delete_message(self, msg_id: str) -> None:
+        with self.lock:
+            for message in list(self.messages):
+                if message["id"] == msg_id:
+                    self.messages.remove(message)
+                    self._record("messagesDeleted", {"message": _ref(message)})
+
+    def expire_history(self) -> None:
+        with self.lock:
+            self.history_floor = self.history_id + 1
+            self.history = []
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def _throttled(self) -> bool:
+        with self.lock:
+            if self.throttle_next > 0:
+                self.throttle_next -= 1
+            elif not (self.throttle_rate and self._random.random() < self.throttle_rate):
+                return False
+            self.counters["throttled"] += 1
+            return True
+
+    def take(self, name: str) -> bool:
+        with self.lock:
+            if getattr(self, name) <= 0:
+                return False
+            setattr(self, name, getattr(self, name) - 1)
+            return True
+
+    def dispatch(self, method: str, target: str) -> Tuple[int, Dict[str, Any]]:
+        self.count("api_calls")
+        if self._throttled():
+            return 429, _error(429, "User-rate limit exceeded.", "rateLimitExceeded")
+        parts = urlsplit(target)
+        params = parse_qs(parts.query)
+        path = parts.path
+        if method == "GET" and path.endswith("/profile"):
+            return 200, {
+                "emailAddress": self.mailbox,
+                "messagesTotal": len(self.messages),
+                "historyId": str(self.history_id),
+            }
+        if method == "GET" and path.endswith("/messages"):
+            return 200, self._list(params)
+        if method == "GET" and path.endswith("/history"):
+            return self._history(params)
+        match = _MESSAGE_PATH.match(path)
+        if method == "GET" and match:
+            return self._get(match.group(1), params)
+        return 404, _error(404, f"{method} {path} not found")
+
+    def _list(self, params: Dict[str, List[str]]) -> Dict[str, Any]:
+        terms = _QUOTED.findall(params.get("q", [""])[0])
+        labels = params.get("labelIds", [])
+        limit = int(params.get("maxResults", ["100"])[0])
+        offset = int(params.get("pageToken", ["0"])[0])
+        with self.lock:
+            hits = [
+                m
+                for m in sorted(self.messages, key=lambda m: int(m["internalDate"]), reverse=True)
+                if all(label in m["labelIds"] for label in labels)
+                and (
+                    not terms
+                    or any(t in m["snippet"] or t in m["headers"]["Subject"] for t in terms)
+                )
+            ]
+        page = hits[offset : offset + limit]
+        body: Dict[str, Any] = {"resultSizeEstimate": len(hits)}
+        if page:
+            body["messages"] = [_ref(m) for m in page]
+        if offset + limit < len(hits):
+            body["nextPageToken"] = str(offset + limit)
+        return body
+
+    def _history(self, params: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        start = int(params.get("startHistoryId", ["0"])[0])
+        with self.lock:
+            if start < self.history_floor - 1:
+                return 404, _error(404, "Requested entity was not found.")
+            records = [h for h in self.history if int(h["id"]) > start]
+            return 200, {"history": records, "historyId": str(self.history_id)}
+
+    def _get(self, msg_id: str, params: Dict[str, List[str]]) -> Tuple[int, Dict[str, Any]]:
+        msg = next((m for m in self.messages if m["id"] == msg_id), None)
+        if msg is None:
+            return 404, _error(404, "Requested entity was not found.")
+        wanted = params.get("metadataHeaders") or list(msg["headers"])
+        if params.get("format", ["full"])[0] == "full":
+            return 200, {
+                "id": msg["id"],
+                "threadId": msg["threadId"],
+                "internalDate": msg["internalDate"],
+                "snippet": msg["snippet"],
+                "labelIds": list(msg["labelIds"]),
+                "payload": _full_payload(msg),
+            }
+        return 200, {
+            "id": msg["id"],
+            "threadId": msg["threadId"],
+            "internalDate": msg["internalDate"],
+            "snippet": msg["snippet"],
+            "labelIds": list(msg["labelIds"]),
+            "payload": {
+                "headers": [
+                    {"name": name, "value": value}
+                    for name, value in msg["headers"].items()
+                    if name in wanted
+                ]
+            },
+        }
+
+
+def _full_payload(msg: Dict[str, Any]) -> Dict[str, Any]:
+    text = msg.get("body") or f"{msg['snippet']}.\n\nJob description for {msg['headers']['Subject']}."
+    markup = "".join(f"<p>{line}</p>" for line in text.split("\n") if line)
+
+    def part(mime: str, data: str) -> Dict[str, Any]:
+        encoded = base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+        return {"mimeType": mime, "body": {"size": len(data), "data": encoded}}
+
+    return {
+        "mimeType": "multipart/alternative",
+        "headers": [{"name": k, "value": v} for k, v in msg["headers"].items()],
+        "parts": [part("text/plain", text), part("text/html", f"<html><body>{markup}</body></html>")],
+    }
+
+
+def _ref(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": message["id"],
+        "threadId": message["threadId"],
+        "labelIds": list(message.get("labelIds", [])),
+    }
+
+
+def _error(code: int, message: str, reason: str = "") -> Dict[str, Any]:
+    detail = {"message": message, "reason": reason} if reason else {"message": message}
+    return {"error": {"code": code, "message": message, "errors": [detail]}}
+
+
+class FakeGmailHandler(BaseHTTPRequestHandler):
+    server: FakeGmailServer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _delay(self) -> None:
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.server.count("http_requests")
+        self._delay()
+        status, payload = self.server.dispatch("GET", self.path)
+        self._send(status, json.dumps(payload).encode("utf-8"), "application/json; charset=UTF-8")
+
+    def do_POST(self) -> None:
+        self.server.count("http_requests")
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length).decode("utf-8")
+        if urlsplit(self.path).path.rstrip("/") != "/batch":
+            self._send(404, json.dumps(_error(404, "not found")).encode("utf-8"), "application/json")
+            return
+        self.server.count("batch_requests")
+        self._delay()
+        if self.server.take("fail_batches"):
+            body = json.dumps(_error(503, "Backend Error", "backendError")).encode("utf-8")
+            self._send(503, body, "application/json; charset=UTF-8")
+            return
+        content_type = self.headers.get("Content-Type", "")
+        message = Parser().parsestr(f"Content-Type: {content_type}\r\n\r\n{raw}")
+        boundary = f"batch_{uuid.uuid4().hex}"
+        chunks = []
+        for part in message.get_payload():
+            inner = part.get_payload()
+            request_line = inner.split("\n", 1)[0].strip()
+            method, target = request_line.split(" ")[:2]
+            status, payload = self.server.dispatch(method, target)
+            if self.server.take("drop_batch_parts"):
+                continue
+            content_id = (part["Content-ID"] or "").strip("<>")
+            body = json.dumps(payload)
+            chunks.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n"
+                f"{body}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        self._send(200, "".join(chunks).encode("utf-8"), f"multipart/mixed; boundary={boundary}")
+
+
+def start(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    messages: Optional[List[Dict[str, Any]]] = None,
+    throttle_rate: float = 0.0,
+) -> FakeGmailServer:
+    server = FakeGmailServer(
+        (host, port), messages=messages, latency_ms=latency_ms, throttle_rate=throttle_rate
+    )
+    thread = threading.Thread(target=server.serve_forever, name="fake-gmail", daemon=True)
+    thread.start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake Gmail API for local development")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="fraction of calls answered with 429"
+    )
+    args = parser.parse_args()
+    server = FakeGmailServer(
+        (args.host, args.port),
+        messages=sample_messages(args.messages),
+        latency_ms=args.latency_ms,
+        throttle_rate=args.throttle_rate,
+    )
+    print(f"Fake Gmail listening; set NDM_GMAIL_API_ENDPOINT={server.endpoint}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from ndm_oncall import db as oncall_db
+from shared import profile_store
+
+
+def _all_pages(limit):
+    seen, cursor = [], None
+    while True:
+        page = oncall_db.backfill_numbers(cursor, limit)
+        if not page:
+            return seen
+        assert len(page) <= limit
+        seen.extend(page)
+        cursor = page[-1]["last10"]
+
+
+def test_pages_cover_calls_and_profiles_once_in_order(db_path):
+    called = ["5550109003", "5550109001", "5550109005"]
+    for digits in called:
+        oncall_db.create_call(digits)
+    oncall_db.create_call("15550109001")  # latest call for ...001 posted with country code
+    for digits in ("5550109002", "5550109005"):
+        profile_store.save_profile({"phone_digits": digits, "vendor_name": "Vendor"})
+
+    for limit in (1, 2, 50):
+        numbers = [row for row in _all_pages(limit) if row["last10"].startswith("555010900")]
+        assert [row["last10"] for row in numbers] == [
+            "5550109001", "5550109002", "5550109003", "5550109005",
+        ]
+        by_last10 = {row["last10"]: row["phone_digits"] for row in numbers}
+        assert by_last10["5550109001"] == "15550109001"
+        assert by_last10["5550109002"] == "5550109002"
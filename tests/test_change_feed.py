@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import sqlite3
+
+from shared import sqlite_utils
+from shared.change_feed import ChangeFeed
+from shared.sqlite_utils import connect_sqlite, install_change_origin
+
+
+def _feed(db_path, skip_origin=None):
+    batches: list = []
+    feed = ChangeFeed(db_path, batches.append, skip_origin=skip_origin)
+    conn = connect_sqlite(db_path)
+    feed._cursor = conn.execute("SELECT COALESCE(MAX(id), 0) FROM change_log").fetchone()[0]
+    return feed, conn, batches
+
+
+def _writer(db_path, monkeypatch, origin):
+    monkeypatch.setattr(sqlite_utils, "_CHANGE_ORIGIN", origin)
+    conn = connect_sqlite(db_path)
+    install_change_origin(conn)
+    return conn
+
+
+def _insert_call(conn, phone_digits):
+    conn.execute(
+        "INSERT INTO calls (ts_start, phone_digits, last10, status) VALUES (?, ?, ?, 'incoming')",
+        ("2026-10-17T09:00:00", phone_digits, phone_digits[-10:]),
+    )
+    conn.commit()
+
+
+def test_change_log_records_the_writing_app(db_path, monkeypatch):
+    feed, conn, batches = _feed(db_path)
+    oncall = _writer(db_path, monkeypatch, "oncall")
+    research = _writer(db_path, monkeypatch, "research")
+    # Any other client writes through the saved triggers untouched.
+    plain = sqlite3.connect(db_path)
+    try:
+        _insert_call(oncall, "5550109001")
+        _insert_call(research, "5550109001")
+        _insert_call(plain, "5550109001")
+        feed._drain(conn)
+    finally:
+        for c in (conn, oncall, research, plain):
+            c.close()
+    rows = [row for batch in batches for row in batch]
+    assert [row["origin"] for row in rows] == ["oncall", "research", None]
+    assert {(row["table_name"], row["last10"]) for row in rows} == {("calls", "5550109001")}
+
+
+def test_feed_skips_its_own_origin(db_path, monkeypatch):
+    feed, conn, batches = _feed(db_path, skip_origin="oncall")
+    oncall = _writer(db_path, monkeypatch, "oncall")
+    research = _writer(db_path, monkeypatch, "research")
+    try:
+        _insert_call(oncall, "5550109002")
+        feed._drain(conn)
+        assert batches == []
+        _insert_call(research, "5550109002")
+        _insert_call(oncall, "5550109002")
+        feed._drain(conn)
+    finally:
+        for c in (conn, oncall, research):
+            c.close()
+    assert [[row["origin"] for row in batch] for batch in batches] == [["research"]]
+    stats = feed.stats()
+    assert (stats["rows"], stats["skipped"]) == (3, 2)
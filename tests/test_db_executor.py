@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from ndm_oncall import db as oncall_db
+from shared.sqlite_utils import connect_sqlite
+
+LOCK_HELD_S = 0.3
+HEARTBEAT_S = 0.005
+MAX_LAG_S = 0.1
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_S)
+        lags.append(time.perf_counter() - started - HEARTBEAT_S)
+
+
+def _hold_write_lock(db_path: str) -> None:
+    # Another connection (think: the research process) holds the write
+    # lock for LOCK_HELD_S, so writers wait on busy_timeout meanwhile.
+    locker = connect_sqlite(db_path)
+    locker.execute("BEGIN IMMEDIATE")
+
+    def release() -> None:
+        time.sleep(LOCK_HELD_S)
+        locker.commit()
+        locker.close()
+
+    threading.Thread(target=release, daemon=True).start()
+
+
+async def _write_while_locked(db_path: str, write) -> tuple:
+    stop = asyncio.Event()
+    lags: list = []
+    beat = asyncio.create_task(_heartbeat(stop, lags))
+    await asyncio.sleep(HEARTBEAT_S * 4)
+    _hold_write_lock(db_path)
+    started = time.perf_counter()
+    result = await write()
+    waited = time.perf_counter() - started
+    stop.set()
+    await beat
+    return result, waited, max(lags)
+
+
+def test_loop_stays_responsive_while_another_connection_holds_the_lock(db_path):
+    async def write():
+        return await oncall_db.run(oncall_db.create_call, "5550109101")
+
+    call_id, waited, max_lag = asyncio.run(_write_while_locked(db_path, write))
+
+    assert oncall_db.get_call_by_id(call_id)["phone_digits"] == "5550109101"
+    assert waited >= LOCK_HELD_S * 0.8  # the write really did wait for the lock
+    assert max_lag < MAX_LAG_S
+
+
+def test_same_write_on_the_loop_would_stall_it(db_path):
+    # Control for the test above: without the executor the heartbeat stops
+    # for as long as the lock is held, so the bound above is meaningful.
+    async def write():
+        return oncall_db.create_call("5550109102")
+
+    _, waited, max_lag = asyncio.run(_write_while_locked(db_path, write))
+
+    assert waited >= LOCK_HELD_S * 0.8
+    assert max_lag >= LOCK_HELD_S * 0.8
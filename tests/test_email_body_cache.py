@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import itertools
+import random
+import sqlite3
+
+import pytest
+
+from ndm_oncall import db as oncall_db
+from shared.write_queue import get_write_queue
+
+MAILBOX = "me@x"
+
+
+@pytest.fixture
+def cache(db_path, monkeypatch):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("DELETE FROM email_bodies")
+        conn.execute("DELETE FROM email_body_blobs")
+        conn.commit()
+    finally:
+        conn.close()
+    # A clock that always moves, so LRU order never rests on a tie.
+    ticks = itertools.count()
+    monkeypatch.setattr(oncall_db, "_now_iso", lambda: f"2026-10-17T09:00:00.{next(ticks):06d}")
+    yield db_path
+
+
+def _text(seed: int) -> str:
+    # Hex does not compress away, so every body has a similar stored size.
+    return random.Random(seed).randbytes(1500).hex()
+
+
+def _read(message_id, mailbox=MAILBOX):
+    body = oncall_db.get_email_body(message_id, mailbox)
+    # The LRU bump is queued behind the read; wait for it like later writes do.
+    get_write_queue(oncall_db.DB_PATH).execute(lambda conn: None)
+    return body
+
+
+def _blobs(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT sha256, stored_size FROM email_body_blobs"))
+    finally:
+        conn.close()
+
+
+def test_least_recently_read_bodies_are_evicted(cache):
+    unlimited = 10**9
+    for name in "abcd":
+        assert oncall_db.save_email_body(MAILBOX, name, _text(ord(name)), unlimited) == 0
+    # Read "a" again: now "b" and "c" are the least recently used.
+    assert _read("a")["text"] == _text(ord("a"))
+    sizes = _blobs(cache)
+    budget = max(sizes.values()) * 3 + 100
+    assert sum(sizes.values()) > budget
+
+    assert oncall_db.save_email_body(MAILBOX, "e", _text(ord("e")), budget) == 2
+    assert _read("b") is None
+    assert _read("c") is None
+    for name in "ade":
+        assert _read(name)["text"] == _text(ord(name))
+    assert len(_blobs(cache)) == 3
+    assert sum(_blobs(cache).values()) <= budget
+
+
+def test_new_body_is_kept_even_if_it_alone_exceeds_the_cap(cache):
+    oncall_db.save_email_body(MAILBOX, "a", _text(1), 10**9)
+    assert oncall_db.save_email_body(MAILBOX, "big", _text(2), 10) == 1
+    assert _read("a") is None
+    assert _read("big")["text"] == _text(2)
+
+
+def test_identical_bodies_are_stored_once(cache):
+    text = _text(7)
+    oncall_db.save_email_body(MAILBOX, "m1", text, 10**9)
+    # The same message in another mailbox, and a forward with the same body.
+    oncall_db.save_email_body("other@x", "m1", text, 10**9)
+    oncall_db.save_email_body(MAILBOX, "m2", text, 10**9)
+
+    blobs = _blobs(cache)
+    assert len(blobs) == 1
+    copies = [_read("m1"), _read("m1", "other@x"), _read("m2")]
+    assert {body["sha256"] for body in copies} == set(blobs)
+    assert all(body["text"] == text for body in copies)
+
+    # Evicting the shared blob drops every message that pointed at it.
+    oncall_db.save_email_body(MAILBOX, "m3", _text(8), 1)
+    assert [_read("m1"), _read("m1", "other@x"), _read("m2")] == [None, None, None]
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import sqlite3
+
+from ndm_research import db as research_db
+from shared import migrations
+from shared.sqlite_utils import connect_sqlite, plain_text
+
+PHONE = "5550107001"
+
+
+def _search(conn, query):
+    return research_db.search_fulltext(conn, query, 50)
+
+
+def test_plain_text_strips_editor_markup():
+    assert plain_text("<p><strong>Py</strong>thon &amp; SQL</p><p>Remote</p>") == "Python & SQL Remote"
+    assert plain_text(None) is None
+
+
+def test_markup_is_not_searchable(db_path):
+    research_db.add_research_note(
+        PHONE, "<p><strong>Kubernetes</strong> migration</p><p>starts in <em>May</em></p>"
+    )
+    with research_db.get_db() as conn:
+        assert _search(conn, "strong") == []
+        assert _search(conn, "em") == []
+        hits = _search(conn, "kubernetes")
+        assert [group["phone_digits"] for group in hits] == [PHONE]
+        assert "<mark>Kubernetes</mark> migration starts in May" in hits[0]["hits"][0]["snippet"]
+
+
+def test_updates_reindex_plain_text(db_path):
+    research_db.upsert_jd("5550107002", "<p>Golang <u>platform</u> role</p>")
+    research_db.upsert_jd("5550107002", "<ol><li>Rust</li><li>embedded</li></ol>")
+    with research_db.get_db() as conn:
+        assert _search(conn, "golang") == []
+        assert _search(conn, "li") == []
+        assert [group["phone_digits"] for group in _search(conn, "rust embedded")] == ["5550107002"]
+
+
+def test_other_clients_can_write_indexed_tables(db_path):
+    # The saved triggers are plain SQL: a connection without the app's
+    # setup (sqlite3 CLI, a backup script) still writes, and its raw text
+    # is indexed.
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO research_notes (phone_digits, ts, note_text) VALUES (?, '2026-01-01', ?)",
+            ("5550107003", "zeppelin"),
+        )
+        conn.execute(
+            "INSERT INTO research_resume_lines (phone_digits, resume_text) VALUES (?, ?)",
+            ("5550107003", "<p>quasar</p>"),
+        )
+        conn.execute(
+            "INSERT INTO email_links (phone_digits, gmail_message_id, snippet) VALUES (?, ?, ?)",
+            ("5550107003", "m-plain", "nebula"),
+        )
+        conn.execute(
+            "UPDATE research_notes SET note_text = 'dirigible' WHERE phone_digits = ?",
+            ("5550107003",),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    with research_db.get_db() as conn:
+        for word in ("dirigible", "quasar", "nebula"):
+            assert [group["phone_digits"] for group in _search(conn, word)] == ["5550107003"]
+        assert _search(conn, "zeppelin") == []
+
+
+def test_migration_indexes_existing_rows_without_markup(tmp_path, monkeypatch):
+    conn = connect_sqlite(str(tmp_path / "old.db"))
+    before = [step for step in migrations.MIGRATIONS if step[0] < 5]
+    monkeypatch.setattr(migrations, "MIGRATIONS", before)
+    monkeypatch.setattr(migrations, "SCHEMA_VERSION", before[-1][0])
+    migrations.migrate(conn)
+    conn.execute(
+        "INSERT INTO research_notes (phone_digits, ts, note_text) VALUES (?, '2026-01-01', ?)",
+        (PHONE, "<p><strong>Terraform</strong></p>"),
+    )
+    conn.commit()
+
+    monkeypatch.undo()
+    assert migrations.migrate(conn) == migrations.SCHEMA_VERSION
+    assert research_db.search_fulltext(conn, "strong", 50) == []
+    assert research_db.search_fulltext(conn, "terraform", 50)
+    conn.close()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from ndm_oncall.gmail_client import GmailClient
+from ndm_oncall.gmail_quota import BACKGROUND, INTERACTIVE, QuotaScheduler
+from tests import fake_gmail
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = fake_gmail.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gmail(server):
+    server.messages = fake_gmail.sample_messages(40)
+    server.counters = dict.fromkeys(server.counters, 0)
+    client = GmailClient(api_endpoint=server.endpoint)
+    # Short backoff so retries do not slow the suite down.
+    client.scheduler = QuotaScheduler(units_per_s=10_000, backoff_base_s=0.01, backoff_max_s=0.05)
+    yield server, client
+    client.close()
+
+
+def _ids(server, count):
+    # Not in mailbox order, so ordering by request position is observable.
+    ids = [m["id"] for m in server.messages[:count]]
+    return ids[1::2] + ids[::2]
+
+
+def test_fetch_metadata_is_one_batch_request_in_order(gmail):
+    server, client = gmail
+    ids = _ids(server, 12)
+    details = client.fetch_metadata(ids)
+    assert [d["id"] for d in details] == ids
+    assert server.counters["http_requests"] == 1
+    assert server.counters["batch_requests"] == 1
+    assert server.counters["api_calls"] == len(ids)
+    headers = {h["name"] for h in details[0]["payload"]["headers"]}
+    assert headers == {"Subject", "From", "Date", "Message-Id"}
+
+
+def test_fetch_metadata_falls_back_when_the_batch_fails(gmail):
+    server, client = gmail
+    ids = _ids(server, 6)
+    # The batch is tried twice (one retry) before falling back.
+    server.fail_batches = 2
+    details = client.fetch_metadata(ids)
+    assert [d["id"] for d in details] == ids
+    assert server.counters["batch_requests"] == 2
+    assert server.counters["http_requests"] == 2 + len(ids)
+
+
+def test_fetch_metadata_refetches_dropped_sub_responses(gmail):
+    server, client = gmail
+    ids = _ids(server, 6)
+    server.drop_batch_parts = 2
+    details = client.fetch_metadata(ids)
+    assert [d["id"] for d in details] == ids
+    # A short batch reply fails as a whole; every call is fetched again.
+    assert server.counters["batch_requests"] == 1
+    assert server.counters["http_requests"] == 1 + len(ids)
+
+
+def test_fetch_metadata_refetches_rate_limited_calls_only(gmail):
+    server, client = gmail
+    ids = _ids(server, 6)
+    # The first call inside the batch is answered 429.
+    server.throttle_next = 1
+    details = client.fetch_metadata(ids)
+    assert [d["id"] for d in details] == ids
+    assert server.counters["batch_requests"] == 1
+    assert server.counters["http_requests"] == 2
+    assert client.scheduler.stats()["throttled"] == 1
+
+
+def test_fetch_metadata_skip_missing(gmail):
+    server, client = gmail
+    ids = _ids(server, 4)
+    server.delete_message(ids[1])
+    details = client.fetch_metadata(ids, skip_missing=True)
+    assert [d and d["id"] for d in details] == [ids[0], None, ids[2], ids[3]]
+
+
+def test_throttled_calls_are_retried_and_counted(gmail):
+    server, client = gmail
+    server.throttle_next = 2
+    assert client.get_profile()["emailAddress"] == fake_gmail.DEFAULT_MAILBOX
+    stats = client.scheduler.stats()
+    assert (stats["throttled"], stats["retries"], stats["failures"]) == (2, 2, 0)
+    assert stats["requests"] == 3
+    assert server.counters["throttled"] == 2
+
+
+def test_retries_give_up_after_max_retries(gmail):
+    server, client = gmail
+    client.scheduler.max_retries = 2
+    server.throttle_next = 10
+    with pytest.raises(HttpError) as info:
+        client.get_profile()
+    assert info.value.resp.status == 429
+    stats = client.scheduler.stats()
+    assert (stats["throttled"], stats["retries"], stats["failures"]) == (3, 2, 1)
+    assert server.counters["api_calls"] == 3
+
+
+def test_backoff_is_bounded():
+    scheduler = QuotaScheduler(backoff_base_s=0.5, backoff_max_s=4.0)
+    for attempt in range(12):
+        step = min(4.0, 0.5 * 2 ** attempt)
+        delays = [scheduler._backoff_s(attempt) for _ in range(50)]
+        # Equal jitter: between half the step and the step, never past the cap.
+        assert all(step / 2 <= delay <= step for delay in delays)
+
+
+def test_interactive_goes_ahead_of_queued_background_work():
+    # 10 units of capacity refilling at 20/s; background may not take the
+    # last 2.5 units (INTERACTIVE_RESERVE).
+    scheduler = QuotaScheduler(units_per_s=20, capacity=10)
+    scheduler.acquire(10, INTERACTIVE)
+    finished = []
+    lock = threading.Lock()
+
+    def acquire(name, priority):
+        scheduler.acquire(5, priority)
+        with lock:
+            finished.append((name, scheduler.stats()["tokens"]))
+
+    background = threading.Thread(target=acquire, args=("background", BACKGROUND))
+    background.start()
+    deadline = time.monotonic() + 1
+    while scheduler.stats()["waiting"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    interactive = threading.Thread(target=acquire, args=("interactive", INTERACTIVE))
+    interactive.start()
+    interactive.join(2)
+    background.join(2)
+
+    # Background alone would have been served first (7.5 units at 20/s);
+    # the later interactive call jumped the queue.
+    assert [name for name, _ in finished] == ["interactive", "background"]
+    # Background only went once the reserve was left in the bucket.
+    assert finished[1][1] >= scheduler.reserve - 0.5
+    stats = scheduler.stats()
+    assert (stats["interactive_requests"], stats["background_requests"]) == (2, 1)
+
+
+def test_background_never_spends_the_reserve():
+    scheduler = QuotaScheduler(units_per_s=0.001, capacity=10)
+    scheduler.acquire(7, INTERACTIVE)
+    done = threading.Event()
+
+    def background():
+        scheduler.acquire(1, BACKGROUND)
+        done.set()
+
+    threading.Thread(target=background, daemon=True).start()
+    # 3 units left, 2.5 of them reserved: the background call must wait...
+    assert not done.wait(0.1)
+    # ...while interactive work can still use the reserve.
+    assert scheduler.acquire(3, INTERACTIVE) < 0.05
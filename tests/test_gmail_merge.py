@@ -0,0 +1,60 @@
+from ndm_oncall import gmail_client
+
+SUMMARY_KEYS = {
+    "subject",
+    "from",
+    "date",
+    "snippet",
+    "gmail_message_id",
+    "rfc_message_id",
+    "mailbox_email",
+    "account_index",
+    "link",
+}
+
+
+def _detail(msg_id, internal_date, rfc_id):
+    return {
+        "id": msg_id,
+        "internalDate": str(internal_date),
+        "snippet": f"snippet {msg_id}",
+        "payload": {
+            "headers": [
+                {"name": "Subject", "value": f"subject {msg_id}"},
+                {"name": "Message-Id", "value": rfc_id},
+            ]
+        },
+    }
+
+
+def _dated(mailbox, *details):
+    return [
+        (int(d["internalDate"]), gmail_client._message_summary(d, mailbox, "0"))
+        for d in details
+    ]
+
+
+def test_summary_keeps_its_shape():
+    summary = gmail_client._message_summary(_detail("a", 1, "<a@x>"), "me@x", "0")
+    assert set(summary) == SUMMARY_KEYS
+
+
+def test_merge_orders_by_date_and_dedupes():
+    first = _dated("one@x", _detail("a", 300, "<a@x>"), _detail("b", 100, "<shared@x>"))
+    second = _dated("two@x", _detail("c", 200, "<shared@x>"), _detail("d", 400, "<d@x>"))
+
+    merged = gmail_client.merge_results([first, second], 10)
+
+    # The shared message is kept once, as its newest copy ("c", not "b").
+    assert [m["gmail_message_id"] for m in merged] == ["d", "a", "c"]
+    assert merged[2]["mailbox_email"] == "two@x"
+    assert all(set(m) == SUMMARY_KEYS for m in merged)
+    assert len(gmail_client.merge_results([first, second], 2)) == 2
+
+
+def test_merge_keeps_the_first_mailbox_copy_on_equal_dates():
+    first = _dated("one@x", _detail("a", 100, "<shared@x>"))
+    second = _dated("two@x", _detail("b", 100, "<shared@x>"))
+
+    assert [m["mailbox_email"] for m in gmail_client.merge_results([first, second], 10)] == ["one@x"]
+    assert [m["mailbox_email"] for m in gmail_client.merge_results([second, first], 10)] == ["two@x"]
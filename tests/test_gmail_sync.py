@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from ndm_oncall import db as oncall_db
+from ndm_oncall import gmail_sync
+from ndm_oncall.gmail_client import GmailClient
+from ndm_oncall.gmail_quota import QuotaScheduler
+from ndm_oncall.gmail_sync import GmailSync, extract_phones
+from tests import fake_gmail
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = fake_gmail.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sync(server, db_path, request, monkeypatch):
+    # A mailbox of its own per test, so mirrored rows never mix.
+    server.mailbox = f"{request.node.name}@example.com"
+    server.messages = fake_gmail.sample_messages(30)
+    server.history = []
+    server.history_floor = server.history_id
+    server.counters = dict.fromkeys(server.counters, 0)
+    # Small pages, so the full sync has to follow page tokens.
+    monkeypatch.setattr(gmail_sync, "FULL_SYNC_PAGE_SIZE", 8)
+    client = GmailClient(api_endpoint=server.endpoint)
+    client.scheduler = QuotaScheduler(units_per_s=10_000)
+    yield server, GmailSync(client)
+    client.close()
+
+
+def _mirrored(db_path, mailbox):
+    conn = sqlite3.connect(db_path)
+    try:
+        ids = {
+            row[0]
+            for row in conn.execute(
+                "SELECT gmail_message_id FROM gmail_messages WHERE mailbox_email = ?", (mailbox,)
+            )
+        }
+        phones = dict(
+            conn.execute(
+                "SELECT gmail_message_id, last10 FROM gmail_message_phones WHERE mailbox_email = ?",
+                (mailbox,),
+            )
+        )
+    finally:
+        conn.close()
+    return ids, phones
+
+
+def _new_message(i):
+    message = fake_gmail.sample_messages(i + 1)[i]
+    message["snippet"] = f"New lead, call (555) 010-{i:04d}"
+    return message
+
+
+def test_extract_phones():
+    assert extract_phones(
+        "Call 5551234567 or 555-123-4568",
+        "(555) 123 4569, +1.555.123.4570 or 1 555 123 4571",
+        None,
+        "again: 555.123.4567",
+    ) == ["5551234567", "5551234568", "5551234569", "5551234570", "5551234571"]
+    # Longer digit runs are ids or other countries, not a NANP number.
+    assert extract_phones("order 155512345678", "ref 55512345", "") == []
+    assert extract_phones() == []
+
+
+def test_full_sync_mirrors_the_inbox(sync, db_path):
+    server, engine = sync
+    server.archive_message(server.messages[0]["id"])
+    assert engine.sync_once()
+
+    state = oncall_db.get_gmail_sync_state(server.mailbox)
+    assert state["full_sync_completed_at"]
+    assert state["page_token"] is None
+    assert state["history_id"] == str(server.history_id)
+    ids, phones = _mirrored(db_path, server.mailbox)
+    assert ids == {m["id"] for m in server.messages[1:]}
+    message = server.messages[5]
+    assert phones[message["id"]] == extract_phones(message["snippet"])[0]
+
+
+def test_incremental_sync_replays_history(sync, db_path):
+    server, engine = sync
+    engine.sync_once()
+    started = oncall_db.get_gmail_sync_state(server.mailbox)["full_sync_started_at"]
+
+    added = _new_message(40)
+    server.add_message(added)
+    archived, deleted = server.messages[3]["id"], server.messages[4]["id"]
+    server.archive_message(archived)
+    server.delete_message(deleted)
+    # Added then archived before the sync ran: never fetched.
+    transient = _new_message(41)
+    server.add_message(transient)
+    server.archive_message(transient["id"])
+    server.counters = dict.fromkeys(server.counters, 0)
+    engine.sync_once()
+
+    # Profile, one history page and one batch for the single new message.
+    assert server.counters["api_calls"] == 3
+    state = oncall_db.get_gmail_sync_state(server.mailbox)
+    assert state["full_sync_started_at"] == started
+    assert state["history_id"] == str(server.history_id)
+    ids, phones = _mirrored(db_path, server.mailbox)
+    assert added["id"] in ids
+    assert phones[added["id"]] == "5550100040"
+    assert not {archived, deleted, transient["id"]} & ids
+    assert len(ids) == 30 - 2 + 1
+
+
+def test_expired_history_falls_back_to_a_full_sync(sync, db_path):
+    server, engine = sync
+    engine.sync_once()
+    started = oncall_db.get_gmail_sync_state(server.mailbox)["full_sync_started_at"]
+
+    added = _new_message(42)
+    server.add_message(added)
+    # Gone without a history record: only a full sync can notice.
+    vanished = server.messages.pop(7)["id"]
+    server.expire_history()
+    engine.sync_once()
+
+    state = oncall_db.get_gmail_sync_state(server.mailbox)
+    assert state["full_sync_started_at"] > started
+    assert state["full_sync_completed_at"] >= state["full_sync_started_at"]
+    assert state["history_id"] == str(server.history_id)
+    ids, _ = _mirrored(db_path, server.mailbox)
+    assert ids == {m["id"] for m in server.messages}
+    assert added["id"] in ids and vanished not in ids
+
+    # History works again from the new starting point.
+    server.counters = dict.fromkeys(server.counters, 0)
+    engine.sync_once()
+    assert server.counters["api_calls"] == 2
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import ast
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ndm_oncall import db as oncall_db
+from shared import profile_store
+
+ROOT = Path(__file__).resolve().parent.parent
+PHONE = "5550124001"
+
+# What the bundle must hold for main.py to build the workspace from it.
+BUNDLE_KEYS = {
+    "call_id",
+    "recent_calls",
+    "call_history",
+    "profile",
+    "opportunity",
+    "emails",
+    "emails_synced_at",
+    "mirrored_emails",
+}
+
+
+def _render_fields() -> set:
+    # Every workspace field ui.js renderWorkspace reads.
+    source = (ROOT / "ndm_oncall" / "static" / "ui.js").read_text(encoding="utf-8")
+    body = source[source.index("function renderWorkspace("):]
+    body = body[: body.index("\n}\n")]
+    return set(re.findall(r"\bws\.(\w+)", body)) | set(re.findall(r'has\("(\w+)"\)', body))
+
+
+def _incoming_call_events() -> list:
+    # The field dicts main.py publishes as incoming_call_workspace; main
+    # needs FastAPI to import, so they are read from its source.
+    tree = ast.parse((ROOT / "ndm_oncall" / "main.py").read_text(encoding="utf-8"))
+    events = []
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and ast.unparse(node.func) == "WORKSPACE.update"
+            and isinstance(node.args[0], ast.Constant)
+            and node.args[0].value == "incoming_call_workspace"
+        ):
+            events.append({key.value for key in node.args[1].keys})
+    return events
+
+
+def test_render_reads_the_expected_fields():
+    assert {
+        "phone_digits",
+        "call_id",
+        "call_history",
+        "profile",
+        "emails",
+        "recording_active",
+    } <= _render_fields()
+
+
+def test_incoming_call_events_carry_every_rendered_field():
+    events = _incoming_call_events()
+    # A new call and a repeat of the call being recorded.
+    assert len(events) == 2
+    for fields in events:
+        assert _render_fields() <= fields
+
+
+def test_bundle_carries_every_field_the_workspace_is_built_from(db_path):
+    profile_store.save_profile({"phone_digits": PHONE, "name": "Ann", "company": "Acme"})
+    oncall_db.save_email_links(
+        PHONE,
+        [{"gmail_message_id": "m-bundle", "subject": "Role", "snippet": "call 555-012-4001"}],
+    )
+
+    bundle = oncall_db.begin_incoming_call(PHONE, mirror_max_age_s=600)
+    assert set(bundle) == BUNDLE_KEYS
+    call_id = bundle["call_id"]
+    assert bundle["call_history"][0]["id"] == call_id
+    assert call_id in [c["id"] for c in bundle["recent_calls"]]
+    assert (bundle["profile"]["name"], bundle["profile"]["company"]) == ("Ann", "Acme")
+    assert [e["gmail_message_id"] for e in bundle["emails"]] == ["m-bundle"]
+    assert bundle["emails_synced_at"]
+
+    # The caller is already on the recorded call: same call, no new row.
+    again = oncall_db.begin_incoming_call(PHONE, existing_call_id=call_id)
+    assert set(again) == BUNDLE_KEYS
+    assert again["call_id"] == call_id
+    assert [c["id"] for c in again["call_history"]] == [c["id"] for c in bundle["call_history"]]
+    assert again["mirrored_emails"] is None
+
+
+def test_email_cache_state(db_path):
+    # A number never searched has no email_sync_state row.
+    bundle = oncall_db.begin_incoming_call("5550124002")
+    assert bundle["emails_synced_at"] is None
+    assert oncall_db.email_cache_state(bundle, 300) == "missing"
+
+    oncall_db.save_email_links("5550124002", [])
+    bundle = oncall_db.begin_incoming_call("5550124002")
+    synced_at = datetime.fromisoformat(bundle["emails_synced_at"])
+    assert oncall_db.email_cache_state(bundle, 300) == "fresh"
+    assert oncall_db.email_cache_state(bundle, 300, synced_at + timedelta(seconds=299)) == "fresh"
+    assert oncall_db.email_cache_state(bundle, 300, synced_at + timedelta(seconds=300)) == "stale"
+    # A timestamp that does not parse cannot be trusted as fresh.
+    assert oncall_db.email_cache_state({**bundle, "emails_synced_at": "yesterday"}, 300) == "stale"
+    # The mirror wins whatever the last search.
+    assert oncall_db.email_cache_state({**bundle, "mirrored_emails": []}, 0) == "mirror"
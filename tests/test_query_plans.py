@@ -0,0 +1,553 @@
+from __future__ import annotations
+
+import contextlib
+import inspect
+import re
+import sys
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Callable, Iterator, List, Set, Tuple
+
+import pytest
+
+from ndm_oncall import db as oncall_db
+from ndm_research import db as research_db
+from shared.migrations import migrate
+from shared.sqlite_utils import connect_sqlite
+
+# Every query either db module runs goes through EXPLAIN QUERY PLAN here. A
+# plan may not SCAN a table or sort in a temp B-tree unless the case allows
+# that step by name (with the reason next to it), and it must use the
+# indexes the case lists. Statements are captured with the connection's
+# trace callback, so the real SQL and parameters of each helper are checked.
+
+PHONE = "5550106001"
+OTHER = "5550106002"
+MAILBOX = "plans@example.com"
+
+DB_MODULES = (oncall_db, research_db)
+
+
+@dataclass
+class Case:
+    name: str
+    run: Callable[[object], object]
+    uses: Tuple[str, ...] = ()
+    allow: Tuple[str, ...] = ()
+
+
+@dataclass
+class Env:
+    conn: object
+    call_id: int = 0
+    note_id: int = 0
+    statements: List[str] = field(default_factory=list)
+
+
+def _seed(env: Env) -> None:
+    env.call_id = oncall_db.create_call(PHONE)
+    oncall_db.create_call(f"1{OTHER}")
+    env.note_id = oncall_db.add_note(env.call_id, "<p>Seed note</p>")["id"]
+    oncall_db.upsert_opportunity({"phone_digits": PHONE, "jd_title": "Platform"})
+    oncall_db.save_email_links(
+        PHONE,
+        [
+            {
+                "gmail_message_id": "m-1",
+                "subject": "Role",
+                "from": "r@example.com",
+                "date": "Mon",
+                "snippet": "platform role",
+                "link": "https://mail.google.com/mail/u/0/#all/m-1",
+                "mailbox_email": MAILBOX,
+                "account_index": "0",
+            }
+        ],
+    )
+    oncall_db.save_gmail_messages(
+        MAILBOX,
+        [
+            {
+                "gmail_message_id": "m-2",
+                "thread_id": "t-2",
+                "internal_date": 1700000000000,
+                "subject": "Call me",
+                "from": "r@example.com",
+                "date": "Tue",
+                "snippet": f"reach me at {PHONE}",
+                "link": "https://mail.google.com/mail/u/0/#all/m-2",
+            }
+        ],
+    )
+    oncall_db.save_gmail_sync_state(
+        MAILBOX, {"history_id": "1", "full_sync_completed_at": "2026-01-01T00:00:00"}
+    )
+    oncall_db.save_email_body(MAILBOX, "m-1", "Full body", 1 << 20)
+    research_db.create_profile(PHONE, PHONE[-4:], "Dana", "Acme", "Recruiter")
+    research_db.add_research_note(PHONE, "<p>Research note</p>")
+
+
+ONCALL_CASES = [
+    Case("create_call", lambda env: oncall_db.create_call(PHONE)),
+    Case(
+        "update_call_end",
+        lambda env: oncall_db.update_call_end(env.call_id),
+        uses=("USING INTEGER PRIMARY KEY",),
+    ),
+    Case(
+        "update_call_audio",
+        lambda env: oncall_db.update_call_audio(env.call_id, "a.wav"),
+        uses=("USING INTEGER PRIMARY KEY",),
+    ),
+    Case(
+        "get_call_by_id",
+        lambda env: oncall_db.get_call_by_id(env.call_id),
+        uses=("USING INTEGER PRIMARY KEY",),
+    ),
+    Case(
+        "add_research_recording",
+        lambda env: oncall_db.add_research_recording(env.call_id, PHONE, "a.wav", 3),
+        uses=("idx_research_recordings_call_id",),
+    ),
+    Case(
+        "get_latest_call",
+        lambda env: oncall_db.get_latest_call(PHONE),
+        uses=("idx_calls_phone_digits_ts",),
+    ),
+    Case(
+        "list_recent_calls",
+        lambda env: oncall_db.list_recent_calls(20),
+        uses=("idx_calls_ts_start",),
+        # Newest calls overall: walks the ts index backwards and stops at LIMIT.
+        allow=("SCAN calls USING INDEX idx_calls_ts_start",),
+    ),
+    Case(
+        "list_call_history",
+        lambda env: oncall_db.list_call_history(PHONE, PHONE, 3),
+        uses=("idx_calls_phone_digits_ts",),
+    ),
+    Case(
+        "list_call_history_by_last10",
+        lambda env: oncall_db.list_call_history(f"1{PHONE}", PHONE, 3),
+        uses=("idx_calls_last10_ts",),
+    ),
+    Case(
+        "get_notes",
+        lambda env: oncall_db.get_notes(env.call_id),
+        uses=("idx_call_notes_call_ts",),
+    ),
+    Case(
+        "add_note",
+        lambda env: oncall_db.add_note(env.call_id, "<p>More</p>"),
+    ),
+    Case(
+        "get_opportunity",
+        lambda env: oncall_db.get_opportunity(PHONE),
+        uses=("idx_opportunities_phone_digits",),
+    ),
+    Case(
+        "upsert_opportunity",
+        lambda env: oncall_db.upsert_opportunity({"phone_digits": PHONE, "status": "open"}),
+    ),
+    Case(
+        "save_email_links",
+        lambda env: oncall_db.save_email_links(PHONE, []),
+        uses=("idx_email_links_phone",),
+    ),
+    Case(
+        "list_email_links",
+        lambda env: oncall_db.list_email_links(PHONE),
+        uses=("idx_email_links_phone_id",),
+    ),
+    Case(
+        "find_mirrored_emails",
+        lambda env: oncall_db.find_mirrored_emails(PHONE, max_age_s=3600),
+        uses=("SEARCH p USING PRIMARY KEY (last10=?)", "sqlite_autoindex_gmail_messages_1"),
+        # One row per connected mailbox.
+        allow=("SCAN gmail_sync_state",),
+    ),
+    Case(
+        "begin_incoming_call",
+        lambda env: oncall_db.begin_incoming_call(PHONE),
+        uses=(
+            "idx_calls_phone_digits_ts",
+            "idx_email_links_phone_id",
+            "idx_opportunities_phone_digits",
+        ),
+        allow=("SCAN calls USING INDEX idx_calls_ts_start",),
+    ),
+    Case(
+        "workspace_fields",
+        lambda env: oncall_db.workspace_fields(PHONE),
+        uses=("idx_calls_phone_digits_ts", "idx_opportunities_phone_digits"),
+        allow=("SCAN calls USING INDEX idx_calls_ts_start",),
+    ),
+    Case(
+        "save_gmail_messages",
+        lambda env: oncall_db.save_gmail_messages(
+            MAILBOX,
+            [
+                {
+                    "gmail_message_id": "m-3",
+                    "thread_id": "t-3",
+                    "internal_date": 1700000000001,
+                    "subject": "Hello",
+                    "snippet": f"call {OTHER}",
+                }
+            ],
+        ),
+        uses=("idx_gmail_message_phones_message",),
+    ),
+    Case(
+        "delete_gmail_messages",
+        lambda env: oncall_db.delete_gmail_messages(MAILBOX, ["m-404"]),
+        uses=("sqlite_autoindex_gmail_messages_1",),
+    ),
+    Case(
+        "prune_gmail_messages",
+        lambda env: oncall_db.prune_gmail_messages(MAILBOX, "2000-01-01"),
+        uses=("sqlite_autoindex_gmail_messages_1",),
+    ),
+    Case(
+        "get_gmail_sync_state",
+        lambda env: oncall_db.get_gmail_sync_state(MAILBOX),
+        uses=("sqlite_autoindex_gmail_sync_state_1",),
+    ),
+    Case(
+        "save_gmail_sync_state",
+        lambda env: oncall_db.save_gmail_sync_state(MAILBOX, {"history_id": "2"}),
+    ),
+    Case(
+        "backfill_numbers",
+        lambda env: oncall_db.backfill_numbers("5550106000", 10),
+        uses=("sqlite_autoindex_number_stats_1", "sqlite_autoindex_research_profiles_1"),
+    ),
+    Case(
+        "get_backfill_state",
+        lambda env: oncall_db.get_backfill_state(),
+        uses=("USING INTEGER PRIMARY KEY",),
+    ),
+    Case(
+        "save_backfill_state",
+        lambda env: oncall_db.save_backfill_state({"cursor": PHONE}),
+    ),
+    Case(
+        "email_message_mailbox",
+        lambda env: oncall_db.email_message_mailbox("m-2"),
+        uses=("idx_email_links_message", "idx_gmail_messages_message"),
+    ),
+    Case(
+        "get_email_body",
+        lambda env: oncall_db.get_email_body("m-1", MAILBOX),
+        uses=("idx_email_bodies_message", "sqlite_autoindex_email_body_blobs_1"),
+    ),
+    Case(
+        "save_email_body",
+        lambda env: oncall_db.save_email_body(MAILBOX, "m-2", "Another body", 1 << 20),
+        uses=("idx_email_body_blobs_lru",),
+        # LRU eviction keeps a running size over every cached blob in access
+        # order; the covering index supplies that order.
+        allow=("SCAN email_body_blobs USING COVERING INDEX idx_email_body_blobs_lru",),
+    ),
+]
+
+RESEARCH_CASES = [
+    Case(
+        "search_calls_by_last10",
+        lambda env: research_db.search_calls_by_last10(env.conn, PHONE, 5),
+        uses=("sqlite_autoindex_number_stats_1",),
+    ),
+    Case(
+        "search_calls_by_last4",
+        lambda env: research_db.search_calls_by_last4(env.conn, PHONE[-4:], 5),
+        uses=("idx_number_stats_last4",),
+    ),
+    Case(
+        "search_calls_by_partial",
+        lambda env: research_db.search_calls_by_partial(env.conn, "0106", 5),
+        uses=("number_stats_trigram VIRTUAL TABLE", "USING INTEGER PRIMARY KEY"),
+        # Trigram hits come back in rowid order; only the hits are sorted.
+        allow=("USE TEMP B-TREE FOR ORDER BY",),
+    ),
+    Case(
+        "search_calls_by_partial_short",
+        lambda env: research_db.search_calls_by_partial(env.conn, "01", 5),
+        # Below the trigram minimum a substring LIKE has to look at every
+        # number; newest first so LIMIT stops the walk early.
+        allow=("SCAN number_stats USING INDEX idx_number_stats_recent",),
+    ),
+    Case(
+        "search_profiles_by_last10",
+        lambda env: research_db.search_profiles_by_last10(env.conn, PHONE, 5),
+        uses=("sqlite_autoindex_research_profiles_1",),
+    ),
+    Case(
+        "search_profiles_by_last4",
+        lambda env: research_db.search_profiles_by_last4(env.conn, PHONE[-4:], 5),
+        uses=("idx_research_profiles_last4",),
+    ),
+    Case(
+        "search_profiles_by_partial",
+        lambda env: research_db.search_profiles_by_partial(env.conn, "0106", 5),
+        uses=("research_profiles_trigram VIRTUAL TABLE", "USING INTEGER PRIMARY KEY"),
+    ),
+    Case(
+        "search_profiles_by_partial_short",
+        lambda env: research_db.search_profiles_by_partial(env.conn, "01", 5),
+        # Same short-substring fallback as search_calls_by_partial_short.
+        allow=("SCAN research_profiles",),
+    ),
+    Case(
+        "search_fulltext",
+        lambda env: research_db.search_fulltext(env.conn, "note", 20),
+        uses=("fulltext_index VIRTUAL TABLE", "sqlite_autoindex_number_stats_1"),
+        # Ranked by bm25, which only exists per hit.
+        allow=("USE TEMP B-TREE FOR ORDER BY",),
+    ),
+    Case(
+        "list_all_numbers",
+        lambda env: research_db.list_all_numbers(env.conn, 5),
+        uses=("idx_number_stats_recent",),
+        # Keyset page: walks the (last_call_ts, last10) index and stops at LIMIT.
+        allow=("SCAN number_stats USING INDEX idx_number_stats_recent",),
+    ),
+    Case(
+        "list_all_numbers_after_cursor",
+        lambda env: research_db.list_all_numbers(
+            env.conn, 5, research_db.encode_cursor(["9999", "9999999999"])
+        ),
+        uses=("idx_number_stats_recent",),
+    ),
+    Case(
+        "list_calls",
+        lambda env: research_db.list_calls(env.conn, PHONE, 5),
+        uses=("idx_calls_last10_ts",),
+    ),
+    Case(
+        "list_calls_after_cursor",
+        lambda env: research_db.list_calls(
+            env.conn, PHONE, 5, research_db.encode_cursor(["9999", 999999])
+        ),
+        uses=("idx_calls_last10_ts",),
+    ),
+    Case(
+        "list_call_notes",
+        lambda env: research_db.list_call_notes(env.conn, PHONE, 200),
+        uses=("idx_calls_last10_ts", "idx_call_notes_call_ts"),
+    ),
+    Case(
+        "list_research_notes",
+        lambda env: research_db.list_research_notes(env.conn, PHONE, 200),
+        uses=("idx_research_notes_phone_ts",),
+    ),
+    Case(
+        "list_email_links",
+        lambda env: research_db.list_email_links(env.conn, PHONE),
+        uses=("idx_email_links_phone_id",),
+    ),
+    Case(
+        "list_recordings",
+        lambda env: research_db.list_recordings(env.conn, PHONE),
+        uses=("idx_research_recordings_phone_created",),
+    ),
+    Case(
+        "get_latest_call_id",
+        lambda env: research_db.get_latest_call_id(env.conn, PHONE),
+        uses=("sqlite_autoindex_number_stats_1",),
+    ),
+    Case(
+        "get_latest_call_display_name",
+        lambda env: research_db.get_latest_call_display_name(env.conn, PHONE),
+        uses=("sqlite_autoindex_number_stats_1",),
+    ),
+    Case(
+        "get_call_stats",
+        lambda env: research_db.get_call_stats(env.conn, PHONE),
+        uses=("sqlite_autoindex_number_stats_1",),
+    ),
+    Case(
+        "get_profile",
+        lambda env: research_db.get_profile(env.conn, PHONE),
+        uses=("sqlite_autoindex_research_profiles_1",),
+    ),
+    Case(
+        "get_jd_text",
+        lambda env: research_db.get_jd_text(env.conn, PHONE),
+        uses=("sqlite_autoindex_research_jd_1",),
+    ),
+    Case(
+        "get_resume_text",
+        lambda env: research_db.get_resume_text(env.conn, PHONE),
+        uses=("sqlite_autoindex_research_resume_lines_1",),
+    ),
+    Case(
+        "create_profile",
+        lambda env: research_db.create_profile(OTHER, OTHER[-4:], "Lee", "Beta", "Lead"),
+    ),
+    Case(
+        "upsert_profile",
+        lambda env: research_db.upsert_profile(PHONE, PHONE[-4:], "Dana", "Acme", "Lead"),
+    ),
+    Case("ensure_profile", lambda env: research_db.ensure_profile(PHONE, PHONE[-4:])),
+    Case("upsert_jd", lambda env: research_db.upsert_jd(PHONE, "<p>Platform</p>")),
+    Case("ensure_jd", lambda env: research_db.ensure_jd(PHONE)),
+    Case("upsert_resume", lambda env: research_db.upsert_resume(PHONE, "<p>Go</p>")),
+    Case("ensure_resume", lambda env: research_db.ensure_resume(PHONE)),
+    Case(
+        "add_call_note",
+        lambda env: research_db.add_call_note(env.call_id, "<p>From research</p>"),
+    ),
+    Case("add_research_note", lambda env: research_db.add_research_note(PHONE, "More")),
+    Case(
+        "update_note_any",
+        lambda env: research_db.update_note_any(env.note_id, "<p>Edited</p>"),
+        uses=("USING INTEGER PRIMARY KEY",),
+    ),
+    Case(
+        "delete_note_any",
+        lambda env: research_db.delete_note_any(999999),
+        uses=("USING INTEGER PRIMARY KEY",),
+    ),
+    Case(
+        "delete_call",
+        lambda env: research_db.delete_call(999999),
+        uses=("idx_call_notes_call_ts", "USING INTEGER PRIMARY KEY"),
+    ),
+]
+
+# Runs last: it empties the tables on purpose.
+CLEAR_CASE = Case(
+    "clear_all",
+    lambda env: oncall_db.clear_all(),
+    allow=(
+        "SCAN call_notes",
+        "SCAN calls",
+        "SCAN email_links",
+        "SCAN opportunities",
+        "SCAN email_sync_state",
+    ),
+)
+
+CASES = ONCALL_CASES + RESEARCH_CASES + [CLEAR_CASE]
+CASE_IDS = (
+    [f"oncall.{case.name}" for case in ONCALL_CASES]
+    + [f"research.{case.name}" for case in RESEARCH_CASES]
+    + [f"oncall.{CLEAR_CASE.name}"]
+)
+
+_FULL_SCAN = re.compile(r"^SCAN (?!\(subquery-)(?!.*VIRTUAL TABLE)")
+
+
+def _install(monkeypatch: pytest.MonkeyPatch, env: Env) -> None:
+    @contextlib.contextmanager
+    def connect() -> Iterator[object]:
+        with env.conn:
+            yield env.conn
+
+    def write(fn, *args, **kwargs):
+        # One transaction per fn, like the write queue.
+        with env.conn:
+            return fn(env.conn, *args, **kwargs)
+
+    queue = SimpleNamespace(execute=write, submit=write)
+    monkeypatch.setattr(oncall_db, "_connect", connect)
+    monkeypatch.setattr(oncall_db, "_write", write)
+    monkeypatch.setattr(oncall_db, "get_write_queue", lambda path: queue)
+    monkeypatch.setattr(research_db, "_write", write)
+
+
+def _make_env(path: str) -> Env:
+    conn = connect_sqlite(path)
+    migrate(conn)
+    env = Env(conn=conn)
+    conn.set_trace_callback(lambda sql: env.statements.append(sql))
+    return env
+
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory):
+    monkeypatch = pytest.MonkeyPatch()
+    env = _make_env(str(tmp_path_factory.mktemp("plans") / "plans.db"))
+    _install(monkeypatch, env)
+    _seed(env)
+    yield env
+    monkeypatch.undo()
+    env.conn.close()
+
+
+def _queries(statements: List[str]) -> List[str]:
+    seen: List[str] = []
+    for sql in statements:
+        text = " ".join(sql.split())
+        head = text.split(" ", 1)[0].upper()
+        if head not in ("SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH"):
+            continue  # transaction control, PRAGMAs, trigger bodies ("-- ...")
+        if "'main'." in text:
+            continue  # FTS5 reading its own shadow tables
+        if text not in seen:
+            seen.append(text)
+    return seen
+
+
+def _run(env: Env, case: Case) -> List[Tuple[str, List[str]]]:
+    env.statements.clear()
+    case.run(env)
+    if env.conn.in_transaction:
+        env.conn.commit()
+    plans = []
+    for sql in _queries(env.statements):
+        detail = [row[3] for row in env.conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        plans.append((sql, detail))
+    return plans
+
+
+@pytest.mark.parametrize("case", CASES, ids=CASE_IDS)
+def test_query_plan(env, case):
+    plans = _run(env, case)
+    assert plans, f"{case.name} ran no queries"
+
+    report = "\n".join(
+        f"{sql[:160]}\n    " + "\n    ".join(detail) for sql, detail in plans
+    )
+    for sql, detail in plans:
+        for step in detail:
+            if _FULL_SCAN.search(step) or "TEMP B-TREE" in step:
+                assert any(allowed in step for allowed in case.allow), (
+                    f"{case.name}: unexpected '{step}'\n{report}"
+                )
+    steps = [step for _, detail in plans for step in detail]
+    for index in case.uses:
+        assert any(index in step for step in steps), (
+            f"{case.name}: expected a plan using {index}\n{report}"
+        )
+
+
+def test_every_query_helper_is_covered(tmp_path, monkeypatch):
+    # Any function in either db module that runs SQL must be reached by a case
+    # above, so a new query cannot skip the plan check.
+    env = _make_env(str(tmp_path / "coverage.db"))
+    _install(monkeypatch, env)
+    _seed(env)
+    files = {inspect.getsourcefile(module) for module in DB_MODULES}
+    called: Set[str] = set()
+
+    def profile(frame, event, arg):
+        if event == "call" and frame.f_code.co_filename in files:
+            called.add(frame.f_code.co_name)
+
+    sys.setprofile(profile)
+    try:
+        for case in CASES:
+            _run(env, case)
+    finally:
+        sys.setprofile(None)
+        env.conn.close()
+
+    missing = []
+    for module in DB_MODULES:
+        for name, fn in inspect.getmembers(module, inspect.isfunction):
+            if fn.__module__ != module.__name__ or name in ("init_db", "_clear_all"):
+                continue
+            if "execute(" in inspect.getsource(fn) and name not in called:
+                missing.append(f"{module.__name__}.{name}")
+    assert not missing, f"queries without a plan case: {missing}"
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from ndm_research import db as research_db
+
+
+def test_create_profile_writes_profile_jd_and_resume(db_path):
+    research_db.create_profile("5550108001", "8001", "Dana", "Acme", "Recruiter")
+    with research_db.get_db() as conn:
+        assert research_db.get_profile(conn, "5550108001")["vendor_company"] == "Acme"
+        assert conn.execute(
+            "SELECT COUNT(*) FROM research_jd WHERE phone_digits = '5550108001'"
+        ).fetchone()[0] == 1
+        assert conn.execute(
+            "SELECT COUNT(*) FROM research_resume_lines WHERE phone_digits = '5550108001'"
+        ).fetchone()[0] == 1
+
+
+def test_create_profile_is_all_or_nothing(db_path, monkeypatch):
+    def fail(conn, last10):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(research_db, "_ensure_resume", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        research_db.create_profile("5550108002", "8002", "Dana", "Acme", "Recruiter")
+    with research_db.get_db() as conn:
+        assert research_db.get_profile(conn, "5550108002") is None
+        assert research_db.get_jd_text(conn, "5550108002") == ""
+        assert conn.execute(
+            "SELECT COUNT(*) FROM research_jd WHERE phone_digits = '5550108002'"
+        ).fetchone()[0] == 0
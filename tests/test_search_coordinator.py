@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+
+from ndm_oncall.search_coordinator import SearchCoordinator
+
+
+class FakeSearches:
+    # Each search blocks until its release event is set, then publishes the
+    # way incoming_call does: only while it is still the current key.
+    def __init__(self, coordinator: SearchCoordinator) -> None:
+        self.coordinator = coordinator
+        self.started = defaultdict(asyncio.Event)
+        self.release = defaultdict(asyncio.Event)
+        self.calls: list = []
+        self.cancelled: list = []
+        self.published: list = []
+        self.dropped: list = []
+
+    def factory(self, key: str):
+        async def search():
+            self.calls.append(key)
+            self.started[key].set()
+            try:
+                await self.release[key].wait()
+            except asyncio.CancelledError:
+                self.cancelled.append(key)
+                raise
+            if self.coordinator.is_current(key):
+                self.published.append(key)
+            else:
+                self.dropped.append(key)
+            return f"results-{key}"
+
+        return search
+
+    def submit(self, key: str):
+        return self.coordinator.submit(key, self.factory(key))
+
+
+def test_duplicate_submit_joins_running_search():
+    async def scenario():
+        searches = FakeSearches(SearchCoordinator())
+        first = searches.submit("5550001")
+        await searches.started["5550001"].wait()
+        second = searches.submit("5550001")
+        assert second is first
+        searches.release["5550001"].set()
+        assert await asyncio.gather(first, second) == ["results-5550001"] * 2
+        return searches
+
+    searches = asyncio.run(scenario())
+    assert searches.calls == ["5550001"]
+    assert searches.published == ["5550001"]
+    stats = searches.coordinator.stats()
+    assert (stats["started"], stats["merged"], stats["pending"]) == (1, 1, 0)
+
+
+def test_superseded_search_result_is_dropped():
+    async def scenario():
+        searches = FakeSearches(SearchCoordinator())
+        old = searches.submit("5550001")
+        await searches.started["5550001"].wait()
+        new = searches.submit("5550002")
+        await searches.started["5550002"].wait()
+        # The running search is not cancelled: it finishes, but must not
+        # publish over the newer caller.
+        searches.release["5550001"].set()
+        assert await old == "results-5550001"
+        searches.release["5550002"].set()
+        await new
+        return searches
+
+    searches = asyncio.run(scenario())
+    assert searches.dropped == ["5550001"]
+    assert searches.published == ["5550002"]
+    assert searches.cancelled == []
+
+
+def test_supersede_cancels_search_still_waiting_for_a_slot():
+    async def scenario():
+        searches = FakeSearches(SearchCoordinator(max_concurrency=1))
+        first = searches.submit("5550001")
+        await searches.started["5550001"].wait()
+        queued = searches.submit("5550002")
+        latest = searches.submit("5550003")
+        await asyncio.gather(queued, return_exceptions=True)
+        assert queued.cancelled()
+        searches.release["5550001"].set()
+        searches.release["5550003"].set()
+        await asyncio.gather(first, latest)
+        return searches
+
+    searches = asyncio.run(scenario())
+    assert searches.calls == ["5550001", "5550003"]
+    assert searches.published == ["5550003"]
+    assert searches.coordinator.stats()["superseded"] == 1
+
+
+def test_cancel_during_fetch():
+    async def scenario():
+        searches = FakeSearches(SearchCoordinator())
+        task = searches.submit("5550001")
+        await searches.started["5550001"].wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled()
+        assert searches.coordinator.stats()["pending"] == 0
+        assert searches.coordinator.stats()["running"] == 0
+        # The key is free again: the next submit starts a fresh search
+        # instead of joining the cancelled one.
+        searches.started["5550001"].clear()
+        retry = searches.submit("5550001")
+        assert retry is not task
+        await searches.started["5550001"].wait()
+        searches.release["5550001"].set()
+        assert await retry == "results-5550001"
+        return searches
+
+    searches = asyncio.run(scenario())
+    assert searches.cancelled == ["5550001"]
+    assert searches.calls == ["5550001", "5550001"]
+    assert searches.published == ["5550001"]
+    assert searches.coordinator.stats()["failed"] == 0
+
+
+def test_shutdown_cancels_running_and_queued_searches():
+    async def scenario():
+        coordinator = SearchCoordinator(max_concurrency=1)
+        searches = FakeSearches(coordinator)
+        running = searches.submit("5550001")
+        await searches.started["5550001"].wait()
+        # Already running, so the newer caller queues behind it instead of
+        # cancelling it.
+        queued = searches.submit("5550002")
+        assert coordinator.stats()["pending"] == 2
+        await coordinator.shutdown()
+        assert running.cancelled()
+        assert queued.cancelled()
+        assert searches.submit("5550003") is None
+        return searches
+
+    searches = asyncio.run(scenario())
+    assert searches.calls == ["5550001"]
+    assert searches.cancelled == ["5550001"]
+    assert searches.published == []
+    stats = searches.coordinator.stats()
+    assert (stats["pending"], stats["running"]) == (0, 0)
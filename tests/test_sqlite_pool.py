@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from shared.sqlite_utils import ConnectionPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.db"), max_size=2)
+    yield pool
+    pool.close()
+
+
+def test_connections_are_reused(pool):
+    first = pool.acquire()
+    pool.release(first)
+    second = pool.acquire()
+    assert second is first
+    pool.release(second)
+    assert pool.stats()["open"] == 1
+
+
+def test_overflow_connections_are_closed_on_release(pool):
+    held = [pool.acquire() for _ in range(4)]
+    stats = pool.stats()
+    assert stats["open"] == 4
+    assert stats["overflow_open"] == 2
+    assert stats["overflow"] == 2
+    for conn in held:
+        pool.release(conn)
+    stats = pool.stats()
+    assert stats["open"] == 2
+    assert stats["overflow_open"] == 0
+    assert stats["idle"] == 2
+    assert stats["in_use"] == 0
+
+
+def test_open_never_exceeds_max_size_once_idle(pool):
+    for _ in range(5):
+        held = [pool.acquire() for _ in range(3)]
+        for conn in reversed(held):
+            pool.release(conn)
+        assert pool.stats()["open"] <= pool.max_size
+
+
+def test_broken_connection_is_closed_and_uncounted(pool):
+    conn = pool.acquire()
+    conn.execute("BEGIN")
+    conn.close()  # rollback on release will fail
+    pool.release(conn)
+    stats = pool.stats()
+    assert stats["open"] == 0
+    assert stats["idle"] == 0
+
+
+def test_close_closes_idle_and_refuses_new_checkouts(pool):
+    pool.release(pool.acquire())
+    held = pool.acquire()
+    pool.close()
+    assert pool.stats()["open"] == 1
+    pool.release(held)
+    assert pool.stats()["open"] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
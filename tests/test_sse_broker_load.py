@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import tracemalloc
+
+import pytest
+
+from shared import sse_broker
+from shared.sse_broker import DISCONNECT, DROP_OLDEST, SSEBroker
+
+FAST = 200
+SLOW = 100
+MAX_BUFFER = 32
+EVENTS = 20 * MAX_BUFFER
+BURST = MAX_BUFFER // 2
+PAYLOAD = {"note": "x" * 1024}
+
+
+def _frame_id(frame: bytes) -> int:
+    return int(frame[4:frame.index(b"\n")])
+
+
+async def _consume(broker: SSEBroker, sub, received: list) -> None:
+    async for frame in broker.stream(sub):
+        received.append(_frame_id(frame))
+
+
+async def _caught_up(received: list, count: int) -> None:
+    # Readers drain between bursts, so fast ones never hit the limit.
+    for _ in range(1000):
+        if all(len(ids) == count for ids in received):
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("subscribers did not catch up")
+
+
+async def _load(policy: str):
+    broker = SSEBroker(max_buffer=MAX_BUFFER, policy=policy, heartbeat_s=60)
+    broker.bind_loop()
+    received = [[] for _ in range(FAST)]
+    readers = [
+        asyncio.create_task(_consume(broker, broker.subscribe(), ids)) for ids in received
+    ]
+    # Slow subscribers never read, like a hung webview.
+    slow = [broker.subscribe() for _ in range(SLOW)]
+    await asyncio.sleep(0)
+    published = []
+    for start in range(0, EVENTS, BURST):
+        for i in range(start, start + BURST):
+            published.append(broker.publish("call_updated", {**PAYLOAD, "i": i}))
+        await _caught_up(received, len(published))
+    return broker, received, readers, slow, published
+
+
+@pytest.mark.parametrize("policy", [DROP_OLDEST, DISCONNECT])
+def test_fast_subscribers_get_every_event_in_order(policy):
+    async def scenario():
+        broker, received, readers, _, published = await _load(policy)
+        broker.close()
+        await asyncio.gather(*readers)
+        return received, published
+
+    received, published = asyncio.run(scenario())
+    assert all(ids == published for ids in received)
+
+
+def test_drop_oldest_keeps_the_newest_events_for_slow_subscribers():
+    async def scenario():
+        broker, received, readers, slow, published = await _load(DROP_OLDEST)
+        stats = broker.stats()
+        assert stats["subscribers"] == FAST + SLOW
+        assert stats["max_lag"] == MAX_BUFFER
+        assert stats["dropped"] == SLOW * (EVENTS - MAX_BUFFER)
+        assert all(sub.dropped == EVENTS - MAX_BUFFER for sub in slow)
+        assert all(not sub.closed for sub in slow)
+        # A slow reader that wakes up gets the newest MAX_BUFFER events, in
+        # order, and then keeps up with new ones.
+        late: list = []
+        reader = asyncio.create_task(_consume(broker, slow[0], late))
+        await _caught_up([late], MAX_BUFFER)
+        published.append(broker.publish("call_updated", PAYLOAD))
+        await _caught_up([late], MAX_BUFFER + 1)
+        broker.close()
+        await asyncio.gather(reader, *readers)
+        return late, published
+
+    late, published = asyncio.run(scenario())
+    assert late == published[-(MAX_BUFFER + 1):]
+
+
+def test_disconnect_closes_slow_subscribers_only():
+    async def scenario():
+        broker, received, readers, slow, published = await _load(DISCONNECT)
+        stats = broker.stats()
+        assert stats["disconnected"] == SLOW
+        assert stats["dropped"] == 0
+        assert stats["subscribers"] == FAST
+        assert all(sub.closed and not sub.buffer for sub in slow)
+        # The stream of a disconnected subscriber ends, so EventSource
+        # reconnects (and then replays from Last-Event-ID).
+        late: list = []
+        await asyncio.wait_for(_consume(broker, slow[0], late), 1)
+        resumed = broker.subscribe(last_event_id=published[-MAX_BUFFER])
+        assert [item[0] for item in resumed.replay] == published[-MAX_BUFFER + 1:]
+        broker.close()
+        await asyncio.gather(*readers)
+        return late
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_each_event_is_encoded_once(monkeypatch):
+    calls = []
+    encode = sse_broker.encode_event
+
+    def counting_encode(event_type, data):
+        calls.append(event_type)
+        return encode(event_type, data)
+
+    monkeypatch.setattr(sse_broker, "encode_event", counting_encode)
+
+    async def scenario():
+        broker = SSEBroker(max_buffer=MAX_BUFFER, policy=DROP_OLDEST)
+        subs = [broker.subscribe() for _ in range(FAST + SLOW)]
+        for i in range(MAX_BUFFER):
+            broker.publish("call_updated", {**PAYLOAD, "i": i})
+        return broker, subs
+
+    broker, subs = asyncio.run(scenario())
+    assert len(calls) == MAX_BUFFER
+    stats = broker.stats()
+    assert stats["published"] == MAX_BUFFER
+    frames = [frame for _, frame in subs[0].buffer]
+    assert stats["encoded_bytes"] == sum(len(frame) for frame in frames)
+    # Every subscriber holds the very same bytes objects, not copies.
+    for sub in subs:
+        assert all(mine is theirs for (_, mine), theirs in zip(sub.buffer, frames))
+
+
+def test_memory_per_subscriber_is_bounded():
+    subscribers = FAST + SLOW
+
+    async def grow(events: int) -> int:
+        broker = SSEBroker(max_buffer=MAX_BUFFER, policy=DROP_OLDEST, replay_size=0)
+        subs = [broker.subscribe() for _ in range(subscribers)]
+        tracemalloc.start()
+        try:
+            for i in range(events):
+                broker.publish("call_updated", {**PAYLOAD, "i": i})
+            retained, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert all(len(sub.buffer) <= MAX_BUFFER for sub in subs)
+        return retained
+
+    full = asyncio.run(grow(MAX_BUFFER))
+    overrun = asyncio.run(grow(EVENTS))
+    frame_size = len(sse_broker.encode_event("call_updated", {**PAYLOAD, "i": 0}))
+    # A full buffer costs a slot per event, not a copy of the frame: far
+    # less than one frame per subscriber per buffered event.
+    assert full / subscribers < MAX_BUFFER * 200
+    assert full < subscribers * MAX_BUFFER * frame_size / 4
+    # Publishing 20x the buffer size retains no more than a full buffer.
+    assert overrun < full * 1.5
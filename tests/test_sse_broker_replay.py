@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+
+from shared.sse_broker import SSEBroker, parse_last_event_id
+
+RESYNC = b"event: resync\n"
+
+
+def _ids(items):
+    return [event_id for event_id, _ in items]
+
+
+def _subscribe(broker: SSEBroker, last_event_id):
+    async def scenario():
+        return broker.subscribe(last_event_id=last_event_id)
+
+    return asyncio.run(scenario())
+
+
+def _broker(events: int, **kwargs):
+    broker = SSEBroker(heartbeat_s=60, **kwargs)
+    published = [broker.publish("call_updated", {"i": i}) for i in range(events)]
+    return broker, published
+
+
+def _is_resync(sub, broker):
+    return (
+        len(sub.replay) == 1
+        and sub.replay[0][0] == broker.stats()["last_id"]
+        and RESYNC in sub.replay[0][1]
+    )
+
+
+def test_replays_what_the_client_missed():
+    broker, published = _broker(10, replay_size=8)
+    sub = _subscribe(broker, published[4])
+    assert _ids(sub.replay) == published[5:]
+    # The oldest id still in the ring can resume too.
+    assert _ids(_subscribe(broker, published[1]).replay) == published[2:]
+    assert _subscribe(broker, published[-1]).replay == []
+    assert broker.stats()["replayed"] == 5 + 8
+    assert broker.stats()["resyncs"] == 0
+
+
+def test_id_older_than_the_ring_gets_resync():
+    broker, published = _broker(10, replay_size=8)
+    sub = _subscribe(broker, published[0])
+    assert _is_resync(sub, broker)
+    assert broker.stats()["resyncs"] == 1
+
+
+def test_unknown_ids_get_resync():
+    broker, published = _broker(3, replay_size=8)
+    # From the future (another broker, a clock change) or nonsense.
+    for value in (str(published[-1] + 1), "-5", "0", "garbage", "12abc"):
+        assert _is_resync(_subscribe(broker, parse_last_event_id(value)), broker), value
+    assert broker.stats()["resyncs"] == 5
+
+
+def test_no_last_event_id_is_a_fresh_stream():
+    broker, _ = _broker(3)
+    for value in (None, ""):
+        assert parse_last_event_id(value) is None
+        assert _subscribe(broker, parse_last_event_id(value)).replay == []
+    assert broker.stats()["resyncs"] == 0
+
+
+def test_without_a_ring_every_gap_resyncs():
+    broker, published = _broker(3, replay_size=0)
+    assert broker.stats()["replay_buffered"] == 0
+    assert _subscribe(broker, published[-1]).replay == []
+    assert _is_resync(_subscribe(broker, published[-2]), broker)
+    assert broker.stats()["replayed"] == 0
+
+
+def test_ring_survives_a_restart(tmp_path):
+    path = tmp_path / "events.bin"
+    broker, published = _broker(6, replay_size=4, persist_path=path)
+    broker.close()
+
+    restarted = SSEBroker(replay_size=4, persist_path=path)
+    assert restarted.stats()["replay_buffered"] == 4
+    assert restarted.stats()["last_id"] >= published[-1]
+    sub = _subscribe(restarted, published[3])
+    assert _ids(sub.replay) == published[4:]
+    assert sub.replay[0][1].startswith(b"id: %d\nevent: call_updated\n" % published[4])
+    # Older than what was saved: resync, as before the restart.
+    assert _is_resync(_subscribe(restarted, published[0]), restarted)
+    # New ids keep increasing past the saved ones.
+    assert restarted.publish("call_updated", {}) > published[-1]
+
+
+def test_missing_or_corrupt_persist_file_starts_empty(tmp_path):
+    assert SSEBroker(persist_path=tmp_path / "missing.bin").stats()["replay_buffered"] == 0
+    corrupt = tmp_path / "corrupt.bin"
+    corrupt.write_bytes(b"id: nope\ndata: {}\n\nnot a frame\n\nid: 5\nevent: x\ndata: {}\n\n")
+    broker = SSEBroker(persist_path=corrupt)
+    assert _ids(broker._ring) == [5]
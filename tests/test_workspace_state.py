@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import json
+
+from ndm_oncall.workspace_state import LIST_KEYS, WorkspaceState
+
+
+class Client:
+    # What ui.js does with the stream: applyWorkspaceEvent on every event,
+    # applyListDelta for list fields, loadWorkspaceSnapshot on a version gap.
+
+    def __init__(self):
+        self.version = None
+        self.fields = {}
+        self.lists = {}
+
+    def _apply_changes(self, changes):
+        for name, value in changes.items():
+            if name in LIST_KEYS:
+                previous = self.lists.get(name, {})
+                rows = {
+                    key: value["upsert"][key] if key in value["upsert"] else previous.get(key)
+                    for key in value["order"]
+                }
+                self.lists[name] = rows
+                self.fields[name] = list(rows.values())
+            else:
+                self.fields[name] = value
+
+    def load_snapshot(self, snapshot):
+        self.version = snapshot["version"]
+        self.fields = {}
+        self.lists = {}
+        self._apply_changes(snapshot["changes"])
+
+    def apply_event(self, data):
+        if data["base_version"] != self.version:
+            return False
+        self._apply_changes(data["changes"])
+        self.version = data["version"]
+        return True
+
+
+def _workspace():
+    events = []
+    # Round-trip through JSON like the SSE stream does.
+    state = WorkspaceState(lambda event_type, data: events.append(json.loads(json.dumps(data))))
+    return state, events
+
+
+def _call(call_id, status="incoming"):
+    return {"id": call_id, "status": status}
+
+
+def _email(message_id, subject="hello"):
+    return {"mailbox_email": "me@x", "gmail_message_id": message_id, "subject": subject}
+
+
+def test_versions_chain():
+    state, events = _workspace()
+    start = state.version
+    assert state.update("incoming_call_workspace", {"phone_digits": "5550100001"}) == start + 1
+    state.update("recording_started", {"recording_active": True}, call_id=7)
+    # Nothing changed: published, but the version stays.
+    state.update("recording_started", {"recording_active": True})
+
+    assert [(e["base_version"], e["version"]) for e in events] == [
+        (start, start + 1),
+        (start + 1, start + 2),
+        (start + 2, start + 2),
+    ]
+    assert events[1]["call_id"] == 7
+    assert events[2]["changes"] == {}
+
+
+def test_list_delta_sends_order_and_changed_rows_only():
+    state, events = _workspace()
+    state.update("incoming_call_workspace", {"call_history": [_call(1), _call(2)]})
+    state.update("call_updated", {"call_history": [_call(3), _call(1), _call(2, "completed")]})
+    state.update("call_updated", {"call_history": [_call(3), _call(1), _call(2, "completed")]})
+
+    assert events[0]["changes"]["call_history"] == {
+        "order": ["1", "2"],
+        "upsert": {"1": _call(1), "2": _call(2)},
+    }
+    assert events[1]["changes"]["call_history"] == {
+        "order": ["3", "1", "2"],
+        "upsert": {"3": _call(3), "2": _call(2, "completed")},
+    }
+    assert "call_history" not in events[2]["changes"]
+
+
+def test_reordering_alone_is_a_change():
+    state, events = _workspace()
+    state.update("incoming_call_workspace", {"emails": [_email("a"), _email("b")]})
+    state.update("gmail_results_ready", {"emails": [_email("b"), _email("a")]})
+    assert events[1]["changes"]["emails"] == {"order": ["me@x/b", "me@x/a"], "upsert": {}}
+
+
+def test_snapshot_equals_the_replayed_deltas():
+    state, events = _workspace()
+    live = Client()
+    live.load_snapshot(state.snapshot())
+
+    state.update(
+        "incoming_call_workspace",
+        {
+            "phone_digits": "5550100001",
+            "call_id": 1,
+            "call_history": [_call(1), _call(2)],
+            "emails": [_email("a"), _email("b"), _email("c")],
+            "profile": {"name": "Ann"},
+            "recording_active": False,
+        },
+    )
+    # Rows removed and edited, a new one in front.
+    state.update("gmail_results_ready", {"emails": [_email("d"), _email("a", "re: hello")]})
+    state.update("recording_started", {"recording_active": True}, call_id=1)
+    # Another number: every list is replaced, none of its rows survive.
+    state.update(
+        "incoming_call_workspace",
+        {
+            "phone_digits": "5550100002",
+            "call_id": 3,
+            "call_history": [_call(3)],
+            "emails": [],
+            "profile": None,
+            "recording_active": False,
+        },
+    )
+    state.refresh("call_updated", "5550100001", {"profile": {"name": "stale"}})
+    state.refresh("call_updated", "5550100002", {"profile": {"name": "Bob"}})
+
+    assert all(live.apply_event(event) for event in events)
+    fresh = Client()
+    fresh.load_snapshot(json.loads(json.dumps(state.snapshot())))
+    assert fresh.version == live.version == state.version
+    assert fresh.fields == live.fields
+    assert live.fields["call_history"] == [_call(3)]
+    assert live.fields["emails"] == []
+    assert live.fields["profile"] == {"name": "Bob"}
+
+
+def test_a_client_that_missed_an_event_resyncs_from_the_snapshot():
+    state, events = _workspace()
+    client = Client()
+    client.load_snapshot(state.snapshot())
+    state.update("incoming_call_workspace", {"phone_digits": "5550100001", "emails": [_email("a")]})
+    state.update("gmail_results_ready", {"emails": [_email("a"), _email("b")]})
+    state.update("gmail_results_ready", {"emails": [_email("b")]})
+
+    assert client.apply_event(events[0])
+    # events[1] was lost: the next one does not chain onto this version.
+    assert not client.apply_event(events[2])
+    client.load_snapshot(state.snapshot())
+    assert client.fields["emails"] == [_email("b")]
+    assert client.version == events[2]["version"]
+
+
+def test_refresh_ignores_other_numbers_and_no_ops():
+    state, events = _workspace()
+    state.update("incoming_call_workspace", {"phone_digits": "5550100001", "notes": []})
+    version = state.version
+    assert not state.refresh("notes_updated", "5550100009", {"notes": [{"id": 1}]})
+    assert not state.refresh("notes_updated", "5550100001", {"notes": []})
+    assert state.refresh("notes_updated", "5550100001", {"notes": [{"id": 1}]})
+    assert state.version == version + 1
+    assert len(events) == 2
+    assert events[1]["changes"] == {"notes": {"order": ["1"], "upsert": {"1": {"id": 1}}}}